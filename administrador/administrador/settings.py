@@ -192,6 +192,43 @@ USE_TZ = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")  # 🔹 Aquí se almacenarán los archivos subidos
 
+# Caché en disco de exportaciones CSV/ZIP (fuera de MEDIA para no servirla públicamente)
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(BASE_DIR, "export_cache"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 0 la desactiva
+
+# Archivos de las exportaciones en segundo plano: también fuera de MEDIA, solo
+# se descargan desde /export/jobs/<id>/download/ tras comprobar el autor
+EXPORT_JOBS_DIR = os.getenv("EXPORT_JOBS_DIR", os.path.join(BASE_DIR, "export_jobs"))
+
+# Worker de exportaciones: un trabajo EN_PROCESO sin latido durante este tiempo
+# se da por huérfano y vuelve a la cola, hasta EXPORT_JOB_MAX_INTENTOS veces
+EXPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("EXPORT_JOB_TIMEOUT_SECONDS", "900"))
+EXPORT_JOB_MAX_INTENTOS = int(os.getenv("EXPORT_JOB_MAX_INTENTOS", "3"))
+
+# Lectura anticipada de comprobantes al generar ZIPs (1 hilo = lectura en serie)
+EXPORT_ZIP_PREFETCH_WORKERS = int(os.getenv("EXPORT_ZIP_PREFETCH_WORKERS", "4"))
+EXPORT_ZIP_PREFETCH_MAX_BYTES = int(os.getenv("EXPORT_ZIP_PREFETCH_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Caché de respuestas de reportes. Admite cualquier backend de Django:
+# locmem (por proceso), file (FileBasedCache + ruta en LOCATION) o Redis
+# (RedisCache + redis://host:6379/1). Los tests que pasan por los reportes
+# vacían ``caches["reportes"]`` en su setUp.
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+REPORT_CACHE_LOCATION = os.getenv("REPORT_CACHE_LOCATION", "reportes")
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", "600"))  # EMPRESA / EMPLEADO (datos publicados)
+REPORT_CACHE_MASTER_TIMEOUT = int(os.getenv("REPORT_CACHE_MASTER_TIMEOUT", "60"))  # MASTER (datos en vivo)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "reportes": {
+        "BACKEND": REPORT_CACHE_BACKEND,
+        "LOCATION": REPORT_CACHE_LOCATION,
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+    },
+}
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 static_dir = os.path.join(BASE_DIR, "static")
@@ -0,0 +1,57 @@
+"""
+Selección de campos (sparse fieldsets) para los listados de la API.
+
+``?fields=id,destino`` devuelve solo esos campos y ``?omit=notas`` los quita
+de la respuesta completa; se pueden combinar. Los serializers con
+``SparseFieldsMixin`` reciben la lista resultante y ajustan también el plan
+de consultas para no cargar relaciones que no se van a serializar.
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+
+def _lista(valor: str | None) -> list[str] | None:
+    if valor is None:
+        return None
+    campos = [parte.strip() for parte in valor.split(",") if parte.strip()]
+    return campos or None
+
+
+def campos_solicitados(request, disponibles: list[str]) -> list[str] | None:
+    """
+    Campos a serializar según ``?fields=`` y ``?omit=``.
+
+    Args:
+        request: Petición DRF
+        disponibles: Campos de salida del listado, en su orden
+
+    Returns:
+        Lista de campos en el orden de ``disponibles``, o None si la petición
+        no pide ninguna selección
+
+    Raises:
+        ValidationError: Si se nombra un campo que el listado no tiene
+
+    Example:
+        campos = campos_solicitados(request, ViajeSerializer.campos_disponibles())
+        serializer = ViajeSerializer(viajes, many=True, fields=campos)
+    """
+    incluidos = _lista(request.query_params.get(FIELDS_PARAM))
+    omitidos = _lista(request.query_params.get(OMIT_PARAM))
+    if incluidos is None and omitidos is None:
+        return None
+
+    errores = {}
+    for parametro, campos in ((FIELDS_PARAM, incluidos), (OMIT_PARAM, omitidos)):
+        desconocidos = sorted(set(campos or ()) - set(disponibles))
+        if desconocidos:
+            errores[parametro] = f"Campos desconocidos: {', '.join(desconocidos)}."
+    if errores:
+        raise ValidationError(errores)
+
+    return [
+        campo for campo in disponibles
+        if (incluidos is None or campo in incluidos) and campo not in (omitidos or ())
+    ]
@@ -0,0 +1,207 @@
+"""
+Paginación por cursor (keyset) para los listados de la API.
+
+En lugar de ``OFFSET`` el cursor guarda los valores de orden de la última
+fila devuelta y la página siguiente se pide con ``WHERE (orden) > (cursor)``,
+así que el coste de cada página no depende de cuántas filas haya antes.
+El orden debe terminar en un campo único (normalmente ``id``) y sus campos
+no pueden ser nulos.
+
+Un mismo listado puede combinar varias fuentes (por ejemplo snapshots
+publicados y filas en vivo) con una ``UNION ALL`` de proyecciones comunes:
+el cursor guarda también la fuente de la última fila para desempatar.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+CURSOR_PARAM = "cursor"
+PAGE_SIZE_PARAM = "page_size"
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime | date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class KeysetPagination:
+    """
+    Pagina un queryset por una tupla de campos de orden ascendentes o
+    descendentes (prefijo ``-``).
+
+    Example:
+        paginador = KeysetPagination(("empresa__nombre_empresa", "nombre", "id"))
+        if paginador.is_requested(request):
+            pagina = paginador.paginate_queryset(queryset, request)
+            return paginador.get_paginated_response(serializar(pagina))
+
+        # Varias fuentes con la proyección de ``proyectar_fuentes``
+        paginador = KeysetPagination(("-orden_fecha", "-orden_id"))
+        filas = paginador.paginate_union([proyeccion_snapshots, proyeccion_en_vivo], request)
+    """
+
+    def __init__(self, ordering: tuple[str, ...], *, page_size: int = 50, max_page_size: int = 200):
+        self.ordering = ordering
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.next_cursor = None
+        self.request = None
+
+    def is_requested(self, request) -> bool:
+        """Si la petición pide paginación (``?cursor=`` o ``?page_size=``)."""
+        return CURSOR_PARAM in request.query_params or PAGE_SIZE_PARAM in request.query_params
+
+    def _campos(self) -> list[tuple[str, bool]]:
+        return [(campo.lstrip("-"), campo.startswith("-")) for campo in self.ordering]
+
+    def _tamano_pagina(self, request) -> int:
+        valor = request.query_params.get(PAGE_SIZE_PARAM)
+        if valor is None:
+            return self.page_size
+        try:
+            tamano = int(valor)
+        except ValueError:
+            raise ValidationError({PAGE_SIZE_PARAM: "Debe ser un número entero."}) from None
+        if tamano < 1:
+            raise ValidationError({PAGE_SIZE_PARAM: "Debe ser mayor que cero."})
+        return min(tamano, self.max_page_size)
+
+    def _decodificar_cursor(self, cursor: str) -> tuple[list, int]:
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValidationError({CURSOR_PARAM: "Cursor inválido."}) from None
+        if (
+            not isinstance(valores, list)
+            or len(valores) != len(self.ordering) + 1
+            or not isinstance(valores[-1], int)
+        ):
+            raise ValidationError({CURSOR_PARAM: "Cursor inválido."})
+        return valores[:-1], valores[-1]
+
+    def _codificar_cursor(self, fuente: int, fila) -> str:
+        valores = [_codificar_valor(self._valor(fila, campo)) for campo, _ in self._campos()]
+        return base64.urlsafe_b64encode(json.dumps([*valores, fuente]).encode()).decode()
+
+    @staticmethod
+    def _valor(fila, campo: str):
+        valor = fila
+        for parte in campo.split("__"):
+            valor = valor[parte] if isinstance(valor, dict) else getattr(valor, parte)
+        return valor
+
+    def _filtro_posterior(self, valores: list, incluir_iguales: bool) -> Q:
+        """
+        ``(f1, f2, ...) > (v1, v2, ...)`` respetando la dirección de cada campo.
+
+        Con ``incluir_iguales`` también entra la fila con los mismos valores:
+        las fuentes posteriores a la del cursor van detrás en caso de empate.
+        """
+        filtro = Q()
+        iguales = Q()
+        for (campo, descendente), valor in zip(self._campos(), valores, strict=True):
+            lookup = "lt" if descendente else "gt"
+            filtro |= iguales & Q(**{f"{campo}__{lookup}": valor})
+            iguales &= Q(**{campo: valor})
+        return filtro | iguales if incluir_iguales else filtro
+
+    def _cursor(self, request) -> tuple[list | None, int | None]:
+        self.request = request
+        cursor = request.query_params.get(CURSOR_PARAM)
+        return self._decodificar_cursor(cursor) if cursor else (None, None)
+
+    def paginate_queryset(self, queryset: QuerySet, request) -> list:
+        """
+        Devuelve la página pedida y prepara el cursor de la siguiente.
+
+        Raises:
+            ValidationError: Si ``cursor`` o ``page_size`` no son válidos
+        """
+        tamano = self._tamano_pagina(request)
+        valores, _ = self._cursor(request)
+        if valores is not None:
+            queryset = queryset.filter(self._filtro_posterior(valores, incluir_iguales=False))
+
+        filas = list(queryset.order_by(*self.ordering)[:tamano + 1])
+        pagina = filas[:tamano]
+        self.next_cursor = self._codificar_cursor(0, pagina[-1]) if len(filas) > tamano else None
+        return pagina
+
+    def paginate_union(self, proyecciones: list[QuerySet], request) -> list[dict]:
+        """
+        Pagina la ``UNION ALL`` de varias proyecciones en una sola consulta.
+
+        Cada proyección debe tener una columna ``fuente`` igual a su posición
+        en la lista (ver ``users.common.services.proyectar_fuentes``). El filtro
+        del cursor se aplica a cada rama y el orden y el corte a la unión; a
+        igualdad de valores va primero la fuente de menor índice.
+
+        Returns:
+            Filas de la unión (diccionarios) de la página pedida
+
+        Raises:
+            ValidationError: Si ``cursor`` o ``page_size`` no son válidos
+        """
+        tamano = self._tamano_pagina(request)
+        valores, fuente_cursor = self._cursor(request)
+        if valores is not None:
+            proyecciones = [
+                proyeccion.filter(self._filtro_posterior(valores, incluir_iguales=indice > fuente_cursor))
+                for indice, proyeccion in enumerate(proyecciones)
+            ]
+
+        primera, *resto = proyecciones
+        union = primera.union(*resto, all=True) if resto else primera
+        filas = list(union.order_by(*self.ordering, "fuente")[:tamano + 1])
+        pagina = filas[:tamano]
+        self.next_cursor = self._codificar_cursor(pagina[-1]["fuente"], pagina[-1]) if len(filas) > tamano else None
+        return pagina
+
+    def get_next_link(self) -> str | None:
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, CURSOR_PARAM, self.next_cursor)
+
+    def get_links(self) -> dict:
+        """Claves de paginación para añadir a respuestas que ya son un objeto."""
+        return {"next": self.get_next_link(), "next_cursor": self.next_cursor}
+
+    def get_paginated_response(self, data) -> Response:
+        """Envuelve un listado: ``{"next", "next_cursor", "results"}``."""
+        return Response({**self.get_links(), "results": data})
+
+
+def serializar_por_fuente(pagina: list[tuple[int, object]], serializadores: list) -> list:
+    """
+    Serializa filas de varias fuentes conservando su orden.
+
+    Las filas de cada fuente se serializan juntas (``many=True``) con el
+    serializador de esa fuente.
+
+    Args:
+        pagina: Lista de ``(índice de la fuente, fila)``
+        serializadores: Una función ``filas -> datos`` por fuente
+
+    Returns:
+        Lista con los datos serializados en el orden de la página
+    """
+    datos = [None] * len(pagina)
+    for indice, serializar in enumerate(serializadores):
+        posiciones = [posicion for posicion, (fuente, _) in enumerate(pagina) if fuente == indice]
+        if not posiciones:
+            continue
+        filas = serializar([pagina[posicion][1] for posicion in posiciones])
+        for posicion, fila in zip(posiciones, filas, strict=True):
+            datos[posicion] = fila
+    return datos
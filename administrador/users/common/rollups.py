@@ -0,0 +1,236 @@
+"""
+Resúmenes mensuales materializados de la capa de snapshots.
+
+Los datos publicados no cambian entre releases, así que los totales por
+empresa, empleado y mes se calculan una vez al publicar
+(``refrescar_resumenes_empresa``) y los reportes de EMPRESA y EMPLEADO los
+leen con una sola consulta sobre ``ResumenMensualSnapshot``. En una
+publicación incremental solo se recalculan los meses afectados.
+"""
+from collections.abc import Collection
+from datetime import date
+
+from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from users.models import (
+    DiaViajeReviewSnapshot,
+    EmpleadoProfile,
+    EmpresaProfile,
+    GastoReviewSnapshot,
+    ResumenMensualSnapshot,
+    ViajeReviewSnapshot,
+)
+
+from .snapshots import PUBLICACION_BATCH_SIZE
+
+RESUMEN_CAMPOS = [
+    "viajes", "viajes_nacionales", "viajes_internacionales", "viajes_pendientes", "viajes_revisados",
+    "viajes_rechazados", "dias", "dias_exentos", "dias_no_exentos",
+]
+
+
+def calcular_resumenes_mensuales(viajes_snapshot: QuerySet, dias_snapshot: QuerySet) -> dict[tuple, dict]:
+    """
+    Agrega los snapshots por empresa, empleado y mes de inicio del viaje.
+
+    Args:
+        viajes_snapshot: Snapshots de viajes a agregar
+        dias_snapshot: Snapshots de días de esos viajes
+
+    Returns:
+        Diccionario ``(empresa_id, empleado_id, mes) -> valores de RESUMEN_CAMPOS``
+    """
+    resumenes = {}
+    gasto_rechazado = GastoReviewSnapshot.objects.filter(viaje_snapshot=OuterRef("pk"), estado="RECHAZADO")
+
+    viajes_por_mes = (
+        viajes_snapshot
+        .annotate(mes=TruncMonth("fecha_inicio"))
+        .values("empresa_id", "empleado_id", "mes")
+        .annotate(
+            viajes=Count("id"),
+            viajes_nacionales=Count("id", filter=Q(es_internacional=False)),
+            viajes_internacionales=Count("id", filter=Q(es_internacional=True)),
+            viajes_pendientes=Count("id", filter=Q(estado__in=["EN_REVISION", "REABIERTO"])),
+            viajes_revisados=Count("id", filter=Q(estado="REVISADO")),
+            viajes_rechazados=Count("id", filter=Exists(gasto_rechazado)),
+            dias=Coalesce(Sum("dias_viajados"), Value(0)),
+        )
+        .order_by()
+    )
+    for fila in viajes_por_mes:
+        clave = (fila.pop("empresa_id"), fila.pop("empleado_id"), fila.pop("mes"))
+        resumenes[clave] = {**fila, "dias_exentos": 0, "dias_no_exentos": 0}
+
+    dias_por_mes = (
+        dias_snapshot
+        .annotate(mes=TruncMonth("viaje_snapshot__fecha_inicio"))
+        .values("viaje_snapshot__empresa_id", "viaje_snapshot__empleado_id", "mes")
+        .annotate(
+            exentos=Count("id", filter=Q(exento=True)),
+            no_exentos=Count("id", filter=Q(exento=False)),
+        )
+        .order_by()
+    )
+    for fila in dias_por_mes:
+        clave = (fila["viaje_snapshot__empresa_id"], fila["viaje_snapshot__empleado_id"], fila["mes"])
+        resumen = resumenes.get(clave)
+        if resumen is not None:
+            resumen["dias_exentos"] = fila["exentos"]
+            resumen["dias_no_exentos"] = fila["no_exentos"]
+
+    return resumenes
+
+
+def refrescar_resumenes_empresa(
+    empresa: EmpresaProfile,
+    now,
+    claves: Collection[tuple[int, int, date]] | None = None
+) -> int:
+    """
+    Recalcula los resúmenes mensuales publicados de una empresa.
+
+    Debe llamarse dentro de la transacción de la publicación para que los
+    lectores vean los resúmenes anteriores hasta que se confirme.
+
+    Args:
+        empresa: Empresa publicada
+        now: Marca de tiempo de la publicación
+        claves: Claves ``(empresa_id, empleado_id, mes)`` afectadas (ver
+            ``ResultadoPublicacion.resumenes_afectados``). Si se indican,
+            solo se recalculan las combinaciones de esas empresas, empleados
+            y meses; si no, todos los resúmenes de la empresa. También se
+            recalculan todos si quedan resúmenes de snapshots borrados.
+
+    Returns:
+        Número de filas de resumen escritas
+    """
+    if claves is None:
+        viajes = ViajeReviewSnapshot.objects.filter(empresa=empresa)
+        anteriores = ResumenMensualSnapshot.objects.filter(empresa=empresa)
+    elif not claves:
+        return refrescar_resumenes_empresa(empresa, now) if _resumenes_desfasados(empresa) else 0
+    else:
+        alcance = {
+            "empresa_id__in": {empresa_id for empresa_id, _empleado_id, _mes in claves},
+            "empleado_id__in": {empleado_id for _empresa_id, empleado_id, _mes in claves},
+        }
+        meses = {mes for _empresa_id, _empleado_id, mes in claves}
+        viajes = ViajeReviewSnapshot.objects.filter(
+            pk__in=ViajeReviewSnapshot.objects.filter(**alcance)
+            .annotate(mes=TruncMonth("fecha_inicio"))
+            .filter(mes__in=meses)
+            .values("pk")
+        )
+        anteriores = ResumenMensualSnapshot.objects.filter(**alcance, mes__in=meses)
+
+    resumenes = calcular_resumenes_mensuales(
+        viajes, DiaViajeReviewSnapshot.objects.filter(viaje_snapshot__in=viajes)
+    )
+
+    anteriores.delete()
+    ResumenMensualSnapshot.objects.bulk_create(
+        [
+            ResumenMensualSnapshot(
+                empresa_id=empresa_id, empleado_id=empleado_id, mes=mes, published_at=now, **valores
+            )
+            for (empresa_id, empleado_id, mes), valores in resumenes.items()
+        ],
+        batch_size=PUBLICACION_BATCH_SIZE,
+    )
+
+    if claves is not None and _resumenes_desfasados(empresa):
+        return refrescar_resumenes_empresa(empresa, now)
+    return len(resumenes)
+
+
+def _resumenes_desfasados(empresa: EmpresaProfile) -> bool:
+    """
+    Indica si los resúmenes de la empresa cuentan snapshots que ya no existen.
+
+    Borrar un viaje o un día elimina sus snapshots en cascada sin pasar por
+    la publicación ni dejar un ``updated_at`` posterior, así que sus meses no
+    llegan como claves afectadas. Se detecta comparando los totales de los
+    resúmenes con los snapshots que quedan.
+    """
+    totales = ResumenMensualSnapshot.objects.filter(empresa=empresa).aggregate(
+        viajes=Coalesce(Sum("viajes"), Value(0)),
+        dias=Coalesce(Sum(F("dias_exentos") + F("dias_no_exentos")), Value(0)),
+    )
+    return totales != {
+        "viajes": ViajeReviewSnapshot.objects.filter(empresa=empresa).count(),
+        "dias": DiaViajeReviewSnapshot.objects.filter(viaje_snapshot__empresa=empresa).count(),
+    }
+
+
+def _sumas_resumen() -> dict:
+    return {campo: Coalesce(Sum(campo), Value(0)) for campo in RESUMEN_CAMPOS}
+
+
+def obtener_totales_publicados(
+    empresa: EmpresaProfile,
+    empleado: EmpleadoProfile | None = None
+) -> dict[str, int]:
+    """
+    Totales publicados de una empresa (o de uno de sus empleados).
+
+    Example:
+        totales = obtener_totales_publicados(empresa)
+        totales["dias_exentos"], totales["viajes_internacionales"]
+    """
+    resumenes = ResumenMensualSnapshot.objects.filter(empresa=empresa)
+    if empleado is not None:
+        resumenes = resumenes.filter(empleado=empleado)
+    return resumenes.aggregate(**_sumas_resumen())
+
+
+def obtener_totales_publicados_por_empleado(empresa: EmpresaProfile) -> QuerySet:
+    """
+    Totales publicados de cada empleado de la empresa con datos del empleado.
+
+    Solo aparecen los empleados con algún viaje publicado.
+    """
+    return (
+        ResumenMensualSnapshot.objects
+        .filter(empresa=empresa)
+        .values("empleado_id", "empleado__nombre", "empleado__apellido", "empleado__user__email")
+        .annotate(**_sumas_resumen())
+        .order_by("empleado_id")
+    )
+
+
+def obtener_viajes_por_mes_publicados(
+    empresa: EmpresaProfile,
+    empleado: EmpleadoProfile | None = None,
+    *,
+    anios: tuple[int, int] | None = None
+) -> QuerySet:
+    """
+    Viajes publicados por mes con su desglose por estado.
+
+    Lee como mucho doce filas agregadas por año (una por mes), sin tocar las
+    tablas de snapshots.
+
+    Args:
+        empresa: Empresa cuyos resúmenes se leen
+        empleado: Limita a los viajes de un empleado
+        anios: Rango de años ``(desde, hasta)`` incluidos
+
+    Returns:
+        Filas ``{mes, viajes, viajes_pendientes, viajes_revisados, viajes_rechazados}``
+        ordenadas por mes
+    """
+    resumenes = ResumenMensualSnapshot.objects.filter(empresa=empresa)
+    if empleado is not None:
+        resumenes = resumenes.filter(empleado=empleado)
+    if anios is not None:
+        resumenes = resumenes.filter(mes__year__gte=anios[0], mes__year__lte=anios[1])
+
+    campos = ["viajes", "viajes_pendientes", "viajes_revisados", "viajes_rechazados"]
+    return (
+        resumenes
+        .values("mes")
+        .annotate(**{campo: Sum(campo) for campo in campos})
+        .order_by("mes")
+    )
@@ -2,12 +2,16 @@
 Servicios comunes reutilizables para toda la aplicación
 Incluye lógica de filtrado jerárquico y obtención de perfiles
 """
-from collections.abc import Iterable
+import logging
+import threading
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import timedelta
 from typing import Any, NamedTuple
 
-from django.db import transaction
-from django.db.models import QuerySet
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, Q, QuerySet, Value
 from django.utils import timezone
 from django.utils.formats import date_format
 
@@ -24,6 +28,22 @@ from users.models import (
     ViajeReviewSnapshot,
 )
 
+from .rollups import refrescar_resumenes_empresa
+from .snapshots import PUBLICACION_MARGEN, ResultadoPublicacion, publicar_snapshots_empresa
+
+logger = logging.getLogger(__name__)
+
+# Empresas cargadas por consulta al publicar las releases vencidas
+RELEASES_BATCH_SIZE = 50
+
+# Campos que deciden si una empresa debe publicar
+RELEASE_FIELDS = ["force_release", "manual_release_at", "next_release_at", "last_release_at"]
+
+# Empresas publicando en este proceso (single-flight en bases de datos sin
+# SELECT ... FOR UPDATE SKIP LOCKED, como SQLite)
+_publicaciones_en_curso: set[int] = set()
+_publicaciones_lock = threading.Lock()
+
 # ============================================================================
 # OBTENCIÓN DE PERFILES
 # ============================================================================
@@ -362,97 +382,39 @@ def mark_company_review_pending(empresa: EmpresaProfile, *, save: bool = True) -
             empresa.save(update_fields=["has_pending_review_changes"])
 
 
-def _sync_dias_snapshot(
-    snapshot: ViajeReviewSnapshot,
-    dias: Iterable[DiaViaje],
-    now
-) -> None:
-    current_ids = set()
-    for dia in dias:
-        DiaViajeReviewSnapshot.objects.update_or_create(
-            dia=dia,
-            defaults={
-                "viaje_snapshot": snapshot,
-                "fecha": dia.fecha,
-                "exento": dia.exento,
-                "revisado": dia.revisado,
-                "source_updated_at": now,
-            },
-        )
-        current_ids.add(dia.id)
-
-    snapshot.dias_snapshot.exclude(dia_id__in=current_ids).delete()
-
-
-def _sync_gastos_snapshot(
-    snapshot: ViajeReviewSnapshot,
-    gastos: Iterable[Gasto],
-    now
-) -> None:
-    current_ids = set()
-    for gasto in gastos:
-        GastoReviewSnapshot.objects.update_or_create(
-            gasto=gasto,
-            defaults={
-                "viaje_snapshot": snapshot,
-                "empresa": snapshot.empresa,
-                "empleado": snapshot.empleado,
-                "concepto": gasto.concepto,
-                "monto": gasto.monto,
-                "estado": gasto.estado,
-                "fecha_gasto": gasto.fecha_gasto,
-                "source_updated_at": now,
-            },
-        )
-        current_ids.add(gasto.id)
-
-    snapshot.gastos_snapshot.exclude(gasto_id__in=current_ids).delete()
-
-
 @transaction.atomic
 def sync_company_review_snapshots(
     empresa: EmpresaProfile,
     *,
-    current_time=None
-) -> None:
+    current_time=None,
+    incremental: bool = True
+) -> ResultadoPublicacion:
     """
     Copia los datos revisados a la capa de snapshots publicada.
+
+    La copia se hace por lotes (ver ``users.common.snapshots``): solo se
+    escriben los snapshots nuevos, modificados o huérfanos. Si la empresa
+    ya publicó antes y ``incremental`` es True, solo se revisan los viajes
+    modificados desde ``last_release_at`` (menos ``PUBLICACION_MARGEN``).
+    Después se recalculan los resúmenes mensuales de los reportes afectados.
+
+    Returns:
+        ResultadoPublicacion con los snapshots creados, actualizados y eliminados
     """
     now = current_time or timezone.now()
 
-    viajes = (
-        Viaje.objects
-        .filter(empresa=empresa, estado="REVISADO")
-        .select_related("empleado")
-        .prefetch_related("dias", "gasto_set")
-    )
-
-    for viaje in viajes:
-        snapshot, _ = ViajeReviewSnapshot.objects.update_or_create(
-            viaje=viaje,
-            defaults={
-                "empresa": empresa,
-                "empleado": viaje.empleado,
-                "estado": viaje.estado,
-                "fecha_inicio": viaje.fecha_inicio,
-                "fecha_fin": viaje.fecha_fin,
-                "ciudad": viaje.ciudad,
-                "pais": viaje.pais,
-                "es_internacional": viaje.es_internacional,
-                "destino": viaje.destino,
-                "dias_viajados": viaje.dias_viajados,
-                "empresa_visitada": viaje.empresa_visitada,
-                "motivo": viaje.motivo,
-                "source_updated_at": now,
-            },
-        )
+    desde = None
+    if incremental and empresa.last_release_at:
+        desde = empresa.last_release_at - PUBLICACION_MARGEN
 
-        _sync_dias_snapshot(snapshot, viaje.dias.all(), now)
-        gastos_revisados = viaje.gasto_set.exclude(estado="PENDIENTE")
-        _sync_gastos_snapshot(snapshot, gastos_revisados, now)
+    resultado = publicar_snapshots_empresa(empresa, now, desde=desde)
+    # Una publicación completa reconstruye todos los resúmenes de la empresa
+    claves = resultado.resumenes_afectados if desde is not None else None
+    refrescar_resumenes_empresa(empresa, now, claves)
 
     empresa.has_pending_review_changes = False
     empresa.save(update_fields=["has_pending_review_changes"])
+    return resultado
 
 
 def sync_company_review_notification(
@@ -485,7 +447,57 @@ def sync_company_review_notification(
     )
 
 
-@transaction.atomic
+def release_is_due(empresa: EmpresaProfile, now) -> bool:
+    """Indica si la empresa debe publicar sus snapshots en ``now``."""
+    if empresa.force_release:
+        return True
+    if empresa.manual_release_at and empresa.manual_release_at <= now:
+        return True
+    if empresa.next_release_at and empresa.next_release_at <= now:
+        return True
+    return not empresa.next_release_at
+
+
+@contextmanager
+def _publicacion_exclusiva(empresa: EmpresaProfile) -> Iterator[bool]:
+    """
+    Single-flight por empresa: produce True solo para el llamador que publica.
+
+    En PostgreSQL se bloquea la fila de la empresa con
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` dentro de la transacción de la
+    publicación, de modo que el resto de llamadores (de cualquier proceso)
+    no esperan y siguen sirviendo los snapshots anteriores. En SQLite, sin
+    bloqueo de filas, la exclusión es por proceso.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            bloqueada = list(
+                EmpresaProfile.objects.select_for_update(skip_locked=True)
+                .filter(pk=empresa.pk)
+                .values_list("pk", flat=True)
+            )
+            yield bool(bloqueada)
+        return
+
+    with _publicaciones_lock:
+        if empresa.pk in _publicaciones_en_curso:
+            adquirida = False
+        else:
+            _publicaciones_en_curso.add(empresa.pk)
+            adquirida = True
+
+    if not adquirida:
+        yield False
+        return
+
+    try:
+        with transaction.atomic():
+            yield True
+    finally:
+        with _publicaciones_lock:
+            _publicaciones_en_curso.discard(empresa.pk)
+
+
 def ensure_company_is_up_to_date(
     empresa: EmpresaProfile,
     *,
@@ -494,41 +506,106 @@ def ensure_company_is_up_to_date(
     """
     Garantiza que la empresa tenga snapshots publicados cuando corresponda.
 
+    Solo un llamador publica cada empresa a la vez (ver
+    ``_publicacion_exclusiva``); los demás retornan False sin esperar. Tras
+    obtener el bloqueo se vuelven a leer los campos de release, así que una
+    empresa que otro llamador acaba de publicar no se publica dos veces.
+
     Returns:
         True si se realizaron sincronizaciones; False en caso contrario.
     """
     now = current_time or timezone.now()
-    should_sync = False
 
-    if empresa.force_release:
-        should_sync = True
-    elif empresa.manual_release_at and empresa.manual_release_at <= now:
-        should_sync = True
-    elif empresa.next_release_at and empresa.next_release_at <= now:
-        should_sync = True
-    elif not empresa.next_release_at:
-        should_sync = True
-
-    if not should_sync:
-        return False
-
-    sync_company_review_snapshots(empresa, current_time=now)
-
-    empresa.last_release_at = now
-    empresa.next_release_at = now + get_periodicity_delta(empresa)
-    empresa.manual_release_at = None
-    empresa.force_release = False
-    empresa.save(
-        update_fields=[
-            "last_release_at",
-            "next_release_at",
-            "manual_release_at",
-            "force_release",
-        ]
+    with _publicacion_exclusiva(empresa) as adquirida:
+        if not adquirida:
+            return False
+
+        empresa.refresh_from_db(fields=RELEASE_FIELDS)
+        if not release_is_due(empresa, now):
+            return False
+
+        sync_company_review_snapshots(empresa, current_time=now)
+
+        empresa.last_release_at = now
+        empresa.next_release_at = now + get_periodicity_delta(empresa)
+        empresa.manual_release_at = None
+        empresa.force_release = False
+        empresa.save(
+            update_fields=[
+                "last_release_at",
+                "next_release_at",
+                "manual_release_at",
+                "force_release",
+            ]
+        )
+
+        sync_company_review_notification(empresa, limit_datetime=empresa.next_release_at)
+        return True
+
+
+def get_companies_due_for_release(*, current_time=None) -> QuerySet:
+    """
+    Retorna las empresas cuya publicación de snapshots está vencida.
+
+    Usa las mismas condiciones que ``release_is_due``:
+    publicación forzada, publicación manual o periódica ya alcanzada, o
+    empresa que nunca ha publicado.
+    """
+    now = current_time or timezone.now()
+    return EmpresaProfile.objects.filter(
+        Q(force_release=True)
+        | Q(manual_release_at__lte=now)
+        | Q(next_release_at__lte=now)
+        | Q(next_release_at__isnull=True)
     )
 
-    sync_company_review_notification(empresa, limit_datetime=empresa.next_release_at)
-    return True
+
+def publish_due_releases(
+    *,
+    current_time=None,
+    batch_size: int = RELEASES_BATCH_SIZE,
+    max_empresas: int | None = None
+) -> int:
+    """
+    Publica los snapshots de todas las empresas con la release vencida.
+
+    Las empresas se recorren por bloques de ``batch_size`` ordenados por id
+    y cada una se publica en su propia transacción, de modo que un error en
+    una empresa no bloquea al resto (queda para la siguiente ejecución).
+
+    Args:
+        current_time: Marca de tiempo de la publicación
+        batch_size: Empresas cargadas por consulta
+        max_empresas: Número máximo de empresas a publicar
+
+    Returns:
+        Número de empresas publicadas
+
+    Example:
+        # Desde el scheduler (ver el comando publish_due_releases)
+        publicadas = publish_due_releases()
+    """
+    now = current_time or timezone.now()
+    vencidas = get_companies_due_for_release(current_time=now).order_by("id")
+    publicadas = 0
+    ultimo_id = 0
+
+    while max_empresas is None or publicadas < max_empresas:
+        bloque = list(vencidas.filter(id__gt=ultimo_id)[:batch_size])
+        if not bloque:
+            break
+
+        for empresa in bloque:
+            ultimo_id = empresa.id
+            try:
+                if ensure_company_is_up_to_date(empresa, current_time=now):
+                    publicadas += 1
+            except Exception:
+                logger.exception("Error publicando los snapshots de la empresa %s", empresa.pk)
+            if max_empresas is not None and publicadas >= max_empresas:
+                break
+
+    return publicadas
 
 
 class VisibleViajesResult(NamedTuple):
@@ -539,6 +616,10 @@ class VisibleViajesResult(NamedTuple):
 def get_visible_viajes_queryset(user: CustomUser) -> VisibleViajesResult:
     """
     Retorna el queryset de viajes visible según el rol del usuario.
+
+    Para EMPRESA y EMPLEADO solo se leen los snapshots ya publicados: la
+    publicación de las releases vencidas la hace ``publish_due_releases``
+    fuera del ciclo de las peticiones.
     """
     if user.role == "MASTER":
         master_qs: QuerySet[Any] = Viaje.objects.all()
@@ -548,7 +629,6 @@ def get_visible_viajes_queryset(user: CustomUser) -> VisibleViajesResult:
         empresa = get_user_empresa(user)
         if not empresa:
             return VisibleViajesResult(ViajeReviewSnapshot.objects.none(), uses_snapshot=True)
-        ensure_company_is_up_to_date(empresa)
         empresa_qs: QuerySet[Any] = (
             ViajeReviewSnapshot.objects
             .filter(empresa=empresa)
@@ -562,7 +642,6 @@ def get_visible_viajes_queryset(user: CustomUser) -> VisibleViajesResult:
         if not empleado:
             return VisibleViajesResult(ViajeReviewSnapshot.objects.none(), uses_snapshot=True)
         empresa = empleado.empresa
-        ensure_company_is_up_to_date(empresa)
         empleado_qs: QuerySet[Any] = (
             ViajeReviewSnapshot.objects
             .filter(empresa=empresa, empleado=empleado)
@@ -598,6 +677,100 @@ def get_visible_gastos_queryset(viajes_result: VisibleViajesResult) -> QuerySet:
     return Gasto.objects.filter(viaje__in=viajes_result.queryset)
 
 
+# ============================================================================
+# UNIÓN DE SNAPSHOTS Y FILAS EN VIVO
+# ============================================================================
+
+class FuenteVisible(NamedTuple):
+    """
+    Una de las fuentes de un listado que mezcla snapshots y filas en vivo.
+
+    ``orden_fecha`` y ``orden_id`` son los campos (admiten rutas ``__``) que
+    se proyectan con esos nombres en la unión. ``orden_id`` debe identificar
+    la fila original igual en todas las fuentes: el id del viaje o del gasto.
+    """
+    queryset: QuerySet[Any]
+    orden_fecha: str
+    orden_id: str
+
+
+def proyectar_fuentes(fuentes: list[FuenteVisible]) -> list[QuerySet]:
+    """
+    Proyección común de cada fuente: ``fuente`` (su posición en la lista),
+    ``objeto_id``, ``orden_fecha`` y ``orden_id``.
+
+    Args:
+        fuentes: Fuentes del listado, en orden de desempate
+
+    Returns:
+        Un QuerySet de ``values()`` sin orden por fuente, apto para ``UNION ALL``
+    """
+    return [
+        fuente.queryset
+        .order_by()
+        .prefetch_related(None)
+        .values(
+            fuente=Value(indice, output_field=IntegerField()),
+            objeto_id=F("pk"),
+            orden_fecha=F(fuente.orden_fecha),
+            orden_id=F(fuente.orden_id),
+        )
+        for indice, fuente in enumerate(fuentes)
+    ]
+
+
+def unir_fuentes_visibles(fuentes: list[FuenteVisible]) -> QuerySet:
+    """
+    ``UNION ALL`` de las proyecciones comunes de varias fuentes.
+
+    El orden, el recuento y los cortes se resuelven en la base de datos; las
+    filas completas se cargan después con ``cargar_filas_visibles``.
+
+    Example:
+        fuentes = [
+            FuenteVisible(snapshots, "fecha_inicio", "viaje_id"),
+            FuenteVisible(en_vivo, "fecha_inicio", "id"),
+        ]
+        union = unir_fuentes_visibles(fuentes)
+        total = union.count()
+        filas = union.order_by("-orden_fecha", "-orden_id", "fuente")[:50]
+        viajes = cargar_filas_visibles(filas, fuentes)
+    """
+    primera, *resto = proyectar_fuentes(fuentes)
+    return primera.union(*resto, all=True) if resto else primera
+
+
+def cargar_filas_visibles(filas, fuentes: list[FuenteVisible]) -> list[tuple[int, Any]]:
+    """
+    Carga las filas completas de una unión conservando su orden.
+
+    Hace una consulta por fuente presente en ``filas`` con el queryset de la
+    fuente, así que se aplican sus ``select_related`` y ``prefetch_related``.
+    Las filas borradas entre ambas lecturas se omiten.
+
+    Args:
+        filas: Filas de ``unir_fuentes_visibles``
+        fuentes: Las mismas fuentes usadas en la unión
+
+    Returns:
+        Lista de ``(índice de la fuente, objeto)``
+    """
+    filas = list(filas)
+    ids_por_fuente = defaultdict(list)
+    for fila in filas:
+        ids_por_fuente[fila["fuente"]].append(fila["objeto_id"])
+
+    objetos = {
+        indice: fuentes[indice].queryset.in_bulk(ids)
+        for indice, ids in ids_por_fuente.items()
+    }
+    return [
+        (fila["fuente"], objetos[fila["fuente"]][fila["objeto_id"]])
+        for fila in filas
+        if fila["objeto_id"] in objetos[fila["fuente"]]
+    ]
+
+
 # ============================================================================
 # FILTROS ESPECIALES
 # ============================================================================
@@ -0,0 +1,371 @@
+"""
+Publicación por lotes de la capa de snapshots revisados.
+
+En lugar de un ``update_or_create`` por viaje, día y gasto, el publicador
+recorre los viajes REVISADO de la empresa por bloques, compara en memoria
+las filas vivas con los snapshots existentes y aplica ``bulk_create``,
+``bulk_update`` y borrados masivos. La memoria usada depende del tamaño
+del bloque, no del número de viajes de la empresa.
+
+Con ``desde`` la publicación es incremental: solo se revisan los viajes
+cuyo ``updated_at`` (o el de alguno de sus días o gastos) es posterior, de
+modo que el coste depende del tamaño del cambio y no del de la empresa.
+
+El resultado recoge las claves ``(empresa, empleado, mes)`` de los viajes
+publicados o retirados para que los resúmenes mensuales solo se recalculen
+en esos meses.
+
+Cada bloque guarda además en ``payload`` la representación JSON de los
+campos congelados de sus snapshots de viaje y gasto, que los listados
+sirven sin volver a serializarlos fila a fila.
+"""
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db.models import Exists, Model, OuterRef, Q
+
+from users.models import (
+    DiaViaje,
+    DiaViajeReviewSnapshot,
+    EmpresaProfile,
+    Gasto,
+    GastoReviewSnapshot,
+    Viaje,
+    ViajeReviewSnapshot,
+)
+from users.serializers import GastoSnapshotSerializer, ViajeSnapshotSerializer
+
+# Viajes procesados por bloque y filas por sentencia en las operaciones masivas
+PUBLICACION_CHUNK_SIZE = 500
+PUBLICACION_BATCH_SIZE = 500
+
+# Margen que se resta a la publicación anterior en el modo incremental para
+# no perder filas que otra transacción modificó antes de esa publicación
+# pero confirmó después
+PUBLICACION_MARGEN = timedelta(minutes=5)
+
+VIAJE_SNAPSHOT_FIELDS = [
+    "empresa_id", "empleado_id", "estado", "fecha_inicio", "fecha_fin", "ciudad", "pais",
+    "es_internacional", "destino", "dias_viajados", "empresa_visitada", "motivo",
+]
+DIA_SNAPSHOT_FIELDS = ["viaje_snapshot_id", "fecha", "exento", "revisado"]
+GASTO_SNAPSHOT_FIELDS = [
+    "viaje_snapshot_id", "empresa_id", "empleado_id", "concepto", "monto", "estado", "fecha_gasto",
+]
+
+
+@dataclass
+class ResultadoPublicacion:
+    """
+    Número de snapshots creados, actualizados y eliminados en una publicación.
+
+    ``resumenes_afectados`` guarda las claves ``(empresa_id, empleado_id, mes)``
+    de los viajes revisados o retirados, antes y después del cambio.
+    """
+    creados: int = 0
+    actualizados: int = 0
+    eliminados: int = 0
+    resumenes_afectados: set[tuple[int, int, date]] = field(default_factory=set)
+
+    def __iadd__(self, otro: "ResultadoPublicacion") -> "ResultadoPublicacion":
+        self.creados += otro.creados
+        self.actualizados += otro.actualizados
+        self.eliminados += otro.eliminados
+        self.resumenes_afectados |= otro.resumenes_afectados
+        return self
+
+
+def _clave_resumen(empresa_id: int, empleado_id: int, fecha_inicio: date) -> tuple[int, int, date]:
+    """Clave del resumen mensual en el que cuenta un viaje."""
+    return empresa_id, empleado_id, fecha_inicio.replace(day=1)
+
+
+def _bloques_de_viajes(viajes, chunk_size: int) -> Iterator[list[dict]]:
+    """Recorre los viajes por clave primaria (keyset) sin cargarlos todos en memoria."""
+    ultimo_id = 0
+    while True:
+        bloque = list(
+            viajes.filter(pk__gt=ultimo_id)
+            .order_by("pk")
+            .values("id", *VIAJE_SNAPSHOT_FIELDS)[:chunk_size]
+        )
+        if not bloque:
+            return
+        yield bloque
+        ultimo_id = bloque[-1]["id"]
+
+
+def _aplicar_diferencias(
+    modelo: type[Model],
+    existentes: dict[int, Model],
+    deseados: dict[int, dict],
+    clave_origen: str,
+    campos: list[str],
+    now,
+    eliminables: Iterable[Model] = (),
+    batch_size: int = PUBLICACION_BATCH_SIZE
+) -> ResultadoPublicacion:
+    """
+    Crea, actualiza y elimina snapshots de ``modelo`` según las filas deseadas.
+
+    Args:
+        modelo: Modelo de snapshot
+        existentes: Snapshots actuales indexados por id de la fila de origen
+        deseados: Valores de ``campos`` indexados por id de la fila de origen
+        clave_origen: Campo FK hacia la fila de origen (``viaje_id``, ``dia_id``...)
+        campos: Campos copiados desde la fila de origen
+        now: Marca de tiempo para ``source_updated_at``
+        eliminables: Snapshots candidatos a borrarse si su origen ya no está
+        batch_size: Filas por sentencia
+    """
+    nuevos = []
+    modificados = []
+
+    for origen_id, valores in deseados.items():
+        snapshot = existentes.get(origen_id)
+        if snapshot is None:
+            nuevos.append(modelo(**{clave_origen: origen_id}, **valores, source_updated_at=now))
+            continue
+
+        if any(getattr(snapshot, campo) != valor for campo, valor in valores.items()):
+            for campo, valor in valores.items():
+                setattr(snapshot, campo, valor)
+            snapshot.source_updated_at = now
+            modificados.append(snapshot)
+
+    a_eliminar = [
+        snapshot.pk for snapshot in eliminables
+        if getattr(snapshot, clave_origen) not in deseados
+    ]
+
+    if nuevos:
+        modelo.objects.bulk_create(nuevos, batch_size=batch_size)
+    if modificados:
+        modelo.objects.bulk_update(modificados, [*campos, "source_updated_at"], batch_size=batch_size)
+    for inicio in range(0, len(a_eliminar), batch_size):
+        modelo.objects.filter(pk__in=a_eliminar[inicio:inicio + batch_size]).delete()
+
+    return ResultadoPublicacion(len(nuevos), len(modificados), len(a_eliminar))
+
+
+def _publicar_bloque(empresa: EmpresaProfile, viajes: list[dict], now) -> ResultadoPublicacion:
+    viaje_ids = [viaje["id"] for viaje in viajes]
+    resultado = ResultadoPublicacion()
+
+    # Viajes
+    existentes_viaje = {
+        snapshot.viaje_id: snapshot
+        for snapshot in ViajeReviewSnapshot.objects.filter(viaje_id__in=viaje_ids)
+    }
+    claves_anteriores = {
+        _clave_resumen(snapshot.empresa_id, snapshot.empleado_id, snapshot.fecha_inicio)
+        for snapshot in existentes_viaje.values()
+    }
+    deseados_viaje = {
+        viaje["id"]: {campo: viaje[campo] for campo in VIAJE_SNAPSHOT_FIELDS}
+        for viaje in viajes
+    }
+    for valores in deseados_viaje.values():
+        valores["empresa_id"] = empresa.id
+    resultado += _aplicar_diferencias(
+        ViajeReviewSnapshot, existentes_viaje, deseados_viaje, "viaje_id", VIAJE_SNAPSHOT_FIELDS, now
+    )
+    # ``_aplicar_diferencias`` modifica los snapshots existentes: las claves
+    # anteriores (mes o empleado cambiados) se toman antes de aplicarlo
+    resultado.resumenes_afectados |= claves_anteriores
+    resultado.resumenes_afectados |= {
+        _clave_resumen(valores["empresa_id"], valores["empleado_id"], valores["fecha_inicio"])
+        for valores in deseados_viaje.values()
+    }
+
+    snapshot_por_viaje = dict(
+        ViajeReviewSnapshot.objects.filter(viaje_id__in=viaje_ids).values_list("viaje_id", "id")
+    )
+    snapshot_ids = set(snapshot_por_viaje.values())
+    empleado_por_viaje = {viaje["id"]: viaje["empleado_id"] for viaje in viajes}
+
+    # Días
+    deseados_dia = {
+        dia["id"]: {
+            "viaje_snapshot_id": snapshot_por_viaje[dia["viaje_id"]],
+            "fecha": dia["fecha"],
+            "exento": dia["exento"],
+            "revisado": dia["revisado"],
+        }
+        for dia in DiaViaje.objects.filter(viaje_id__in=viaje_ids).values(
+            "id", "viaje_id", "fecha", "exento", "revisado"
+        )
+    }
+    snapshots_dia = list(
+        DiaViajeReviewSnapshot.objects.filter(
+            Q(viaje_snapshot_id__in=snapshot_ids) | Q(dia__viaje_id__in=viaje_ids)
+        )
+    )
+    resultado += _aplicar_diferencias(
+        DiaViajeReviewSnapshot,
+        {snapshot.dia_id: snapshot for snapshot in snapshots_dia},
+        deseados_dia,
+        "dia_id",
+        DIA_SNAPSHOT_FIELDS,
+        now,
+        eliminables=[s for s in snapshots_dia if s.viaje_snapshot_id in snapshot_ids],
+    )
+
+    # Gastos revisados (los pendientes no se publican)
+    deseados_gasto = {
+        gasto["id"]: {
+            "viaje_snapshot_id": snapshot_por_viaje[gasto["viaje_id"]],
+            "empresa_id": empresa.id,
+            "empleado_id": empleado_por_viaje[gasto["viaje_id"]],
+            "concepto": gasto["concepto"],
+            "monto": gasto["monto"],
+            "estado": gasto["estado"],
+            "fecha_gasto": gasto["fecha_gasto"],
+        }
+        for gasto in Gasto.objects.filter(viaje_id__in=viaje_ids)
+        .exclude(estado="PENDIENTE")
+        .values("id", "viaje_id", "concepto", "monto", "estado", "fecha_gasto")
+    }
+    snapshots_gasto = list(
+        GastoReviewSnapshot.objects.filter(
+            Q(viaje_snapshot_id__in=snapshot_ids) | Q(gasto__viaje_id__in=viaje_ids)
+        )
+    )
+    resultado += _aplicar_diferencias(
+        GastoReviewSnapshot,
+        {snapshot.gasto_id: snapshot for snapshot in snapshots_gasto},
+        deseados_gasto,
+        "gasto_id",
+        GASTO_SNAPSHOT_FIELDS,
+        now,
+        eliminables=[s for s in snapshots_gasto if s.viaje_snapshot_id in snapshot_ids],
+    )
+
+    _renderizar_payloads(snapshot_ids)
+    return resultado
+
+
+def _renderizar_payloads(snapshot_ids: Iterable[int], batch_size: int = PUBLICACION_BATCH_SIZE) -> int:
+    """
+    Guarda el ``payload`` de los snapshots de viaje indicados y de sus gastos.
+
+    Solo se escriben los que cambian. No cuentan en ``ResultadoPublicacion``:
+    el ``payload`` se deriva de campos ya sincronizados.
+
+    Returns:
+        Número de snapshots cuyo ``payload`` se ha escrito
+    """
+    pendientes = (
+        (
+            ViajeReviewSnapshot,
+            ViajeSnapshotSerializer,
+            ViajeReviewSnapshot.objects.filter(pk__in=snapshot_ids).select_related("viaje"),
+        ),
+        (
+            GastoReviewSnapshot,
+            GastoSnapshotSerializer,
+            GastoReviewSnapshot.objects.filter(viaje_snapshot_id__in=snapshot_ids)
+            .select_related("gasto__viaje", "viaje_snapshot"),
+        ),
+    )
+
+    escritos = 0
+    for modelo, serializer_class, snapshots in pendientes:
+        modificados = []
+        for snapshot in snapshots:
+            payload = serializer_class.renderizar_payload(snapshot)
+            if snapshot.payload != payload:
+                snapshot.payload = payload
+                modificados.append(snapshot)
+        if modificados:
+            modelo.objects.bulk_update(modificados, ["payload"], batch_size=batch_size)
+        escritos += len(modificados)
+    return escritos
+
+
+def _renderizar_payloads_pendientes(empresa: EmpresaProfile, chunk_size: int) -> int:
+    """Renderiza los snapshots de la empresa que aún no tienen ``payload``."""
+    viajes = ViajeReviewSnapshot.objects.filter(empresa=empresa).filter(
+        Q(payload__isnull=True)
+        | Exists(GastoReviewSnapshot.objects.filter(viaje_snapshot=OuterRef("pk"), payload__isnull=True))
+    )
+
+    escritos = 0
+    ultimo_id = 0
+    while True:
+        ids = list(viajes.filter(pk__gt=ultimo_id).order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return escritos
+        escritos += _renderizar_payloads(ids)
+        ultimo_id = ids[-1]
+
+
+def filtrar_viajes_modificados(viajes, desde):
+    """Viajes modificados después de ``desde``, directamente o a través de sus días o gastos."""
+    return viajes.filter(
+        Q(updated_at__gt=desde)
+        | Q(pk__in=DiaViaje.objects.filter(updated_at__gt=desde).values("viaje_id"))
+        | Q(pk__in=Gasto.objects.filter(updated_at__gt=desde, viaje__isnull=False).values("viaje_id"))
+    )
+
+
+def _retirar_snapshots_no_revisados(empresa: EmpresaProfile, desde=None) -> ResultadoPublicacion:
+    """Elimina los snapshots de viajes que ya no están REVISADO en la empresa."""
+    snapshots = ViajeReviewSnapshot.objects.filter(empresa=empresa)
+    if desde is not None:
+        snapshots = snapshots.filter(viaje__updated_at__gt=desde)
+
+    retirados = list(
+        snapshots.exclude(viaje__estado="REVISADO", viaje__empresa=empresa)
+        .values_list("pk", "empresa_id", "empleado_id", "fecha_inicio")
+    )
+    if not retirados:
+        return ResultadoPublicacion()
+
+    eliminados, _por_modelo = ViajeReviewSnapshot.objects.filter(
+        pk__in=[pk for pk, *_clave in retirados]
+    ).delete()
+    return ResultadoPublicacion(
+        eliminados=eliminados,
+        resumenes_afectados={_clave_resumen(*clave) for _pk, *clave in retirados},
+    )
+
+
+def publicar_snapshots_empresa(
+    empresa: EmpresaProfile,
+    now,
+    *,
+    desde=None,
+    chunk_size: int = PUBLICACION_CHUNK_SIZE
+) -> ResultadoPublicacion:
+    """
+    Sincroniza los snapshots de los viajes REVISADO de una empresa.
+
+    Solo se escriben las filas que cambian: los snapshots idénticos a su
+    origen no se tocan y conservan su ``source_updated_at``. Los snapshots
+    de viajes que han dejado de estar REVISADO se eliminan junto con sus
+    días y gastos. Los snapshots publicados sin ``payload`` (anteriores a
+    ese campo) lo reciben aunque la publicación sea incremental.
+
+    Args:
+        empresa: Empresa a publicar
+        now: Marca de tiempo de la publicación
+        desde: Si se indica, solo se revisan los viajes modificados después
+            de esta fecha (publicación incremental)
+        chunk_size: Viajes procesados por bloque
+
+    Returns:
+        ResultadoPublicacion con los totales de la sincronización
+    """
+    resultado = ResultadoPublicacion()
+    viajes = Viaje.objects.filter(empresa=empresa, estado="REVISADO")
+    if desde is not None:
+        viajes = filtrar_viajes_modificados(viajes, desde)
+
+    for bloque in _bloques_de_viajes(viajes, chunk_size):
+        resultado += _publicar_bloque(empresa, bloque, now)
+
+    resultado += _retirar_snapshots_no_revisados(empresa, desde)
+    _renderizar_payloads_pendientes(empresa, chunk_size)
+    return resultado
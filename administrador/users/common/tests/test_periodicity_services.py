@@ -3,15 +3,21 @@ Tests para servicios de publicación diferida de viajes/gastos.
 """
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 from django.utils.formats import date_format
 
 from users.common.services import (
     ensure_company_is_up_to_date,
+    get_companies_due_for_release,
     get_periodicity_delta,
+    get_visible_viajes_queryset,
     mark_company_review_pending,
+    publish_due_releases,
     sync_company_review_notification,
     sync_company_review_snapshots,
 )
@@ -178,3 +184,75 @@ class PeriodicityServicesTestCase(TestCase):
         )
         self.assertEqual(notifications.count(), 1)
         self.assertIn(date_format(new_limit, "DATE_FORMAT"), notifications.first().mensaje)
+
+    def _crear_empresa(self, indice: int, **campos) -> EmpresaProfile:
+        user = CustomUser.objects.create_user(
+            username=f"empresa_release_{indice}",
+            email=f"empresa_release_{indice}@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        return EmpresaProfile.objects.create(
+            user=user,
+            nombre_empresa=f"Empresa Release {indice}",
+            nif=f"B8000000{indice}",
+            correo_contacto=f"release{indice}@example.com",
+            **campos,
+        )
+
+    def test_publish_due_releases_solo_publica_empresas_vencidas(self):
+        now = timezone.now()
+        self.empresa.next_release_at = now - timedelta(hours=1)
+        self.empresa.save(update_fields=["next_release_at"])
+        futura = self._crear_empresa(1, next_release_at=now + timedelta(days=30))
+        manual = self._crear_empresa(
+            2, next_release_at=now + timedelta(days=30), manual_release_at=now - timedelta(minutes=5)
+        )
+        forzada = self._crear_empresa(3, next_release_at=now + timedelta(days=30), force_release=True)
+
+        self.assertCountEqual(
+            get_companies_due_for_release(current_time=now), [self.empresa, manual, forzada]
+        )
+
+        publicadas = publish_due_releases(current_time=now, batch_size=1)
+
+        self.assertEqual(publicadas, 3)
+        self.assertTrue(ViajeReviewSnapshot.objects.filter(viaje=self.viaje).exists())
+        self.assertFalse(get_companies_due_for_release(current_time=now).exists())
+        futura.refresh_from_db()
+        self.assertIsNone(futura.last_release_at)
+
+    def test_publish_due_releases_continua_tras_un_error(self):
+        otra = self._crear_empresa(1)
+        original = ensure_company_is_up_to_date
+
+        def fallar_en_la_primera(empresa, **kwargs):
+            if empresa.pk == self.empresa.pk:
+                raise RuntimeError("fallo simulado")
+            return original(empresa, **kwargs)
+
+        with mock.patch(
+            "users.common.services.ensure_company_is_up_to_date", side_effect=fallar_en_la_primera
+        ), self.assertLogs("users.common.services", level="ERROR"):
+            publicadas = publish_due_releases()
+
+        self.assertEqual(publicadas, 1)
+        otra.refresh_from_db()
+        self.assertIsNotNone(otra.last_release_at)
+        self.assertFalse(ViajeReviewSnapshot.objects.filter(viaje=self.viaje).exists())
+
+    def test_lectura_no_publica_releases_vencidas(self):
+        self.empresa.next_release_at = timezone.now() - timedelta(days=1)
+        self.empresa.save(update_fields=["next_release_at"])
+
+        resultado = get_visible_viajes_queryset(self.empresa_user)
+
+        self.assertFalse(resultado.queryset.exists())
+        self.empresa.refresh_from_db()
+        self.assertIsNone(self.empresa.last_release_at)
+
+        salida = StringIO()
+        call_command("publish_due_releases", "--once", stdout=salida)
+
+        self.assertIn("Publicadas 1 empresas", salida.getvalue())
+        self.assertEqual(get_visible_viajes_queryset(self.empresa_user).queryset.count(), 1)
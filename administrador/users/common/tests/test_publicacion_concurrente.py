@@ -0,0 +1,116 @@
+"""
+Tests de concurrencia para la publicación single-flight de snapshots.
+"""
+import threading
+import time
+from datetime import date
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from users.common import services
+from users.common.services import ensure_company_is_up_to_date
+from users.models import (
+    CustomUser,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Notificacion,
+    Viaje,
+    ViajeReviewSnapshot,
+)
+
+
+class PublicacionConcurrenteTestCase(TransactionTestCase):
+    HILOS = 8
+
+    def setUp(self):
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_concurrente",
+            email="empresa_concurrente@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user,
+            nombre_empresa="Empresa Concurrente",
+            nif="B90000009",
+            correo_contacto="contacto@concurrente.com",
+            force_release=True,
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_concurrente",
+            email="empleado_concurrente@example.com",
+            password="pass",
+            role="EMPLEADO",
+        )
+        empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Carla",
+            apellido="Concurrente",
+            dni="99999999R",
+        )
+        Viaje.objects.create(
+            empleado=empleado,
+            empresa=self.empresa,
+            destino="Bilbao",
+            fecha_inicio=date(2024, 3, 1),
+            fecha_fin=date(2024, 3, 2),
+            estado="REVISADO",
+            dias_viajados=2,
+        )
+
+    def test_solo_un_llamador_sincroniza(self):
+        sincronizaciones = []
+        sync_original = services.sync_company_review_snapshots
+
+        def sync_lento(empresa, **kwargs):
+            sincronizaciones.append(empresa.pk)
+            time.sleep(0.3)
+            return sync_original(empresa, **kwargs)
+
+        # Cada hilo usa su propia instancia, como peticiones distintas
+        empresas = [EmpresaProfile.objects.get(pk=self.empresa.pk) for _ in range(self.HILOS)]
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        errores = []
+
+        def publicar(empresa):
+            try:
+                barrera.wait()
+                resultados.append(ensure_company_is_up_to_date(empresa))
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connection.close()
+
+        with mock.patch.object(services, "sync_company_review_snapshots", side_effect=sync_lento):
+            hilos = [threading.Thread(target=publicar, args=(empresa,)) for empresa in empresas]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(sincronizaciones), 1)
+        self.assertEqual(resultados.count(True), 1)
+        self.assertEqual(resultados.count(False), self.HILOS - 1)
+        self.assertEqual(ViajeReviewSnapshot.objects.filter(empresa=self.empresa).count(), 1)
+        self.assertEqual(
+            Notificacion.objects.filter(
+                usuario_destino=self.empresa.user,
+                tipo=Notificacion.TIPO_REVISION_FECHA_LIMITE,
+            ).count(),
+            1,
+        )
+
+    def test_llamador_tardio_no_vuelve_a_publicar(self):
+        self.assertTrue(ensure_company_is_up_to_date(self.empresa))
+
+        # Instancia obtenida antes de la publicación: aún ve force_release=True
+        obsoleta = EmpresaProfile(pk=self.empresa.pk, force_release=True)
+        with mock.patch.object(services, "sync_company_review_snapshots") as sync:
+            self.assertFalse(ensure_company_is_up_to_date(obsoleta))
+
+        sync.assert_not_called()
@@ -0,0 +1,254 @@
+"""
+Tests para la publicación por lotes de snapshots.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.common.services import ensure_company_is_up_to_date, sync_company_review_snapshots
+from users.common.snapshots import PUBLICACION_MARGEN, publicar_snapshots_empresa
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    DiaViajeReviewSnapshot,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    GastoReviewSnapshot,
+    Viaje,
+    ViajeReviewSnapshot,
+)
+
+
+class SnapshotPublisherTestCase(TestCase):
+    def setUp(self):
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_publicacion",
+            email="empresa_publicacion@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user,
+            nombre_empresa="Empresa Publicación",
+            nif="B70000007",
+            correo_contacto="contacto@publicacion.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_publicacion",
+            email="empleado_publicacion@example.com",
+            password="pass",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Pablo",
+            apellido="Publicación",
+            dni="77777777B",
+        )
+
+    def _crear_viajes(self, total: int, estado: str = "REVISADO") -> list[Viaje]:
+        viajes = []
+        for indice in range(total):
+            inicio = date(2024, 1, 1) + timedelta(days=indice * 3)
+            viaje = Viaje.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                destino=f"Destino {indice}",
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=1),
+                estado=estado,
+                dias_viajados=2,
+            )
+            for offset in range(2):
+                DiaViaje.objects.create(
+                    viaje=viaje, fecha=inicio + timedelta(days=offset), exento=offset == 0, revisado=True
+                )
+            Gasto.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                viaje=viaje,
+                concepto="Hotel",
+                monto=Decimal("90.00"),
+                estado="APROBADO",
+            )
+            Gasto.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                viaje=viaje,
+                concepto="Taxi",
+                monto=Decimal("15.00"),
+                estado="PENDIENTE",
+            )
+            viajes.append(viaje)
+        return viajes
+
+    def test_primera_publicacion_crea_todo(self):
+        self._crear_viajes(3)
+        self._crear_viajes(1, estado="EN_REVISION")
+
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), chunk_size=2)
+
+        self.assertEqual(ViajeReviewSnapshot.objects.count(), 3)
+        self.assertEqual(DiaViajeReviewSnapshot.objects.count(), 6)
+        self.assertEqual(GastoReviewSnapshot.objects.count(), 3)
+        self.assertEqual(resultado.creados, 12)
+        self.assertEqual(resultado.actualizados, 0)
+
+    def test_republicar_sin_cambios_no_escribe(self):
+        self._crear_viajes(2)
+        primera = timezone.now() - timedelta(days=1)
+        publicar_snapshots_empresa(self.empresa, primera)
+
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now())
+
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.eliminados), (0, 0, 0))
+        self.assertFalse(ViajeReviewSnapshot.objects.exclude(source_updated_at=primera).exists())
+
+    def test_solo_actualiza_y_elimina_lo_que_cambia(self):
+        viaje, otro = self._crear_viajes(2)
+        publicar_snapshots_empresa(self.empresa, timezone.now())
+
+        Viaje.objects.filter(pk=viaje.pk).update(destino="Nuevo destino")
+        DiaViaje.objects.filter(viaje=viaje, exento=True).update(exento=False)
+        DiaViaje.objects.filter(viaje=otro).first().delete()
+        Gasto.objects.filter(viaje=otro, estado="APROBADO").update(estado="PENDIENTE")
+        Gasto.objects.filter(viaje=viaje, estado="PENDIENTE").update(estado="RECHAZADO")
+
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now())
+
+        # viaje + día modificados; gasto rechazado nuevo; gasto vuelto a pendiente eliminado
+        self.assertEqual(resultado.actualizados, 2)
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual(resultado.eliminados, 1)
+        snapshot = ViajeReviewSnapshot.objects.get(viaje=viaje)
+        self.assertEqual(snapshot.destino, "Nuevo destino")
+        self.assertFalse(snapshot.dias_snapshot.filter(exento=True).exists())
+        self.assertEqual(snapshot.gastos_snapshot.count(), 2)
+        self.assertEqual(DiaViajeReviewSnapshot.objects.filter(viaje_snapshot__viaje=otro).count(), 1)
+        self.assertFalse(GastoReviewSnapshot.objects.filter(viaje_snapshot__viaje=otro).exists())
+
+    def test_numero_de_queries_no_depende_de_los_viajes(self):
+        def queries_publicacion():
+            ViajeReviewSnapshot.objects.all().delete()
+            with CaptureQueriesContext(connection) as contexto:
+                publicar_snapshots_empresa(self.empresa, timezone.now())
+            return len(contexto.captured_queries)
+
+        self._crear_viajes(1)
+        con_un_viaje = queries_publicacion()
+        self._crear_viajes(20)
+        con_veintiun_viajes = queries_publicacion()
+
+        self.assertEqual(con_un_viaje, con_veintiun_viajes)
+
+    def test_sync_company_review_snapshots_devuelve_resultado(self):
+        self._crear_viajes(1)
+        self.empresa.has_pending_review_changes = True
+        self.empresa.save(update_fields=["has_pending_review_changes"])
+
+        resultado = sync_company_review_snapshots(self.empresa)
+
+        self.assertEqual(resultado.creados, 4)
+        self.empresa.refresh_from_db()
+        self.assertFalse(self.empresa.has_pending_review_changes)
+
+    def test_publicacion_incremental_solo_revisa_viajes_modificados(self):
+        viaje, otro, tercero = self._crear_viajes(3)
+        publicar_snapshots_empresa(self.empresa, timezone.now())
+        desde = timezone.now()
+
+        # Cambios en las filas vivas de dos viajes a través de save() y de update()
+        viaje.destino = "Destino incremental"
+        viaje.save(update_fields=["destino"])
+        Gasto.objects.filter(viaje=otro, estado="APROBADO").update(
+            monto=Decimal("95.00"), updated_at=timezone.now()
+        )
+
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), desde=desde)
+
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.eliminados), (0, 2, 0))
+        self.assertEqual(ViajeReviewSnapshot.objects.get(viaje=viaje).destino, "Destino incremental")
+        self.assertEqual(
+            GastoReviewSnapshot.objects.get(viaje_snapshot__viaje=otro).monto, Decimal("95.00")
+        )
+        self.assertLess(len(contexto.captured_queries), 20)
+
+        # Un update() que no marca updated_at queda fuera de la publicación incremental
+        Viaje.objects.filter(pk=tercero.pk).update(destino="Sin marcar")
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), desde=timezone.now())
+        self.assertEqual(resultado.actualizados, 0)
+
+    def test_publicacion_incremental_retira_viajes_reabiertos(self):
+        viaje, otro = self._crear_viajes(2)
+        publicar_snapshots_empresa(self.empresa, timezone.now())
+        desde = timezone.now()
+
+        viaje.estado = "REABIERTO"
+        viaje.save(update_fields=["estado"])
+
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), desde=desde)
+
+        # snapshot del viaje + 2 días + 1 gasto
+        self.assertEqual(resultado.eliminados, 4)
+        self.assertFalse(ViajeReviewSnapshot.objects.filter(viaje=viaje).exists())
+        self.assertTrue(ViajeReviewSnapshot.objects.filter(viaje=otro).exists())
+
+    def test_sync_incremental_usa_last_release_at(self):
+        viaje, otro = self._crear_viajes(2)
+        ensure_company_is_up_to_date(self.empresa)
+        self.empresa.refresh_from_db()
+        anterior = self.empresa.last_release_at
+        self.assertIsNotNone(anterior)
+
+        # Modificado antes del margen: no se vuelve a revisar
+        antiguo = anterior - PUBLICACION_MARGEN * 2
+        Viaje.objects.filter(pk=otro.pk).update(destino="Fuera del margen", updated_at=antiguo)
+        DiaViaje.objects.filter(viaje=otro).update(updated_at=antiguo)
+        Gasto.objects.filter(viaje=otro).update(updated_at=antiguo)
+        Viaje.objects.filter(pk=viaje.pk).update(
+            destino="Tras la publicación", updated_at=anterior + timedelta(seconds=1)
+        )
+        resultado = sync_company_review_snapshots(self.empresa)
+
+        self.assertEqual(resultado.actualizados, 1)
+        self.assertEqual(ViajeReviewSnapshot.objects.get(viaje=viaje).destino, "Tras la publicación")
+
+        # Sin publicación previa (o con incremental=False) se revisa todo
+        resultado = sync_company_review_snapshots(self.empresa, incremental=False)
+        self.assertEqual(resultado.actualizados, 1)
+        self.assertEqual(ViajeReviewSnapshot.objects.get(viaje=otro).destino, "Fuera del margen")
+
+    def test_payload_se_actualiza_con_el_snapshot(self):
+        viaje, otro = self._crear_viajes(2)
+        publicar_snapshots_empresa(self.empresa, timezone.now())
+        desde = timezone.now()
+
+        viaje.destino = "Destino renderizado"
+        viaje.save(update_fields=["destino"])
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), desde=desde)
+
+        self.assertEqual(resultado.actualizados, 1)
+        snapshot = ViajeReviewSnapshot.objects.get(viaje=viaje)
+        self.assertEqual(snapshot.payload["destino"], "Destino renderizado")
+        self.assertEqual(snapshot.gastos_snapshot.get().payload["viaje"]["destino"], "Destino renderizado")
+        self.assertEqual(ViajeReviewSnapshot.objects.get(viaje=otro).payload["destino"], "Destino 1")
+
+    def test_publicacion_incremental_rellena_payloads_pendientes(self):
+        self._crear_viajes(3)
+        publicar_snapshots_empresa(self.empresa, timezone.now())
+        esperados = dict(ViajeReviewSnapshot.objects.values_list("pk", "payload"))
+        ViajeReviewSnapshot.objects.update(payload=None)
+        GastoReviewSnapshot.objects.filter(viaje_snapshot__viaje__destino="Destino 2").update(payload=None)
+
+        resultado = publicar_snapshots_empresa(self.empresa, timezone.now(), desde=timezone.now(), chunk_size=2)
+
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.eliminados), (0, 0, 0))
+        self.assertEqual(dict(ViajeReviewSnapshot.objects.values_list("pk", "payload")), esperados)
+        self.assertFalse(GastoReviewSnapshot.objects.filter(payload__isnull=True).exists())
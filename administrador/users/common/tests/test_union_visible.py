@@ -0,0 +1,84 @@
+"""
+Tests para la unión de snapshots y filas en vivo.
+"""
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.common.services import (
+    FuenteVisible,
+    cargar_filas_visibles,
+    publish_due_releases,
+    unir_fuentes_visibles,
+)
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Viaje, ViajeReviewSnapshot
+
+
+class UnionVisibleTestCase(TestCase):
+    def setUp(self):
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_union", email="empresa_union@test.com", password="pass", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user, nombre_empresa="Empresa Unión", nif="B77200001", correo_contacto="union@test.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_union", email="empleado_union@test.com", password="pass", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Luis", apellido="Unión", dni="77200001U",
+        )
+        for dia in (2, 4):
+            self._viaje(date(2024, 6, dia), "REVISADO")
+        publish_due_releases()
+        for dia in (1, 4, 6):
+            self._viaje(date(2024, 6, dia), "EN_REVISION")
+
+        self.fuentes = [
+            FuenteVisible(
+                ViajeReviewSnapshot.objects.filter(empresa=self.empresa).select_related("viaje"),
+                "fecha_inicio",
+                "viaje_id",
+            ),
+            FuenteVisible(
+                Viaje.objects.filter(empresa=self.empresa).exclude(estado="REVISADO"),
+                "fecha_inicio",
+                "id",
+            ),
+        ]
+
+    def _viaje(self, inicio, estado):
+        return Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Cuenca", fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=1), estado=estado, dias_viajados=2,
+        )
+
+    def test_orden_recuento_y_corte_en_una_consulta(self):
+        union = unir_fuentes_visibles(self.fuentes)
+
+        with CaptureQueriesContext(connection) as contexto:
+            total = union.count()
+            filas = list(union.order_by("-orden_fecha", "-orden_id", "fuente")[:4])
+
+        self.assertEqual(total, 5)
+        self.assertEqual(len(contexto.captured_queries), 2)
+        self.assertIn("UNION ALL", contexto.captured_queries[1]["sql"])
+        self.assertEqual(
+            [(fila["orden_fecha"].day, fila["fuente"]) for fila in filas],
+            [(6, 1), (4, 1), (4, 0), (2, 0)],
+        )
+
+    def test_carga_las_filas_en_el_orden_de_la_union(self):
+        filas = list(unir_fuentes_visibles(self.fuentes).order_by("-orden_fecha", "-orden_id", "fuente"))
+
+        with self.assertNumQueries(2):
+            cargadas = cargar_filas_visibles(filas, self.fuentes)
+
+        self.assertEqual([fuente for fuente, _ in cargadas], [fila["fuente"] for fila in filas])
+        self.assertIsInstance(cargadas[2][1], ViajeReviewSnapshot)
+        self.assertEqual(
+            [getattr(objeto, "viaje_id", objeto.id) for _, objeto in cargadas],
+            [fila["orden_id"] for fila in filas],
+        )
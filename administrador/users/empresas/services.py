@@ -5,18 +5,28 @@ import calendar
 import csv
 import random
 import string
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import date
 from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 
+import numpy as np
 from django.db import transaction
-from django.db.models import QuerySet
+from django.db.models import Count, Exists, OuterRef, QuerySet
+from django.db.models.functions import ExtractYear
 from django.utils.text import slugify
 
 from users.common.validators import normalize_documento, validate_dni_nie_nif
 from users.email.services import send_welcome_email
-from users.models import CustomUser, EmpleadoProfile, EmpresaProfile
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile
 
 EXENCION_7P_MAXIMA = Decimal('60100.00')
 
+# Cálculo por lotes en céntimos: denominador común de los años de 365 y 366 días
+_DENOMINADOR_7P = 365 * 366
+_EXENCION_7P_MAXIMA_CENTIMOS = int(EXENCION_7P_MAXIMA * 100)
+_LIMITE_INT64_7P = 2 ** 62
+
 
 # ============================================================================
 # UTILIDADES
@@ -413,6 +423,132 @@ def calcular_exencion_7p_total(
     return importe
 
 
+def _repartir_dias_por_anio(inicio: date, total: int) -> Iterator[tuple[int, int]]:
+    """Reparte ``total`` días consecutivos desde ``inicio`` entre los años que cruzan."""
+    desde = inicio
+    while total > 0:
+        dias = min(total, (date(desde.year, 12, 31) - desde).days + 1)
+        yield desde.year, dias
+        total -= dias
+        if desde.year == date.max.year:
+            break
+        desde = date(desde.year + 1, 1, 1)
+
+
+def contar_dias_exentos_por_anio(viajes: QuerySet) -> dict[int, dict[int, int]]:
+    """
+    Días exentos por empleado y año de los viajes indicados.
+
+    Los viajes con días registrados cuentan sus días exentos con una consulta
+    agrupada por empleado y ``ExtractYear('fecha')``. Los viajes sin días
+    cuentan todos sus ``dias_viajados`` a partir de ``fecha_inicio``.
+
+    Args:
+        viajes: Viajes a considerar
+
+    Returns:
+        Diccionario ``empleado_id -> {año: días exentos}``
+    """
+    dias_por_anio: dict[int, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    filas = (
+        DiaViaje.objects
+        .filter(viaje__in=viajes.values('pk'), exento=True)
+        .annotate(anio=ExtractYear('fecha'))
+        .values('viaje__empleado_id', 'anio')
+        .annotate(dias=Count('id'))
+        .values_list('viaje__empleado_id', 'anio', 'dias')
+        .order_by()
+    )
+    for empleado_id, anio, dias in filas:
+        dias_por_anio[empleado_id][anio] += dias
+
+    sin_dias = (
+        viajes
+        .filter(~Exists(DiaViaje.objects.filter(viaje=OuterRef('pk'))))
+        .values_list('empleado_id', 'fecha_inicio', 'dias_viajados')
+        .order_by()
+    )
+    for empleado_id, inicio, total in sin_dias:
+        for anio, dias in _repartir_dias_por_anio(inicio, total or 0):
+            dias_por_anio[empleado_id][anio] += dias
+
+    return {empleado_id: dict(anios) for empleado_id, anios in dias_por_anio.items()}
+
+
+def calcular_exencion_7p_lote(
+    salarios: dict[int, Decimal | None],
+    dias_por_anio: dict[int, dict[int, int]]
+) -> dict[int, Decimal]:
+    """
+    ``calcular_exencion_7p_total`` para muchos empleados a la vez.
+
+    El prorrateo se hace con NumPy en aritmética entera de céntimos: la
+    exención exacta es ``salario * (366 * dias_365 + 365 * dias_366) / (365 * 366)``,
+    redondeada a céntimos hacia arriba en la mitad (``ROUND_HALF_UP``) y
+    limitada a ``EXENCION_7P_MAXIMA``. El resultado coincide con el cálculo
+    con ``Decimal`` salvo en los empates exactos de medio céntimo, donde el
+    redondeo intermedio de ``Decimal`` decide; esos casos, y los salarios
+    negativos, con más de dos decimales o demasiado grandes para ``int64``,
+    se calculan con ``calcular_exencion_7p_total``.
+
+    Args:
+        salarios: ``empleado_id -> salario anual``
+        dias_por_anio: ``empleado_id -> {año: días exentos}``
+
+    Returns:
+        ``empleado_id -> importe exento`` para todos los empleados de ``salarios``
+
+    Example:
+        exenciones = calcular_exencion_7p_lote(
+            {e.id: e.salario for e in empleados},
+            contar_dias_exentos_por_anio(viajes),
+        )
+    """
+    resultado: dict[int, Decimal] = {}
+    ids, centimos, dias_365, dias_366 = [], [], [], []
+
+    for empleado_id, salario in salarios.items():
+        anios = dias_por_anio.get(empleado_id)
+        if not salario or not anios:
+            resultado[empleado_id] = Decimal('0.00')
+            continue
+        salario_centimos = Decimal(salario) * 100
+        if salario_centimos < 0 or salario_centimos != salario_centimos.to_integral_value():
+            resultado[empleado_id] = calcular_exencion_7p_total(salario, anios)
+            continue
+        ids.append(empleado_id)
+        centimos.append(int(salario_centimos))
+        dias_365.append(sum(dias for anio, dias in anios.items() if not calendar.isleap(anio)))
+        dias_366.append(sum(dias for anio, dias in anios.items() if calendar.isleap(anio)))
+
+    if not ids:
+        return resultado
+
+    pesos = 366 * np.array(dias_365, dtype=np.float64) + 365 * np.array(dias_366, dtype=np.float64)
+    salarios_centimos = np.array(centimos, dtype=np.float64)
+    # El numerador se calcula en int64: las filas que no caben van por Decimal
+    cabe = 2 * salarios_centimos * pesos < _LIMITE_INT64_7P
+
+    numerador = (
+        np.where(cabe, salarios_centimos, 0).astype(np.int64)
+        * np.where(cabe, pesos, 0).astype(np.int64)
+    )
+    redondeado = (2 * numerador + _DENOMINADOR_7P) // (2 * _DENOMINADOR_7P)
+    importe = np.minimum(redondeado, _EXENCION_7P_MAXIMA_CENTIMOS)
+    empate = numerador % _DENOMINADOR_7P == _DENOMINADOR_7P // 2
+
+    for posicion, empleado_id in enumerate(ids):
+        if not cabe[posicion] or empate[posicion]:
+            resultado[empleado_id] = calcular_exencion_7p_total(
+                salarios[empleado_id], dias_por_anio[empleado_id]
+            )
+        else:
+            resultado[empleado_id] = Decimal(int(importe[posicion])).scaleb(-2)
+
+    return resultado
+
+
 # ============================================================================
 # QUERIES ESPECIALES
 # ============================================================================
@@ -0,0 +1,92 @@
+"""
+Tests para el cálculo por lotes de la exención 7P.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from users.empresas.services import (
+    EXENCION_7P_MAXIMA,
+    calcular_exencion_7p_lote,
+    calcular_exencion_7p_total,
+    contar_dias_exentos_por_anio,
+)
+from users.models import DiaViaje, EmpleadoProfile, EmpresaProfile, Viaje
+
+User = get_user_model()
+
+
+class CalcularExencion7PLoteTest(SimpleTestCase):
+    """El cálculo vectorizado coincide con el de Decimal"""
+
+    def test_coincide_con_el_calculo_decimal(self):
+        aleatorio = random.Random(7)
+        salarios, dias_por_anio = {}, {}
+        for empleado_id in range(3000):
+            salarios[empleado_id] = Decimal(aleatorio.randint(0, 30_000_000)) / 100
+            anios = aleatorio.sample(range(2019, 2031), aleatorio.randint(0, 3))
+            dias_por_anio[empleado_id] = {anio: aleatorio.randint(0, 400) for anio in anios}
+        salarios[3000], dias_por_anio[3000] = None, {2024: 10}
+        salarios[3001], dias_por_anio[3001] = Decimal('-1000.00'), {2024: 10}
+        salarios[3002], dias_por_anio[3002] = Decimal('99999999.99'), {2023: 365}
+
+        exenciones = calcular_exencion_7p_lote(salarios, dias_por_anio)
+
+        for empleado_id, salario in salarios.items():
+            esperado = calcular_exencion_7p_total(salario, dias_por_anio[empleado_id])
+            self.assertEqual(str(exenciones[empleado_id]), str(esperado), empleado_id)
+        self.assertEqual(exenciones[3002], EXENCION_7P_MAXIMA)
+
+    def test_empates_de_medio_centimo_usan_decimal(self):
+        # 183 céntimos / 366 * 1 día = 0.5 céntimos exactos: decide el redondeo de Decimal
+        salarios = {1: Decimal('1.83'), 2: Decimal('5.49'), 3: Decimal('1.83')}
+        dias_por_anio = {1: {2024: 1}, 2: {2024: 1}, 3: {2024: 3}}
+
+        exenciones = calcular_exencion_7p_lote(salarios, dias_por_anio)
+
+        for empleado_id in salarios:
+            self.assertEqual(
+                exenciones[empleado_id],
+                calcular_exencion_7p_total(salarios[empleado_id], dias_por_anio[empleado_id]),
+            )
+        self.assertEqual(exenciones[1], Decimal('0.01'))
+
+
+class ContarDiasExentosPorAnioTest(TestCase):
+    def setUp(self):
+        empresa_user = User.objects.create_user(
+            username="empresa_7p", email="empresa_7p@test.com", password="test123", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user, nombre_empresa="Empresa 7P", nif="B75000001", correo_contacto="e7p@test.com",
+        )
+        empleado_user = User.objects.create_user(
+            username="empleado_7p", email="empleado_7p@test.com", password="test123", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Ana", apellido="Siete", dni="75000001P",
+        )
+
+    def _viaje(self, inicio, fin, dias_viajados):
+        return Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Oporto", fecha_inicio=inicio,
+            fecha_fin=fin, dias_viajados=dias_viajados, estado="EN_REVISION",
+        )
+
+    def test_dias_registrados_y_viajes_sin_dias(self):
+        con_dias = self._viaje(date(2023, 12, 30), date(2024, 1, 2), 4)
+        for fecha, exento in [
+            (date(2023, 12, 30), True), (date(2023, 12, 31), False),
+            (date(2024, 1, 1), True), (date(2024, 1, 2), True),
+        ]:
+            DiaViaje.objects.create(viaje=con_dias, fecha=fecha, exento=exento)
+        # Sin días registrados: cuenta todos los días desde fecha_inicio
+        self._viaje(date(2024, 12, 30), date(2025, 1, 3), 5)
+
+        with self.assertNumQueries(2):
+            dias_por_anio = contar_dias_exentos_por_anio(Viaje.objects.all())
+
+        self.assertEqual(dias_por_anio, {self.empleado.id: {2023: 1, 2024: 4, 2025: 3}})
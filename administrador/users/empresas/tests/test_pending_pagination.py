@@ -0,0 +1,111 @@
+"""
+Tests para la paginación por cursor de /empleados/pending/
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Viaje
+
+API_BASE_URL = '/api/users'
+
+
+class PendingPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        master = CustomUser.objects.create_user(
+            username="master_pending", email="master_pending@test.com", password="pass", role="MASTER"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(master).access_token}')
+        self.total_empresas = 0
+
+    def _crear_empresa(self, nombre: str, empleados: list[tuple[str, str]]) -> EmpresaProfile:
+        indice = self.total_empresas
+        self.total_empresas += 1
+        empresa = EmpresaProfile.objects.create(
+            user=CustomUser.objects.create_user(
+                username=f"empresa_pending_{indice}", email=f"empresa_pending_{indice}@test.com",
+                password="pass", role="EMPRESA",
+            ),
+            nombre_empresa=nombre,
+            nif=f"B7600{indice:04d}",
+            correo_contacto=f"pending{indice}@test.com",
+        )
+        for numero, (nombre_empleado, apellido) in enumerate(empleados):
+            empleado = EmpleadoProfile.objects.create(
+                user=CustomUser.objects.create_user(
+                    username=f"empleado_pending_{indice}_{numero}",
+                    email=f"empleado_pending_{indice}_{numero}@test.com",
+                    password="pass", role="EMPLEADO",
+                ),
+                empresa=empresa,
+                nombre=nombre_empleado,
+                apellido=apellido,
+                dni=f"76{indice:03d}{numero:03d}P",
+                salario=Decimal('36500.00'),
+            )
+            for mes in (3, 4):
+                viaje = Viaje.objects.create(
+                    empleado=empleado, empresa=empresa, destino="Lisboa",
+                    fecha_inicio=date(2024, mes, 1), fecha_fin=date(2024, mes, 2),
+                    estado="EN_REVISION", dias_viajados=2,
+                )
+                DiaViaje.objects.create(viaje=viaje, fecha=date(2024, mes, 1), exento=True)
+                DiaViaje.objects.create(viaje=viaje, fecha=date(2024, mes, 2), exento=False)
+        return empresa
+
+    def _pagina(self, params: dict):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(f'{API_BASE_URL}/empleados/pending/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(contexto.captured_queries)
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        self._crear_empresa("Beta", [("Ana", "Zapata"), ("Ana", "Alonso")])
+        self._crear_empresa("Alfa", [("Carla", "Ruiz"), ("Bruno", "Ruiz"), ("Bruno", "Ruiz")])
+
+        sin_paginar, _ = self._pagina({})
+        esperado = [(e['empresa'], e['nombre'], e['apellido']) for e in sin_paginar]
+        self.assertEqual(esperado, [
+            ("Alfa", "Bruno", "Ruiz"), ("Alfa", "Bruno", "Ruiz"), ("Alfa", "Carla", "Ruiz"),
+            ("Beta", "Ana", "Alonso"), ("Beta", "Ana", "Zapata"),
+        ])
+
+        vistos = []
+        params = {'page_size': 2}
+        while True:
+            data, _ = self._pagina(params)
+            vistos.extend(data['results'])
+            if data['next_cursor'] is None:
+                break
+            params = {'page_size': 2, 'cursor': data['next_cursor']}
+
+        self.assertEqual([e['id'] for e in vistos], [e['id'] for e in sin_paginar])
+        primero = vistos[0]
+        self.assertEqual(primero['total_viajes_pendientes'], 2)
+        self.assertEqual([v['dias_exentos'] for v in primero['viajes_pendientes']], [1, 1])
+        # 36500 / 366 * 2 días de 2024
+        self.assertEqual(primero['descuento_viajes'], '199.45')
+
+    def test_consultas_por_pagina_independientes_del_numero_de_empresas(self):
+        self._crear_empresa("Alfa", [("Ana", "Uno"), ("Bea", "Dos")])
+        _, consultas_una_empresa = self._pagina({'page_size': 2})
+
+        for indice in range(6):
+            self._crear_empresa(f"Zeta {indice}", [("Ana", "Uno"), ("Bea", "Dos")])
+        data, consultas_siete_empresas = self._pagina({'page_size': 2})
+
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(consultas_siete_empresas, consultas_una_empresa)
+
+    def test_cursor_invalido(self):
+        response = self.client.get(f'{API_BASE_URL}/empleados/pending/', {'cursor': 'no-es-un-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,10 +2,8 @@
 ViewSets para gestión de empresas y empleados con DRF.
 Usa lógica de negocio de common/services y permissions personalizados.
 """
-from collections import defaultdict
-from datetime import timedelta
 
-from django.db.models import Prefetch
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
 from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
@@ -15,6 +13,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from users.common.exceptions import EmpresaProfileNotFoundError
+from users.common.pagination import KeysetPagination
 from users.common.services import (
     ensure_company_is_up_to_date,
     filter_queryset_by_empresa,
@@ -41,7 +40,8 @@ from .serializers import (
     EmpresaWithEmpleadosSerializer,
 )
 from .services import (
-    calcular_exencion_7p_total,
+    calcular_exencion_7p_lote,
+    contar_dias_exentos_por_anio,
     create_empleado,
     create_empresa,
     delete_empleado,
@@ -50,6 +50,9 @@ from .services import (
     update_empresa_permissions,
 )
 
+# Orden de /empleados/pending/; el id desempata para la paginación por cursor
+PENDING_ORDERING = ('empresa__nombre_empresa', 'nombre', 'apellido', 'id')
+
 
 class EmpresaViewSet(viewsets.ModelViewSet):
     """
@@ -430,6 +433,11 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         Filtros opcionales:
         - ?empresa=1 - Filtrar por empresa (solo MASTER)
 
+        Paginación por cursor (opcional, ordenada por empresa, nombre y apellido):
+        - ?page_size=50 - Activa la paginación; la respuesta pasa a ser
+          ``{"next", "next_cursor", "results": [...]}``
+        - ?cursor=... - Página siguiente (valor de ``next_cursor``)
+
         Returns:
             [
                 {
@@ -470,70 +478,61 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-        dias_prefetch = Prefetch(
-            'dias',
-            queryset=DiaViaje.objects.only('fecha', 'exento'),
-            to_attr='dias_cache'
-        )
+        viajes_pendientes = Viaje.objects.filter(estado__in=['EN_REVISION', 'REABIERTO', 'REVISADO'])
+        if empresa_filter:
+            viajes_pendientes = viajes_pendientes.filter(empresa=empresa_filter)
 
+        # Días exentos por viaje contados en SQL en lugar de recorrer los días
         viajes_queryset = (
-            Viaje.objects
-            .filter(estado__in=['EN_REVISION', 'REABIERTO', 'REVISADO'])
-            .prefetch_related(dias_prefetch)
+            viajes_pendientes
+            .annotate(
+                dias_exentos_registrados=Count('dias', filter=Q(dias__exento=True)),
+                tiene_dias=Exists(DiaViaje.objects.filter(viaje=OuterRef('pk'))),
+            )
             .order_by('fecha_inicio')
         )
-        if empresa_filter:
-            viajes_queryset = viajes_queryset.filter(empresa=empresa_filter)
 
+        # Exists en lugar de join + distinct: una fila por empleado
         queryset = (
-            EmpleadoProfile.objects.filter(viaje__estado__in=['EN_REVISION', 'REABIERTO', 'REVISADO'])
+            EmpleadoProfile.objects
+            .filter(Exists(viajes_pendientes.filter(empleado=OuterRef('pk'))))
             .select_related('user', 'empresa')
             .prefetch_related(
             Prefetch(
                 'viaje_set',
-                queryset=viajes_queryset.order_by('fecha_inicio'),
+                queryset=viajes_queryset,
                 to_attr='viajes_pendientes'
             )
             )
-            .distinct()
         )
 
         if empresa_filter:
             queryset = queryset.filter(empresa=empresa_filter)
 
+        paginador = KeysetPagination(PENDING_ORDERING)
+        if paginador.is_requested(request):
+            empleados = paginador.paginate_queryset(queryset, request)
+        else:
+            empleados = list(queryset.order_by(*PENDING_ORDERING))
+
+        # Exención 7P de los empleados de la página en una pasada
+        exenciones = calcular_exencion_7p_lote(
+            {empleado.id: empleado.salario for empleado in empleados},
+            contar_dias_exentos_por_anio(viajes_pendientes.filter(empleado__in=[e.id for e in empleados])),
+        )
+
         # Serializar con viajes anidados
         data = []
-        empleados_vistos = set()
-        for empleado in queryset.order_by('empresa__nombre_empresa', 'nombre', 'apellido'):
-            if empleado.id in empleados_vistos:
-                continue
-            empleados_vistos.add(empleado.id)
-
-            empleado_data = EmpleadoProfileSerializer(empleado).data
+        for empleado, empleado_data in zip(
+            empleados, EmpleadoProfileSerializer(empleados, many=True).data, strict=True
+        ):
 
             viajes_data = []
-            dias_por_anio_total = defaultdict(int)
             for viaje in getattr(empleado, 'viajes_pendientes', []):
-                dias_por_anio_viaje = defaultdict(int)
-                dias_exentos_viaje = 0
-                dias_registrados = getattr(viaje, 'dias_cache', [])
-                if dias_registrados:
-                    for dia in dias_registrados:
-                        if not dia.exento:
-                            continue
-                        year = dia.fecha.year
-                        dias_por_anio_total[year] += 1
-                        dias_por_anio_viaje[year] += 1
-                        dias_exentos_viaje += 1
+                if viaje.tiene_dias:
+                    dias_exentos_viaje = viaje.dias_exentos_registrados
                 else:
-                    total = viaje.dias_viajados or 0
-                    current_date = viaje.fecha_inicio
-                    for _ in range(total):
-                        year = current_date.year
-                        dias_por_anio_total[year] += 1
-                        dias_por_anio_viaje[year] += 1
-                        dias_exentos_viaje += 1
-                        current_date = current_date + timedelta(days=1)
+                    dias_exentos_viaje = viaje.dias_viajados or 0
 
                 viajes_data.append({
                     "id": viaje.id,
@@ -552,8 +551,9 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
 
             empleado_data['viajes_pendientes'] = viajes_data
             empleado_data['total_viajes_pendientes'] = len(viajes_data)
-            total_exento = calcular_exencion_7p_total(empleado.salario, dias_por_anio_total)
-            empleado_data['descuento_viajes'] = str(total_exento)
+            empleado_data['descuento_viajes'] = str(exenciones[empleado.id])
             data.append(empleado_data)
 
+        if paginador.is_requested(request):
+            return paginador.get_paginated_response(data)
         return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,232 @@
+"""
+Caché en disco de exportaciones CSV/ZIP.
+
+Los artefactos se guardan por empresa, alcance (rol, tipo de exportación y
+empleado) y publicación (``last_release_at``). Como las exportaciones leen
+las filas vivas, la clave incluye además una huella de los datos exportados
+(``updated_at`` y recuentos) para no servir un archivo obsoleto si algo
+cambia entre dos publicaciones. El directorio se limita por tamaño expulsando primero los
+artefactos usados hace más tiempo (LRU por fecha de modificación).
+"""
+import hashlib
+import os
+import uuid
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO
+
+from django.conf import settings
+from django.db.models import Count, Max, QuerySet
+
+from users.common.services import get_user_empleado, get_user_empresa
+from users.models import CustomUser, DiaViaje, EmpresaProfile, Gasto, Viaje
+
+DEFAULT_EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+SUFIJO_TEMPORAL = ".tmp"
+
+
+class ExportArtifactCache:
+    """
+    Almacén LRU de artefactos de exportación acotado por tamaño total.
+
+    Args:
+        directorio: Carpeta donde se guardan los artefactos
+        max_bytes: Tamaño máximo del directorio; 0 desactiva la caché
+    """
+
+    def __init__(self, directorio: str, max_bytes: int) -> None:
+        self.directorio = str(directorio)
+        self.max_bytes = max_bytes
+
+    @property
+    def activa(self) -> bool:
+        return self.max_bytes > 0
+
+    def ruta(self, clave: str, extension: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.{extension}")
+
+    def abrir(self, clave: str, extension: str) -> BinaryIO | None:
+        """
+        Abre un artefacto cacheado y lo marca como usado recientemente.
+
+        Returns:
+            Archivo abierto en modo binario o None si no está en caché
+        """
+        if not self.activa:
+            return None
+
+        ruta = self.ruta(clave, extension)
+        try:
+            archivo = open(ruta, "rb")  # lo cierra la respuesta
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        return archivo
+
+    def guardar_mientras_se_envia(
+        self,
+        clave: str,
+        extension: str,
+        bloques: Iterable[bytes | str]
+    ) -> Iterator[bytes | str]:
+        """
+        Reenvía los bloques de una exportación copiándolos a la caché.
+
+        El artefacto solo se publica (con un ``os.replace`` atómico) si el
+        generador se consume entero; si el cliente corta la descarga se
+        descarta el archivo parcial.
+
+        Args:
+            clave: Clave del artefacto
+            extension: Extensión del archivo (csv, zip)
+            bloques: Generador de la exportación
+
+        Yields:
+            Los mismos bloques recibidos
+        """
+        if not self.activa:
+            yield from bloques
+            return
+
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(clave, extension)
+        temporal = f"{ruta}.{uuid.uuid4().hex}{SUFIJO_TEMPORAL}"
+        publicado = False
+
+        try:
+            with open(temporal, "wb") as destino:
+                for bloque in bloques:
+                    destino.write(bloque.encode("utf-8") if isinstance(bloque, str) else bloque)
+                    yield bloque
+            os.replace(temporal, ruta)
+            publicado = True
+            self.recortar()
+        finally:
+            if not publicado and os.path.exists(temporal):
+                os.remove(temporal)
+
+    def recortar(self) -> None:
+        """Expulsa los artefactos menos usados hasta respetar ``max_bytes``"""
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return
+
+        artefactos = []
+        total = 0
+        for nombre in nombres:
+            if nombre.endswith(SUFIJO_TEMPORAL):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            artefactos.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+        artefactos.sort()
+        for _mtime, tamano, ruta in artefactos:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+
+
+def get_export_cache() -> ExportArtifactCache:
+    """Devuelve la caché configurada en settings (``EXPORT_CACHE_DIR``/``EXPORT_CACHE_MAX_BYTES``)"""
+    directorio = getattr(settings, "EXPORT_CACHE_DIR", None) or os.path.join(
+        settings.BASE_DIR, "export_cache"
+    )
+    max_bytes = getattr(settings, "EXPORT_CACHE_MAX_BYTES", DEFAULT_EXPORT_CACHE_MAX_BYTES)
+    return ExportArtifactCache(directorio, int(max_bytes or 0))
+
+
+# ============================================================================
+# CLAVES DE CACHÉ
+# ============================================================================
+
+def _empresa_de_usuario(usuario: CustomUser) -> EmpresaProfile | None:
+    if usuario.role == "EMPRESA":
+        return get_user_empresa(usuario)
+    if usuario.role == "EMPLEADO":
+        empleado = get_user_empleado(usuario)
+        return empleado.empresa if empleado else None
+    return None
+
+
+def calcular_huella_datos(viajes: QuerySet) -> str:
+    """
+    Resume en cuatro consultas el estado de los datos exportados.
+
+    Los altas y bajas de viajes, días y gastos cambian su número o su id
+    máximo y cualquier edición cambia su ``updated_at`` máximo. Los perfiles
+    no guardan fecha de modificación, así que entran las columnas que se
+    exportan de ellos (nombre, apellido y DNI del empleado y nombre de la
+    empresa), una fila por empleado.
+
+    Args:
+        viajes: QuerySet de viajes que se va a exportar
+
+    Returns:
+        Hash hexadecimal de los agregados
+    """
+    ids = viajes.order_by().values("pk")
+    agregados = {"total": Count("id"), "ultimo": Max("id"), "modificado": Max("updated_at")}
+
+    resumen_viajes = Viaje.objects.filter(pk__in=ids).aggregate(**agregados)
+    resumen_dias = DiaViaje.objects.filter(viaje__in=ids).aggregate(**agregados)
+    resumen_gastos = Gasto.objects.filter(viaje__in=ids).aggregate(**agregados)
+    perfiles = list(
+        Viaje.objects.filter(pk__in=ids)
+        .values_list("empleado_id", "empleado__nombre", "empleado__apellido", "empleado__dni",
+                     "empresa__nombre_empresa")
+        .distinct()
+        .order_by("empleado_id", "empresa__nombre_empresa")
+    )
+
+    contenido = repr((
+        sorted(resumen_viajes.items()), sorted(resumen_dias.items()), sorted(resumen_gastos.items()), perfiles,
+    ))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def clave_exportacion(
+    usuario: CustomUser,
+    tipo: str,
+    viajes: QuerySet,
+    empleado_id: int | None = None,
+    filtros: dict | None = None
+) -> str | None:
+    """
+    Calcula la clave de caché de una exportación.
+
+    Args:
+        usuario: Usuario que descarga la exportación
+        tipo: Uno de ``ExportJob.TIPO_CHOICES``
+        viajes: QuerySet de viajes que se va a exportar
+        empleado_id: Empleado concreto exportado (opcional)
+        filtros: Filtros aplicados a la exportación (opcional)
+
+    Returns:
+        Clave hexadecimal, o None si la exportación no es cacheable
+        (MASTER no está ligado a una única empresa)
+    """
+    if not isinstance(viajes, QuerySet):
+        return None
+
+    empresa = _empresa_de_usuario(usuario)
+    if empresa is None:
+        return None
+
+    filtros_normalizados = sorted((clave, str(valor)) for clave, valor in (filtros or {}).items())
+    alcance = f"{usuario.role}:{usuario.pk}:{tipo}:{empleado_id or ''}:{filtros_normalizados}"
+    publicacion = empresa.last_release_at.isoformat() if empresa.last_release_at else ""
+    partes = (str(empresa.pk), alcance, publicacion, calcular_huella_datos(viajes))
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
@@ -0,0 +1,325 @@
+"""
+Exportaciones en segundo plano.
+
+Las peticiones crean un ``ExportJob`` en estado PENDIENTE y el comando
+``procesar_exportaciones`` actúa como worker: reclama trabajos de la cola en
+base de datos, genera el CSV o ZIP con los mismos generadores que las vistas
+síncronas y guarda el resultado en un storage privado fuera de MEDIA
+(``EXPORT_JOBS_DIR``) con nombre aleatorio; solo se descarga a través de la
+vista de descarga del trabajo.
+
+Mientras procesa, el worker renueva ``ultimo_latido``. Si un worker muere,
+su trabajo deja de latir y el siguiente sondeo de la cola lo devuelve a
+PENDIENTE (o lo marca como ERROR si ya agotó sus intentos).
+"""
+import logging
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Iterator
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.common.services import get_user_empresa
+from users.models import CustomUser, EmpleadoProfile, ExportJob, Viaje
+
+from .serializers import ExportFiltrosSerializer
+from .services import (
+    filtrar_viajes_exportacion,
+    iterar_csv_viajes_con_gastos,
+    iterar_csv_viajes_empresa,
+    iterar_csv_viajes_master,
+    iterar_viajes,
+    iterar_zip_viajes_con_gastos,
+    obtener_viajes_para_exportacion,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos viajes se persiste el progreso del trabajo
+PROGRESO_INTERVALO_FILAS = 200
+# Segundos máximos entre latidos aunque no se completen filas (comprobantes grandes)
+LATIDO_INTERVALO_SEGUNDOS = 30
+
+# Mensajes que ve el cliente; el detalle de la excepción solo va al log
+ERROR_EXPORTACION = "No se pudo generar la exportación."
+ERROR_EXPORTACION_INTERRUMPIDA = "La exportación se interrumpió demasiadas veces."
+
+
+class ExportacionResuelta(NamedTuple):
+    viajes: Iterable[Viaje]
+    nombre_archivo: str
+    escritor: Callable[[Iterable[Viaje]], Iterator]
+    con_gastos: bool
+
+
+def resolver_exportacion(
+    usuario: CustomUser,
+    tipo: str,
+    empleado: EmpleadoProfile | None = None,
+    filtros: dict | None = None
+) -> ExportacionResuelta:
+    """
+    Determina viajes, nombre de archivo y generador para un tipo de exportación.
+
+    Args:
+        usuario: Usuario que solicitó la exportación
+        tipo: Uno de ``ExportJob.TIPO_CHOICES``
+        empleado: Empleado concreto a exportar (opcional)
+        filtros: Filtros ya validados (ver ``ExportFiltrosSerializer``)
+
+    Returns:
+        ExportacionResuelta
+
+    Raises:
+        ValueError: Si el tipo no es válido o el usuario no tiene perfil
+    """
+    if tipo == ExportJob.TIPO_MASTER_CSV:
+        viajes = filtrar_viajes_exportacion(Viaje.objects.filter(estado="REVISADO"), filtros)
+        return ExportacionResuelta(
+            viajes, "viajes_todas_empresas.csv", iterar_csv_viajes_master, False
+        )
+
+    if tipo == ExportJob.TIPO_EMPRESA_CSV:
+        empresa = get_user_empresa(usuario)
+        if not empresa:
+            raise ValueError("No tienes un perfil de empresa asociado")
+        viajes = filtrar_viajes_exportacion(
+            Viaje.objects.filter(empresa=empresa, estado="REVISADO"), filtros
+        )
+        return ExportacionResuelta(
+            viajes, f"{empresa.nombre_empresa}_viajes.csv", iterar_csv_viajes_empresa, False
+        )
+
+    if tipo in (ExportJob.TIPO_VIAJES_GASTOS_CSV, ExportJob.TIPO_VIAJES_GASTOS_ZIP):
+        empleado_id = empleado.id if empleado else None
+        viajes, filename_base = obtener_viajes_para_exportacion(
+            usuario, empleado_id=empleado_id, filtros=filtros
+        )
+
+        if tipo == ExportJob.TIPO_VIAJES_GASTOS_CSV:
+            sufijo = "viajes_detallados.csv" if empleado else "viajes_con_gastos.csv"
+            return ExportacionResuelta(
+                viajes, f"{filename_base}_{sufijo}", iterar_csv_viajes_con_gastos, True
+            )
+
+        sufijo = "viajes_detallados.zip" if empleado else "viajes_completos.zip"
+
+        def escritor_zip(viajes_iterables):
+            return iterar_zip_viajes_con_gastos(viajes_iterables, rol_usuario=usuario.role)
+
+        return ExportacionResuelta(viajes, f"{filename_base}_{sufijo}", escritor_zip, True)
+
+    raise ValueError(f"Tipo de exportación no reconocido: {tipo}")
+
+
+class _ProgresoExportacion:
+    """Lleva la cuenta de viajes y bytes procesados y la persiste periódicamente."""
+
+    def __init__(self, job: ExportJob) -> None:
+        self.job = job
+        self.filas = 0
+        self.bytes = 0
+        self._ultimo_guardado = time.monotonic()
+
+    def contar_viajes(self, viajes: Iterable[Viaje]) -> Iterator[Viaje]:
+        for viaje in viajes:
+            self.filas += 1
+            if self.filas % PROGRESO_INTERVALO_FILAS == 0:
+                self.guardar()
+            yield viaje
+
+    def contar_bytes(self, total: int) -> None:
+        self.bytes += total
+        if time.monotonic() - self._ultimo_guardado >= LATIDO_INTERVALO_SEGUNDOS:
+            self.guardar()
+
+    def guardar(self) -> None:
+        """Persiste el progreso y renueva el latido del trabajo."""
+        self._ultimo_guardado = time.monotonic()
+        ExportJob.objects.filter(pk=self.job.pk, intentos=self.job.intentos).update(
+            filas_procesadas=self.filas,
+            bytes_procesados=self.bytes,
+            ultimo_latido=timezone.now(),
+        )
+
+
+def crear_export_job(
+    usuario: CustomUser,
+    tipo: str,
+    empleado: EmpleadoProfile | None = None,
+    filtros: dict | None = None
+) -> ExportJob:
+    """
+    Encola una exportación para que la procese el worker.
+
+    Args:
+        usuario: Usuario que solicita la exportación
+        tipo: Uno de ``ExportJob.TIPO_CHOICES``
+        empleado: Empleado concreto a exportar (opcional)
+        filtros: Filtros serializados a JSON (fechas en ISO 8601)
+
+    Returns:
+        ExportJob creado en estado PENDIENTE
+    """
+    return ExportJob.objects.create(
+        usuario=usuario, tipo=tipo, empleado=empleado, filtros=filtros or {}
+    )
+
+
+def _filtros_del_job(job: ExportJob) -> dict:
+    serializer = ExportFiltrosSerializer(data=job.filtros or {})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def reencolar_jobs_caducados(now=None) -> int:
+    """
+    Devuelve a la cola los trabajos EN_PROCESO cuyo worker ha dejado de latir.
+
+    Un trabajo sin latido durante ``EXPORT_JOB_TIMEOUT_SECONDS`` se da por
+    huérfano. Vuelve a PENDIENTE si le quedan intentos y, si no, se marca
+    como ERROR para no reintentar sin fin una exportación que tumba al worker.
+
+    Args:
+        now: Marca de tiempo de referencia (por defecto, ahora)
+
+    Returns:
+        Número de trabajos devueltos a la cola
+    """
+    now = now or timezone.now()
+    limite = now - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT_SECONDS)
+    caducados = ExportJob.objects.filter(estado=ExportJob.ESTADO_EN_PROCESO).filter(
+        Q(ultimo_latido__lt=limite) | Q(ultimo_latido__isnull=True, fecha_inicio__lt=limite)
+    )
+
+    agotados = caducados.filter(intentos__gte=settings.EXPORT_JOB_MAX_INTENTOS).update(
+        estado=ExportJob.ESTADO_ERROR, error=ERROR_EXPORTACION_INTERRUMPIDA, fecha_fin=now
+    )
+    if agotados:
+        logger.warning("%s exportaciones agotaron sus intentos sin terminar", agotados)
+
+    reencolados = caducados.update(estado=ExportJob.ESTADO_PENDIENTE, ultimo_latido=None)
+    if reencolados:
+        logger.warning("%s exportaciones huérfanas devueltas a la cola", reencolados)
+    return reencolados
+
+
+def reclamar_siguiente_job() -> ExportJob | None:
+    """
+    Reclama el trabajo pendiente más antiguo de la cola.
+
+    El paso a EN_PROCESO se hace con un UPDATE condicionado al estado, así
+    que varios workers pueden sondear la misma cola sin procesar dos veces
+    el mismo trabajo. Antes se reencolan los trabajos huérfanos (ver
+    ``reencolar_jobs_caducados``).
+
+    Returns:
+        ExportJob reclamado o None si no hay trabajos pendientes
+    """
+    reencolar_jobs_caducados()
+    candidatos = list(
+        ExportJob.objects
+        .filter(estado=ExportJob.ESTADO_PENDIENTE)
+        .order_by("fecha_creacion", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in candidatos:
+        ahora = timezone.now()
+        reclamado = ExportJob.objects.filter(
+            pk=job_id,
+            estado=ExportJob.ESTADO_PENDIENTE,
+        ).update(
+            estado=ExportJob.ESTADO_EN_PROCESO,
+            fecha_inicio=ahora,
+            ultimo_latido=ahora,
+            intentos=F("intentos") + 1,
+        )
+        if reclamado:
+            return ExportJob.objects.select_related("usuario", "empleado").get(pk=job_id)
+    return None
+
+
+def ejecutar_export_job(job: ExportJob) -> ExportJob:
+    """
+    Genera el archivo de un trabajo reclamado y lo guarda en el storage privado.
+
+    Args:
+        job: Trabajo en estado EN_PROCESO
+
+    Returns:
+        El mismo trabajo, en estado COMPLETADO o ERROR, o recargado de la
+        base de datos si otro worker lo reclamó mientras tanto
+    """
+    progreso = _ProgresoExportacion(job)
+
+    try:
+        exportacion = resolver_exportacion(
+            job.usuario, job.tipo, job.empleado, _filtros_del_job(job)
+        )
+        viajes = progreso.contar_viajes(
+            iterar_viajes(exportacion.viajes, con_gastos=exportacion.con_gastos)
+        )
+
+        with tempfile.TemporaryFile() as destino:
+            for bloque in exportacion.escritor(viajes):
+                if isinstance(bloque, str):
+                    bloque = bloque.encode("utf-8")
+                destino.write(bloque)
+                progreso.contar_bytes(len(bloque))
+
+            destino.seek(0)
+            job.archivo.save(exportacion.nombre_archivo, File(destino), save=False)
+
+        job.nombre_archivo = exportacion.nombre_archivo
+        job.estado = ExportJob.ESTADO_COMPLETADO
+        job.error = ""
+    except Exception:
+        logger.exception("Error procesando la exportación %s", job.pk)
+        job.estado = ExportJob.ESTADO_ERROR
+        job.error = ERROR_EXPORTACION
+
+    job.filas_procesadas = progreso.filas
+    job.bytes_procesados = progreso.bytes
+    job.fecha_fin = timezone.now()
+
+    # Solo cierra el trabajo si sigue siendo de este worker: si se reencoló
+    # por falta de latido, otro worker lo ha vuelto a reclamar
+    cerrado = ExportJob.objects.filter(
+        pk=job.pk, estado=ExportJob.ESTADO_EN_PROCESO, intentos=job.intentos
+    ).update(
+        estado=job.estado,
+        error=job.error,
+        archivo=job.archivo.name or "",
+        nombre_archivo=job.nombre_archivo,
+        filas_procesadas=job.filas_procesadas,
+        bytes_procesados=job.bytes_procesados,
+        fecha_fin=job.fecha_fin,
+    )
+    if not cerrado:
+        logger.warning("La exportación %s se reasignó antes de terminar; se descarta el resultado", job.pk)
+        if job.archivo:
+            job.archivo.delete(save=False)
+        job.refresh_from_db()
+    return job
+
+
+def procesar_cola_exportaciones(max_jobs: int | None = None) -> int:
+    """
+    Procesa trabajos pendientes hasta vaciar la cola o alcanzar ``max_jobs``.
+
+    Returns:
+        Número de trabajos procesados
+    """
+    procesados = 0
+    while max_jobs is None or procesados < max_jobs:
+        job = reclamar_siguiente_job()
+        if job is None:
+            break
+        ejecutar_export_job(job)
+        procesados += 1
+    return procesados
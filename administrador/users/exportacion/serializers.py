@@ -0,0 +1,67 @@
+"""
+Serializers del módulo de exportación
+"""
+from django.urls import reverse
+from rest_framework import serializers
+
+from users.models import ExportJob, Viaje
+
+
+class ExportFiltrosSerializer(serializers.Serializer):
+    """Filtros opcionales comunes a todas las exportaciones"""
+    fecha_desde = serializers.DateField(required=False)
+    fecha_hasta = serializers.DateField(required=False)
+    estado = serializers.ChoiceField(choices=Viaje.ESTADO_CHOICES, required=False)
+    empresa_id = serializers.IntegerField(required=False, min_value=1)
+    es_internacional = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        fecha_desde = data.get('fecha_desde')
+        fecha_hasta = data.get('fecha_hasta')
+        if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
+            raise serializers.ValidationError(
+                {"fecha_hasta": "La fecha final no puede ser anterior a la fecha inicial"}
+            )
+        return data
+
+
+class ExportJobCreateSerializer(serializers.Serializer):
+    """Valida la solicitud de una exportación en segundo plano"""
+    tipo = serializers.ChoiceField(choices=ExportJob.TIPO_CHOICES)
+    empleado_id = serializers.IntegerField(required=False, allow_null=True)
+    filtros = ExportFiltrosSerializer(required=False)
+
+    def validate(self, data):
+        tipo = data['tipo']
+        if data.get('empleado_id') and tipo not in (
+            ExportJob.TIPO_VIAJES_GASTOS_CSV,
+            ExportJob.TIPO_VIAJES_GASTOS_ZIP,
+        ):
+            raise serializers.ValidationError(
+                {"empleado_id": "Solo se puede indicar empleado en exportaciones de viajes con gastos"}
+            )
+        return data
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Estado y progreso de una exportación en segundo plano"""
+    empleado_id = serializers.IntegerField(read_only=True, allow_null=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'tipo', 'empleado_id', 'filtros', 'estado',
+            'filas_procesadas', 'bytes_procesados',
+            'nombre_archivo', 'error',
+            'fecha_creacion', 'fecha_inicio', 'fecha_fin',
+            'download_url',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.estado != ExportJob.ESTADO_COMPLETADO:
+            return None
+        url = reverse('export_job_download', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
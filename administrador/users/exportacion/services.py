@@ -4,15 +4,122 @@ Servicios de lógica de negocio para exportación de datos
 import csv
 import os
 import re
+import tempfile
 import zipfile
-from io import BytesIO, StringIO
+from collections.abc import Generator, Iterable, Iterator
+from io import BytesIO
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Count, Prefetch, Q, QuerySet
 
 from users.models import EmpleadoProfile, EmpresaProfile, Gasto, Viaje
 
+from .prefetch import (
+    DEFAULT_PREFETCH_MAX_BYTES,
+    DEFAULT_PREFETCH_WORKERS,
+    ComprobanteLeido,
+    PrefetcherComprobantes,
+)
+
+# Número de viajes que se leen de la base de datos por bloque al exportar
+EXPORT_CHUNK_SIZE = 500
+
+# Tamaño de bloque al copiar comprobantes y el CSV resumen dentro del ZIP
+COMPROBANTE_CHUNK_SIZE = 64 * 1024
+
+# Tamaño a partir del cual el CSV resumen del ZIP se vuelca a disco
+CSV_SPOOL_MAX_SIZE = 1024 * 1024
+
 # ============================================================================
 # UTILIDADES
 # ============================================================================
 
+class _Echo:
+    """Pseudo-buffer que devuelve lo escrito en lugar de almacenarlo."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iterar_filas_csv(headers: list[str], filas: Iterable[list]) -> Iterator[str]:
+    """
+    Serializa filas CSV una a una sin acumularlas en memoria.
+
+    Args:
+        headers: Cabecera del CSV
+        filas: Iterable de filas (listas de valores)
+
+    Yields:
+        Cada línea CSV ya formateada
+    """
+    writer = csv.writer(_Echo(), delimiter=";")
+    yield writer.writerow(headers)
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+def preparar_viajes_para_exportacion(viajes_queryset, con_gastos: bool = True):
+    """
+    Añade al queryset todo lo que necesita la exportación en un número fijo de queries.
+
+    Anota los días exentos y no exentos con agregados condicionales y, si se
+    piden, adjunta los gastos de cada viaje con un único prefetch. Es
+    idempotente: un queryset ya preparado se devuelve sin cambios.
+
+    Args:
+        viajes_queryset: QuerySet de viajes
+        con_gastos: Si True, precarga los gastos en ``gastos_exportacion``
+
+    Returns:
+        QuerySet preparado (o el iterable recibido si no es un QuerySet)
+    """
+    if not isinstance(viajes_queryset, QuerySet):
+        return viajes_queryset
+
+    if "dias_exentos_count" not in viajes_queryset.query.annotations:
+        viajes_queryset = viajes_queryset.select_related("empresa", "empleado").annotate(
+            dias_exentos_count=Count("dias", filter=Q(dias__exento=True)),
+            dias_no_exentos_count=Count("dias", filter=Q(dias__exento=False)),
+        )
+
+    if con_gastos and not _tiene_prefetch_gastos(viajes_queryset):
+        viajes_queryset = viajes_queryset.prefetch_related(
+            Prefetch(
+                "gasto_set",
+                queryset=Gasto.objects.order_by("id"),
+                to_attr="gastos_exportacion",
+            )
+        )
+
+    return viajes_queryset
+
+
+def _tiene_prefetch_gastos(viajes_queryset: QuerySet) -> bool:
+    return any(
+        isinstance(lookup, Prefetch) and lookup.to_attr == "gastos_exportacion"
+        for lookup in viajes_queryset._prefetch_related_lookups
+    )
+
+
+def iterar_viajes(viajes_queryset, chunk_size: int = EXPORT_CHUNK_SIZE, con_gastos: bool = True):
+    """
+    Recorre un queryset de viajes por bloques para mantener la memoria acotada.
+
+    Args:
+        viajes_queryset: QuerySet (o iterable) de viajes
+        chunk_size: Número de viajes leídos por bloque
+        con_gastos: Si True, precarga los gastos de cada bloque
+
+    Returns:
+        Iterador sobre los viajes
+    """
+    viajes_queryset = preparar_viajes_para_exportacion(viajes_queryset, con_gastos=con_gastos)
+    if hasattr(viajes_queryset, "iterator"):
+        return viajes_queryset.iterator(chunk_size=chunk_size)
+    return iter(viajes_queryset)
+
+
 def safe_filename(filename: str, max_length: int = 50) -> str:
     """
     Convierte un string en un nombre de archivo/carpeta seguro.
@@ -43,38 +150,60 @@ def calcular_dias_viaje(viaje: Viaje) -> tuple[int, int, int]:
         Tupla (dias_totales, dias_exentos, dias_no_exentos)
     """
     dias_totales = viaje.dias_viajados or ((viaje.fecha_fin - viaje.fecha_inicio).days + 1)
-    dias = viaje.dias.all()
-    dias_exentos = dias.filter(exento=True).count()
-    dias_no_exentos = dias.filter(exento=False).count()
 
-    return dias_totales, dias_exentos, dias_no_exentos
+    # Usar los conteos anotados por preparar_viajes_para_exportacion si existen
+    dias_exentos = getattr(viaje, "dias_exentos_count", None)
+    dias_no_exentos = getattr(viaje, "dias_no_exentos_count", None)
+    if dias_exentos is None or dias_no_exentos is None:
+        dias = viaje.dias.all()
+        dias_exentos = dias.filter(exento=True).count()
+        dias_no_exentos = dias.filter(exento=False).count()
 
+    return dias_totales, dias_exentos, dias_no_exentos
 
-# ============================================================================
-# SERVICIOS DE EXPORTACIÓN CSV
-# ============================================================================
 
-def generar_csv_viajes_master(viajes_queryset) -> str:
+def obtener_gastos_viaje(viaje: Viaje) -> list[Gasto]:
     """
-    Genera CSV de viajes para MASTER (todas las empresas).
+    Devuelve los gastos de un viaje, usando el prefetch de exportación si existe.
 
     Args:
-        viajes_queryset: QuerySet de viajes
+        viaje: Viaje a analizar
 
     Returns:
-        String con contenido CSV
+        Lista de gastos ordenados por id
     """
-    output = StringIO()
-    writer = csv.writer(output, delimiter=";")
+    gastos = getattr(viaje, "gastos_exportacion", None)
+    if gastos is None:
+        gastos = list(Gasto.objects.filter(viaje=viaje).order_by("id"))
+    return gastos
+
+
+# ============================================================================
+# SERVICIOS DE EXPORTACIÓN CSV
+# ============================================================================
+
+CSV_HEADERS_MASTER = [
+    "Empresa", "Empleado", "Destino", "Fecha Inicio", "Fecha Fin",
+    "Días Exentos", "Días No Exentos", "Motivo"
+]
+
+CSV_HEADERS_EMPRESA = [
+    "Empleado", "Destino", "Fecha Inicio", "Fecha Fin",
+    "Días Exentos", "Días No Exentos", "Motivo"
+]
+
+CSV_HEADERS_VIAJES_GASTOS = [
+    "Empresa", "Empleado", "DNI", "Destino", "País", "Ciudad",
+    "Fecha Inicio", "Fecha Fin", "Estado Viaje", "Días Totales",
+    "Días Exentos", "Días No Exentos", "Concepto Gasto", "Monto",
+    "Fecha Gasto", "Estado Gasto", "Tiene Comprobante"
+]
 
-    writer.writerow([
-        "Empresa", "Empleado", "Destino", "Fecha Inicio", "Fecha Fin",
-        "Días Exentos", "Días No Exentos", "Motivo"
-    ])
 
-    for viaje in viajes_queryset:
+def _filas_viajes_master(viajes_queryset, chunk_size: int) -> Iterator[list]:
+    for viaje in iterar_viajes(viajes_queryset, chunk_size, con_gastos=False):
         _, dias_exentos, dias_no_exentos = calcular_dias_viaje(viaje)
-        writer.writerow([
+        yield [
             viaje.empresa.nombre_empresa,
             f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
             viaje.destino,
@@ -83,14 +212,26 @@ def generar_csv_viajes_master(viajes_queryset) -> str:
             dias_exentos,
             dias_no_exentos,
             viaje.motivo.replace("\n", " ").strip(),
-        ])
+        ]
 
-    return output.getvalue()
 
+def iterar_csv_viajes_master(viajes_queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Genera en streaming el CSV de viajes para MASTER (todas las empresas).
 
-def generar_csv_viajes_empresa(viajes_queryset) -> str:
+    Args:
+        viajes_queryset: QuerySet de viajes
+        chunk_size: Número de viajes leídos por bloque
+
+    Yields:
+        Líneas del CSV
     """
-    Genera CSV de viajes para EMPRESA.
+    return iterar_filas_csv(CSV_HEADERS_MASTER, _filas_viajes_master(viajes_queryset, chunk_size))
+
+
+def generar_csv_viajes_master(viajes_queryset) -> str:
+    """
+    Genera CSV de viajes para MASTER (todas las empresas).
 
     Args:
         viajes_queryset: QuerySet de viajes
@@ -98,17 +239,13 @@ def generar_csv_viajes_empresa(viajes_queryset) -> str:
     Returns:
         String con contenido CSV
     """
-    output = StringIO()
-    writer = csv.writer(output, delimiter=";")
+    return "".join(iterar_csv_viajes_master(viajes_queryset))
 
-    writer.writerow([
-        "Empleado", "Destino", "Fecha Inicio", "Fecha Fin",
-        "Días Exentos", "Días No Exentos", "Motivo"
-    ])
 
-    for viaje in viajes_queryset:
+def _filas_viajes_empresa(viajes_queryset, chunk_size: int) -> Iterator[list]:
+    for viaje in iterar_viajes(viajes_queryset, chunk_size, con_gastos=False):
         _, dias_exentos, dias_no_exentos = calcular_dias_viaje(viaje)
-        writer.writerow([
+        yield [
             f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
             viaje.destino,
             viaje.fecha_inicio.strftime("%Y-%m-%d"),
@@ -116,14 +253,26 @@ def generar_csv_viajes_empresa(viajes_queryset) -> str:
             dias_exentos,
             dias_no_exentos,
             viaje.motivo.replace("\n", " ").strip(),
-        ])
+        ]
+
 
-    return output.getvalue()
+def iterar_csv_viajes_empresa(viajes_queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Genera en streaming el CSV de viajes para EMPRESA.
 
+    Args:
+        viajes_queryset: QuerySet de viajes
+        chunk_size: Número de viajes leídos por bloque
 
-def generar_csv_viajes_con_gastos(viajes_queryset) -> str:
+    Yields:
+        Líneas del CSV
     """
-    Genera CSV de viajes con sus gastos asociados.
+    return iterar_filas_csv(CSV_HEADERS_EMPRESA, _filas_viajes_empresa(viajes_queryset, chunk_size))
+
+
+def generar_csv_viajes_empresa(viajes_queryset) -> str:
+    """
+    Genera CSV de viajes para EMPRESA.
 
     Args:
         viajes_queryset: QuerySet de viajes
@@ -131,23 +280,17 @@ def generar_csv_viajes_con_gastos(viajes_queryset) -> str:
     Returns:
         String con contenido CSV
     """
-    output = StringIO()
-    writer = csv.writer(output, delimiter=";")
+    return "".join(iterar_csv_viajes_empresa(viajes_queryset))
 
-    writer.writerow([
-        "Empresa", "Empleado", "DNI", "Destino", "País", "Ciudad",
-        "Fecha Inicio", "Fecha Fin", "Estado Viaje", "Días Totales",
-        "Días Exentos", "Días No Exentos", "Concepto Gasto", "Monto",
-        "Fecha Gasto", "Estado Gasto", "Tiene Comprobante"
-    ])
 
-    for viaje in viajes_queryset:
+def _filas_viajes_con_gastos(viajes_queryset, chunk_size: int) -> Iterator[list]:
+    for viaje in iterar_viajes(viajes_queryset, chunk_size):
         dias_totales, dias_exentos, dias_no_exentos = calcular_dias_viaje(viaje)
-        gastos = Gasto.objects.filter(viaje=viaje)
+        gastos = obtener_gastos_viaje(viaje)
 
-        if gastos.exists():
+        if gastos:
             for gasto in gastos:
-                writer.writerow([
+                yield [
                     viaje.empresa.nombre_empresa,
                     f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
                     viaje.empleado.dni,
@@ -165,9 +308,9 @@ def generar_csv_viajes_con_gastos(viajes_queryset) -> str:
                     gasto.fecha_gasto.strftime("%Y-%m-%d") if gasto.fecha_gasto else "",
                     gasto.estado,
                     "Sí" if gasto.comprobante else "No",
-                ])
+                ]
         else:
-            writer.writerow([
+            yield [
                 viaje.empresa.nombre_empresa,
                 f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
                 viaje.empleado.dni,
@@ -185,101 +328,303 @@ def generar_csv_viajes_con_gastos(viajes_queryset) -> str:
                 "",
                 "N/A",
                 "No",
-            ])
+            ]
+
+
+def iterar_csv_viajes_con_gastos(viajes_queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Genera en streaming el CSV de viajes con sus gastos asociados.
+
+    Args:
+        viajes_queryset: QuerySet de viajes
+        chunk_size: Número de viajes leídos por bloque
+
+    Yields:
+        Líneas del CSV
+    """
+    return iterar_filas_csv(
+        CSV_HEADERS_VIAJES_GASTOS,
+        _filas_viajes_con_gastos(viajes_queryset, chunk_size)
+    )
 
-    return output.getvalue()
+
+def generar_csv_viajes_con_gastos(viajes_queryset) -> str:
+    """
+    Genera CSV de viajes con sus gastos asociados.
+
+    Args:
+        viajes_queryset: QuerySet de viajes
+
+    Returns:
+        String con contenido CSV
+    """
+    return "".join(iterar_csv_viajes_con_gastos(viajes_queryset))
 
 
 # ============================================================================
 # SERVICIOS DE EXPORTACIÓN ZIP
 # ============================================================================
 
-def agregar_comprobante_a_zip(zip_file, gasto: Gasto, archivo_path: str, archivos_agregados: set) -> str:
+class _ZipStreamBuffer:
     """
-    Agrega el comprobante de un gasto al archivo ZIP.
+    Destino de escritura no posicionable para ``zipfile``.
+
+    Acumula los bytes que produce el ZIP hasta que se consumen con ``drain``,
+    de modo que el archivo nunca está completo en memoria.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _emitir(escritura: Generator[None, None, str], buffer: _ZipStreamBuffer) -> Generator[bytes, None, str]:
+    """Reenvía los bytes producidos por cada paso de escritura y devuelve su resultado."""
+    while True:
+        try:
+            next(escritura)
+        except StopIteration as fin:
+            return fin.value
+        data = buffer.drain()
+        if data:
+            yield data
+
+
+def _nombre_comprobante(gasto: Gasto) -> str:
+    archivo_original = os.path.basename(gasto.comprobante.name)
+    extension = os.path.splitext(archivo_original)[1]
+    return f"Gasto_{gasto.id}_{safe_filename(gasto.concepto[:30])}{extension}"
+
+
+class ComprobanteIncompletoError(Exception):
+    """Falló la lectura de un comprobante con su entrada del ZIP ya empezada"""
+
+
+def _bloques_comprobante(gasto: Gasto, leido: ComprobanteLeido | None) -> Iterator[bytes]:
+    if leido is not None and leido.contenido is not None:
+        contenido = memoryview(leido.contenido)
+        for inicio in range(0, len(contenido), COMPROBANTE_CHUNK_SIZE):
+            yield contenido[inicio:inicio + COMPROBANTE_CHUNK_SIZE]
+        return
+
+    with gasto.comprobante.open('rb') as origen:
+        yield from iter(lambda: origen.read(COMPROBANTE_CHUNK_SIZE), b'')
+
+
+def escribir_comprobante_en_zip(
+    zip_file,
+    gasto: Gasto,
+    archivo_path: str,
+    archivos_agregados: set,
+    leido: ComprobanteLeido | None = None
+) -> Generator[None, None, str]:
+    """
+    Copia por bloques el comprobante de un gasto al archivo ZIP.
+
+    Cede el control tras cada bloque escrito para que el llamador pueda
+    enviar los bytes ya comprimidos. Los errores al abrir el comprobante o
+    leer su primer bloque no escriben nada y se devuelven como mensaje; un
+    error a mitad de la copia aborta la exportación, porque la entrada ya
+    empezada quedaría como un comprobante truncado con apariencia de válido.
 
     Args:
         zip_file: Objeto ZipFile
         gasto: Gasto con comprobante
         archivo_path: Ruta donde guardar en el ZIP
         archivos_agregados: Set de archivos ya agregados
+        leido: Resultado de la lectura anticipada del comprobante (opcional)
 
     Returns:
         Nombre del archivo agregado o mensaje de error
+
+    Raises:
+        ComprobanteIncompletoError: Si la lectura falla con la entrada empezada
     """
     if not gasto.comprobante:
         return "Sin_comprobante"
 
     try:
-        if not gasto.comprobante.storage.exists(gasto.comprobante.name):
+        if leido is not None:
+            if not leido.existe:
+                return f"Archivo_no_encontrado_gasto_{gasto.id}"
+            if leido.error:
+                return f"Error_archivo_gasto_{gasto.id}"
+        elif not gasto.comprobante.storage.exists(gasto.comprobante.name):
             return f"Archivo_no_encontrado_gasto_{gasto.id}"
 
-        # Obtener extensión
-        archivo_original = os.path.basename(gasto.comprobante.name)
-        extension = os.path.splitext(archivo_original)[1]
-        archivo_nombre = f"Gasto_{gasto.id}_{safe_filename(gasto.concepto[:30])}{extension}"
+        archivo_nombre = _nombre_comprobante(gasto)
         archivo_path_completo = archivo_path + archivo_nombre
 
         # Evitar duplicados
-        if archivo_path_completo not in archivos_agregados:
-            with gasto.comprobante.open('rb') as f:
-                archivo_contenido = f.read()
-
-            zip_file.writestr(archivo_path_completo, archivo_contenido)
-            archivos_agregados.add(archivo_path_completo)
-
-        return archivo_nombre
+        if archivo_path_completo in archivos_agregados:
+            return archivo_nombre
 
+        bloques = _bloques_comprobante(gasto, leido)
+        primero = next(bloques, b'')
     except Exception:
         return f"Error_archivo_gasto_{gasto.id}"
 
+    with zip_file.open(archivo_path_completo, 'w', force_zip64=True) as destino:
+        bloque = primero
+        while bloque:
+            destino.write(bloque)
+            yield
+            try:
+                bloque = next(bloques, b'')
+            except Exception as exc:
+                raise ComprobanteIncompletoError(
+                    f"No se pudo terminar de leer el comprobante del gasto {gasto.id}"
+                ) from exc
+    archivos_agregados.add(archivo_path_completo)
 
-def generar_zip_viajes_con_gastos(viajes_queryset, rol_usuario: str, empresa_nombre: str | None = None) -> BytesIO:
+    return archivo_nombre
+
+
+def agregar_comprobante_a_zip(zip_file, gasto: Gasto, archivo_path: str, archivos_agregados: set) -> str:
     """
-    Genera un archivo ZIP con viajes, gastos y comprobantes.
+    Agrega el comprobante de un gasto al archivo ZIP.
 
     Args:
-        viajes_queryset: QuerySet de viajes
-        rol_usuario: Rol del usuario (MASTER, EMPRESA, EMPLEADO)
-        empresa_nombre: Nombre de empresa (opcional, para estructurar carpetas)
+        zip_file: Objeto ZipFile
+        gasto: Gasto con comprobante
+        archivo_path: Ruta donde guardar en el ZIP
+        archivos_agregados: Set de archivos ya agregados
 
     Returns:
-        BytesIO con el contenido del ZIP
+        Nombre del archivo agregado o mensaje de error
     """
-    zip_buffer = BytesIO()
+    escritura = escribir_comprobante_en_zip(zip_file, gasto, archivo_path, archivos_agregados)
+    while True:
+        try:
+            next(escritura)
+        except StopIteration as fin:
+            return fin.value
+
+
+ZIP_CSV_HEADERS = [
+    'Empresa', 'Empleado', 'DNI', 'Destino', 'País', 'Ciudad',
+    'Fecha Inicio', 'Fecha Fin', 'Estado Viaje', 'Días Totales',
+    'Días Exentos', 'Días No Exentos', 'Concepto Gasto', 'Monto',
+    'Fecha Gasto', 'Estado Gasto', 'Archivo Comprobante'
+]
+
+
+def _carpeta_viaje(viaje: Viaje, rol_usuario: str) -> str:
+    """Estructura de carpetas del viaje dentro del ZIP según el rol"""
+    viaje_folder = f"Viaje_{viaje.id}_{safe_filename(viaje.destino)}"
+    if rol_usuario == "EMPLEADO":
+        return f"{viaje_folder}/"
+
+    empresa_folder = safe_filename(viaje.empresa.nombre_empresa)
+    empleado_folder = safe_filename(f"{viaje.empleado.nombre}_{viaje.empleado.apellido}")
+    return f"{empresa_folder}/{empleado_folder}/{viaje_folder}/"
+
+
+class _EntradaZip(NamedTuple):
+    """Un gasto (o un viaje sin gastos, con ``gasto=None``) en el orden del ZIP"""
+    viaje: Viaje
+    dias: tuple[int, int, int]
+    base_path: str
+    gasto: Gasto | None
+
+
+def _entradas_zip(viajes_queryset, rol_usuario: str, chunk_size: int) -> Iterator[_EntradaZip]:
+    for viaje in iterar_viajes(viajes_queryset, chunk_size):
+        dias = calcular_dias_viaje(viaje)
+        base_path = _carpeta_viaje(viaje, rol_usuario)
+        gastos = obtener_gastos_viaje(viaje)
+
+        if not gastos:
+            yield _EntradaZip(viaje, dias, base_path, None)
+        for gasto in gastos:
+            yield _EntradaZip(viaje, dias, base_path, gasto)
+
+
+def _con_lectura_anticipada(
+    entradas: Iterable[_EntradaZip],
+    max_workers: int,
+    max_bytes_en_vuelo: int
+) -> Iterable[tuple[_EntradaZip, ComprobanteLeido | None]]:
+    if max_workers <= 1:
+        return ((entrada, None) for entrada in entradas)
+    return PrefetcherComprobantes(
+        entradas,
+        lambda entrada: entrada.gasto,
+        max_workers=max_workers,
+        max_bytes_en_vuelo=max_bytes_en_vuelo,
+    )
+
+
+def iterar_zip_viajes_con_gastos(
+    viajes_queryset,
+    rol_usuario: str,
+    empresa_nombre: str | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    max_workers: int | None = None,
+    max_bytes_en_vuelo: int | None = None
+) -> Iterator[bytes]:
+    """
+    Genera en streaming un ZIP con viajes, gastos y comprobantes.
 
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        csv_buffer = StringIO()
-        writer = csv.writer(csv_buffer, delimiter=';')
-
-        # Headers
-        writer.writerow([
-            'Empresa', 'Empleado', 'DNI', 'Destino', 'País', 'Ciudad',
-            'Fecha Inicio', 'Fecha Fin', 'Estado Viaje', 'Días Totales',
-            'Días Exentos', 'Días No Exentos', 'Concepto Gasto', 'Monto',
-            'Fecha Gasto', 'Estado Gasto', 'Archivo Comprobante'
-        ])
-
-        archivos_agregados: set[str] = set()
-
-        for viaje in viajes_queryset:
-            dias_totales, dias_exentos, dias_no_exentos = calcular_dias_viaje(viaje)
-            gastos = Gasto.objects.filter(viaje=viaje)
-
-            # Estructura de carpetas según rol
-            if rol_usuario == "EMPLEADO":
-                viaje_folder = f"Viaje_{viaje.id}_{safe_filename(viaje.destino)}"
-                base_path = f"{viaje_folder}/"
-            else:
-                empresa_folder = safe_filename(viaje.empresa.nombre_empresa)
-                empleado_folder = safe_filename(f"{viaje.empleado.nombre}_{viaje.empleado.apellido}")
-                viaje_folder = f"Viaje_{viaje.id}_{safe_filename(viaje.destino)}"
-                base_path = f"{empresa_folder}/{empleado_folder}/{viaje_folder}/"
-
-            if gastos.exists():
-                for gasto in gastos:
-                    archivo_nombre = agregar_comprobante_a_zip(
-                        zip_file, gasto, base_path, archivos_agregados
+    Los comprobantes se leen del storage por adelantado en un pool de hilos
+    acotado y se escriben en orden; el CSV resumen se acumula en un fichero
+    temporal y se añade al final del archivo, por lo que la memoria usada no
+    depende del tamaño de la exportación.
+
+    Args:
+        viajes_queryset: QuerySet de viajes
+        rol_usuario: Rol del usuario (MASTER, EMPRESA, EMPLEADO)
+        empresa_nombre: Nombre de empresa (opcional, para estructurar carpetas)
+        chunk_size: Número de viajes leídos por bloque
+        max_workers: Hilos de lectura de comprobantes; 1 los lee en serie
+            (por defecto ``EXPORT_ZIP_PREFETCH_WORKERS``)
+        max_bytes_en_vuelo: Límite de bytes leídos pendientes de escribir
+            (por defecto ``EXPORT_ZIP_PREFETCH_MAX_BYTES``)
+
+    Yields:
+        Fragmentos binarios del archivo ZIP
+    """
+    if max_workers is None:
+        max_workers = getattr(settings, "EXPORT_ZIP_PREFETCH_WORKERS", DEFAULT_PREFETCH_WORKERS)
+    if max_bytes_en_vuelo is None:
+        max_bytes_en_vuelo = getattr(settings, "EXPORT_ZIP_PREFETCH_MAX_BYTES", DEFAULT_PREFETCH_MAX_BYTES)
+
+    buffer = _ZipStreamBuffer()
+
+    with tempfile.SpooledTemporaryFile(
+        max_size=CSV_SPOOL_MAX_SIZE, mode='w+', encoding='utf-8', newline=''
+    ) as csv_spool:
+        writer = csv.writer(csv_spool, delimiter=';')
+        writer.writerow(ZIP_CSV_HEADERS)
+
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            archivos_agregados: set[str] = set()
+            entradas = _con_lectura_anticipada(
+                _entradas_zip(viajes_queryset, rol_usuario, chunk_size),
+                max_workers,
+                max_bytes_en_vuelo,
+            )
+
+            for (viaje, dias, base_path, gasto), leido in entradas:
+                dias_totales, dias_exentos, dias_no_exentos = dias
+
+                if gasto is not None:
+                    archivo_nombre = yield from _emitir(
+                        escribir_comprobante_en_zip(
+                            zip_file, gasto, base_path, archivos_agregados, leido
+                        ),
+                        buffer
                     )
 
                     writer.writerow([
@@ -301,34 +646,66 @@ def generar_zip_viajes_con_gastos(viajes_queryset, rol_usuario: str, empresa_nom
                         gasto.estado,
                         archivo_nombre
                     ])
-            else:
-                # Crear directorio vacío con placeholder
-                placeholder_path = base_path + "Sin_gastos_registrados.txt"
-                zip_file.writestr(placeholder_path, "Este viaje no tiene gastos registrados.")
+                else:
+                    # Crear directorio vacío con placeholder
+                    placeholder_path = base_path + "Sin_gastos_registrados.txt"
+                    zip_file.writestr(placeholder_path, "Este viaje no tiene gastos registrados.")
 
-                writer.writerow([
-                    viaje.empresa.nombre_empresa,
-                    f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
-                    viaje.empleado.dni,
-                    viaje.destino,
-                    viaje.pais or '',
-                    viaje.ciudad or '',
-                    viaje.fecha_inicio.strftime('%Y-%m-%d'),
-                    viaje.fecha_fin.strftime('%Y-%m-%d'),
-                    viaje.estado,
-                    dias_totales,
-                    dias_exentos,
-                    dias_no_exentos,
-                    'Sin gastos registrados',
-                    '0.00',
-                    '',
-                    'N/A',
-                    'Sin_comprobante'
-                ])
+                    writer.writerow([
+                        viaje.empresa.nombre_empresa,
+                        f"{viaje.empleado.nombre} {viaje.empleado.apellido}",
+                        viaje.empleado.dni,
+                        viaje.destino,
+                        viaje.pais or '',
+                        viaje.ciudad or '',
+                        viaje.fecha_inicio.strftime('%Y-%m-%d'),
+                        viaje.fecha_fin.strftime('%Y-%m-%d'),
+                        viaje.estado,
+                        dias_totales,
+                        dias_exentos,
+                        dias_no_exentos,
+                        'Sin gastos registrados',
+                        '0.00',
+                        '',
+                        'N/A',
+                        'Sin_comprobante'
+                    ])
+
+                data = buffer.drain()
+                if data:
+                    yield data
+
+            # Agregar CSV al ZIP con BOM para Excel
+            csv_spool.seek(0)
+            with zip_file.open('resumen_viajes_gastos.csv', 'w', force_zip64=True) as destino:
+                destino.write('\ufeff'.encode())
+                for bloque in iter(lambda: csv_spool.read(COMPROBANTE_CHUNK_SIZE), ''):
+                    destino.write(bloque.encode('utf-8'))
+                    data = buffer.drain()
+                    if data:
+                        yield data
+
+        # Directorio central del ZIP
+        data = buffer.drain()
+        if data:
+            yield data
+
+
+def generar_zip_viajes_con_gastos(viajes_queryset, rol_usuario: str, empresa_nombre: str | None = None) -> BytesIO:
+    """
+    Genera un archivo ZIP con viajes, gastos y comprobantes.
+
+    Args:
+        viajes_queryset: QuerySet de viajes
+        rol_usuario: Rol del usuario (MASTER, EMPRESA, EMPLEADO)
+        empresa_nombre: Nombre de empresa (opcional, para estructurar carpetas)
 
-        # Agregar CSV al ZIP con BOM para Excel
-        csv_content = '\ufeff' + csv_buffer.getvalue()
-        zip_file.writestr('resumen_viajes_gastos.csv', csv_content.encode('utf-8'))
+    Returns:
+        BytesIO con el contenido del ZIP
+    """
+    zip_buffer = BytesIO()
+    for bloque in iterar_zip_viajes_con_gastos(viajes_queryset, rol_usuario, empresa_nombre):
+        zip_buffer.write(bloque)
 
     zip_buffer.seek(0)
     return zip_buffer
@@ -338,45 +715,76 @@ def generar_zip_viajes_con_gastos(viajes_queryset, rol_usuario: str, empresa_nom
 # QUERIES PARA EXPORTACIÓN
 # ============================================================================
 
-def obtener_viajes_para_exportacion(usuario, empleado_id: int | None = None):
+def filtrar_viajes_exportacion(viajes_queryset: QuerySet, filtros: dict | None = None) -> QuerySet:
+    """
+    Aplica en SQL los filtros opcionales de exportación.
+
+    El rango de fechas selecciona los viajes que se solapan con él, de modo
+    que un viaje que empieza a final de trimestre también aparece en la
+    exportación del trimestre siguiente.
+
+    Args:
+        viajes_queryset: QuerySet de viajes dentro del alcance del usuario
+        filtros: Dict con ``fecha_desde``, ``fecha_hasta``, ``estado``,
+            ``empresa_id`` y/o ``es_internacional`` (todos opcionales)
+
+    Returns:
+        QuerySet filtrado
+    """
+    if not filtros:
+        return viajes_queryset
+
+    if filtros.get("fecha_desde"):
+        viajes_queryset = viajes_queryset.filter(fecha_fin__gte=filtros["fecha_desde"])
+    if filtros.get("fecha_hasta"):
+        viajes_queryset = viajes_queryset.filter(fecha_inicio__lte=filtros["fecha_hasta"])
+    if filtros.get("estado"):
+        viajes_queryset = viajes_queryset.filter(estado=filtros["estado"])
+    if filtros.get("empresa_id"):
+        viajes_queryset = viajes_queryset.filter(empresa_id=filtros["empresa_id"])
+    if filtros.get("es_internacional") is not None:
+        viajes_queryset = viajes_queryset.filter(es_internacional=filtros["es_internacional"])
+
+    return viajes_queryset
+
+
+def obtener_viajes_para_exportacion(
+    usuario,
+    empleado_id: int | None = None,
+    filtros: dict | None = None
+):
     """
     Obtiene viajes según el rol del usuario para exportación.
 
+    Los querysets devueltos ya incluyen los filtros, los conteos de días y el
+    prefetch de gastos (ver ``filtrar_viajes_exportacion`` y
+    ``preparar_viajes_para_exportacion``).
+
     Args:
         usuario: Usuario que solicita la exportación
         empleado_id: ID de empleado específico (opcional)
+        filtros: Filtros opcionales de exportación
 
     Returns:
         Tuple (viajes_queryset, filename)
     """
     if empleado_id:
         empleado = EmpleadoProfile.objects.get(id=empleado_id)
-        viajes = Viaje.objects.filter(
-            empleado=empleado
-        ).prefetch_related('dias__gastos')
+        viajes = Viaje.objects.filter(empleado=empleado)
         filename_base = f"{empleado.nombre}_{empleado.apellido}"
-        return viajes, filename_base
-
-    if usuario.role == "MASTER":
-        viajes = Viaje.objects.select_related(
-            'empresa', 'empleado'
-        ).prefetch_related('dias__gastos')
-        return viajes, "todos_los_viajes"
-
+    elif usuario.role == "MASTER":
+        viajes = Viaje.objects.all()
+        filename_base = "todos_los_viajes"
     elif usuario.role == "EMPRESA":
         empresa = EmpresaProfile.objects.get(user=usuario)
-        viajes = Viaje.objects.filter(
-            empresa=empresa
-        ).select_related(
-            'empleado'
-        ).prefetch_related('dias__gastos')
-        return viajes, safe_filename(empresa.nombre_empresa)
-
+        viajes = Viaje.objects.filter(empresa=empresa)
+        filename_base = safe_filename(empresa.nombre_empresa)
     elif usuario.role == "EMPLEADO":
         empleado = EmpleadoProfile.objects.get(user=usuario)
-        viajes = Viaje.objects.filter(
-            empleado=empleado
-        ).prefetch_related('dias__gastos')
-        return viajes, f"{empleado.nombre}_{empleado.apellido}"
+        viajes = Viaje.objects.filter(empleado=empleado)
+        filename_base = f"{empleado.nombre}_{empleado.apellido}"
+    else:
+        return Viaje.objects.none(), "sin_datos"
 
-    return Viaje.objects.none(), "sin_datos"
+    viajes = filtrar_viajes_exportacion(viajes, filtros)
+    return preparar_viajes_para_exportacion(viajes), filename_base
@@ -0,0 +1,190 @@
+"""
+Tests para la caché en disco de exportaciones.
+"""
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.exportacion.cache import ExportArtifactCache
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+
+class ExportArtifactCacheTestCase(APITestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.temp_dir,
+            EXPORT_CACHE_DIR=os.path.join(self.temp_dir, "export_cache"),
+        )
+        self.override.enable()
+        super().setUp()
+
+        self.master = CustomUser.objects.create_user(
+            username="master_cache",
+            email="master_cache@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_cache",
+            email="empresa_cache@example.com",
+            password="test1234",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user,
+            nombre_empresa="Empresa Cache",
+            nif="B40000004",
+            correo_contacto="contacto@cache.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_cache",
+            email="empleado_cache@example.com",
+            password="test1234",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Eva",
+            apellido="Cache",
+            dni="44444444L",
+        )
+        self.viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Bilbao",
+            fecha_inicio=date(2024, 3, 1),
+            fecha_fin=date(2024, 3, 2),
+            estado="REVISADO",
+            motivo="Auditoría",
+            dias_viajados=2,
+        )
+        self.gasto = Gasto.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            viaje=self.viaje,
+            concepto="Tren",
+            monto=Decimal("45.00"),
+            estado="APROBADO",
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().tearDown()
+
+    def _descargar(self, nombre_url="export_viajes_gastos"):
+        self.client.force_authenticate(user=self.empresa_user)
+        response = self.client.get(reverse(nombre_url))
+        self.assertEqual(response.status_code, 200)
+        contenido = b"".join(
+            response.streaming_content if response.streaming else [response.content]
+        )
+        return response, contenido
+
+    def test_segunda_descarga_sale_de_la_cache(self):
+        primera, contenido = self._descargar()
+        self.assertIsInstance(primera, StreamingHttpResponse)
+        self.assertNotIsInstance(primera, FileResponse)
+
+        segunda, contenido_cacheado = self._descargar()
+
+        self.assertIsInstance(segunda, FileResponse)
+        self.assertEqual(contenido_cacheado, contenido)
+        self.assertIn("Empresa_Cache_viajes_con_gastos.csv", segunda["Content-Disposition"])
+
+    def test_zip_tambien_se_cachea(self):
+        primera, contenido = self._descargar("export_viajes_gastos_zip")
+        segunda, contenido_cacheado = self._descargar("export_viajes_gastos_zip")
+
+        self.assertNotIsInstance(primera, FileResponse)
+        self.assertIsInstance(segunda, FileResponse)
+        self.assertEqual(segunda["Content-Type"], "application/zip")
+        self.assertEqual(contenido_cacheado, contenido)
+
+    def test_nueva_publicacion_invalida_la_cache(self):
+        self._descargar()
+
+        self.empresa.last_release_at = timezone.now()
+        self.empresa.save(update_fields=["last_release_at"])
+
+        response, _ = self._descargar()
+        self.assertNotIsInstance(response, FileResponse)
+
+    def test_cambios_en_los_datos_invalidan_la_cache(self):
+        self._descargar()
+
+        Gasto.objects.filter(pk=self.gasto.pk).update(monto=Decimal("50.00"), updated_at=timezone.now())
+
+        response, contenido = self._descargar()
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertIn(b"50.00", contenido)
+
+    def _assert_regenerada(self, texto: bytes):
+        response, contenido = self._descargar()
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertIn(texto, contenido)
+
+    def test_ediciones_sin_cambio_de_importes_invalidan_la_cache(self):
+        self._descargar()
+
+        self.gasto.concepto = "Tren de vuelta"
+        self.gasto.save()
+        self._assert_regenerada(b"Tren de vuelta")
+
+        self.viaje.destino = "Vitoria"
+        self.viaje.save(update_fields=["destino"])
+        self._assert_regenerada(b"Vitoria")
+
+        self.empleado.apellido = "Renombrada"
+        self.empleado.save()
+        self._assert_regenerada(b"Renombrada")
+
+        self.empleado.dni = "44444444M"
+        self.empleado.save()
+        self._assert_regenerada(b"44444444M")
+
+    def test_master_no_usa_la_cache(self):
+        self.client.force_authenticate(user=self.master)
+        self.client.get(reverse("export_viajes_gastos"))
+        response = self.client.get(reverse("export_viajes_gastos"))
+
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "export_cache")))
+
+    def test_descarga_interrumpida_no_deja_artefacto(self):
+        cache = ExportArtifactCache(os.path.join(self.temp_dir, "lru"), max_bytes=1024)
+        bloques = cache.guardar_mientras_se_envia("clave", "csv", iter(["a\n", "b\n"]))
+
+        next(bloques)
+        bloques.close()
+
+        self.assertIsNone(cache.abrir("clave", "csv"))
+        self.assertEqual(os.listdir(cache.directorio), [])
+
+    def test_lru_expulsa_el_artefacto_menos_usado(self):
+        cache = ExportArtifactCache(os.path.join(self.temp_dir, "lru"), max_bytes=25)
+
+        list(cache.guardar_mientras_se_envia("a", "csv", [b"x" * 10]))
+        list(cache.guardar_mientras_se_envia("b", "csv", [b"x" * 10]))
+        pasado = time.time() - 60
+        os.utime(cache.ruta("a", "csv"), (pasado, pasado))
+        os.utime(cache.ruta("b", "csv"), (pasado - 10, pasado - 10))
+
+        # Usar "b" lo convierte en el más reciente
+        cache.abrir("b", "csv").close()
+        list(cache.guardar_mientras_se_envia("c", "csv", [b"x" * 10]))
+
+        self.assertIsNone(cache.abrir("a", "csv"))
+        self.assertTrue(os.path.exists(cache.ruta("b", "csv")))
+        self.assertTrue(os.path.exists(cache.ruta("c", "csv")))
@@ -0,0 +1,175 @@
+"""
+Tests para los filtros de las exportaciones.
+"""
+import os
+import shutil
+import tempfile
+from datetime import date
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.exportacion.jobs import ejecutar_export_job, reclamar_siguiente_job
+from users.exportacion.services import (
+    CSV_HEADERS_MASTER,
+    filtrar_viajes_exportacion,
+    obtener_viajes_para_exportacion,
+)
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, ExportJob, Viaje
+
+
+class ExportFiltrosTestCase(APITestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.temp_dir,
+            EXPORT_CACHE_DIR=os.path.join(self.temp_dir, "export_cache"),
+            EXPORT_JOBS_DIR=os.path.join(self.temp_dir, "export_jobs"),
+        )
+        self.override.enable()
+        super().setUp()
+
+        self.master = CustomUser.objects.create_user(
+            username="master_filtros",
+            email="master_filtros@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        self.empresas = []
+        for indice in range(2):
+            user = CustomUser.objects.create_user(
+                username=f"empresa_filtros_{indice}",
+                email=f"empresa_filtros_{indice}@example.com",
+                password="test1234",
+                role="EMPRESA",
+            )
+            empresa = EmpresaProfile.objects.create(
+                user=user,
+                nombre_empresa=f"Empresa Filtros {indice}",
+                nif=f"B6000000{indice}",
+                correo_contacto=f"contacto{indice}@filtros.com",
+            )
+            empleado_user = CustomUser.objects.create_user(
+                username=f"empleado_filtros_{indice}",
+                email=f"empleado_filtros_{indice}@example.com",
+                password="test1234",
+                role="EMPLEADO",
+            )
+            empleado = EmpleadoProfile.objects.create(
+                user=empleado_user,
+                empresa=empresa,
+                nombre="Sara",
+                apellido=f"Filtros{indice}",
+                dni=f"6666666{indice}M",
+            )
+            self.empresas.append((user, empresa, empleado))
+
+        _, empresa, empleado = self.empresas[0]
+        self.viaje_q1 = self._crear_viaje(empresa, empleado, "Sevilla", date(2024, 2, 10), date(2024, 2, 12))
+        self.viaje_cruza = self._crear_viaje(
+            empresa, empleado, "Roma", date(2024, 3, 30), date(2024, 4, 2), es_internacional=True
+        )
+        self.viaje_q2 = self._crear_viaje(
+            empresa, empleado, "Cádiz", date(2024, 5, 5), date(2024, 5, 6), estado="EN_REVISION"
+        )
+        _, otra_empresa, otro_empleado = self.empresas[1]
+        self.viaje_otra = self._crear_viaje(
+            otra_empresa, otro_empleado, "Toledo", date(2024, 2, 1), date(2024, 2, 1)
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().tearDown()
+
+    def _crear_viaje(self, empresa, empleado, destino, inicio, fin, estado="REVISADO", es_internacional=False):
+        return Viaje.objects.create(
+            empresa=empresa,
+            empleado=empleado,
+            destino=destino,
+            fecha_inicio=inicio,
+            fecha_fin=fin,
+            estado=estado,
+            es_internacional=es_internacional,
+            dias_viajados=(fin - inicio).days + 1,
+        )
+
+    def _csv(self, url_name, user, params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_rango_de_fechas_incluye_viajes_solapados(self):
+        filtros = {"fecha_desde": date(2024, 1, 1), "fecha_hasta": date(2024, 3, 31)}
+        viajes = filtrar_viajes_exportacion(Viaje.objects.filter(empresa=self.empresas[0][1]), filtros)
+
+        self.assertCountEqual(viajes, [self.viaje_q1, self.viaje_cruza])
+
+    def test_filtros_combinados_en_obtener_viajes(self):
+        viajes, _ = obtener_viajes_para_exportacion(
+            self.master, filtros={"es_internacional": False, "estado": "REVISADO"}
+        )
+        self.assertCountEqual(viajes, [self.viaje_q1, self.viaje_otra])
+
+        viajes, _ = obtener_viajes_para_exportacion(
+            self.master, filtros={"empresa_id": self.empresas[1][1].id}
+        )
+        self.assertCountEqual(viajes, [self.viaje_otra])
+
+    def test_csv_master_trimestral_mantiene_cabeceras(self):
+        contenido = self._csv(
+            "export_master_csv",
+            self.master,
+            {"fecha_desde": "2024-01-01", "fecha_hasta": "2024-03-31", "empresa_id": self.empresas[0][1].id},
+        )
+
+        lineas = contenido.strip().split("\r\n")
+        self.assertEqual(lineas[0], ";".join(CSV_HEADERS_MASTER))
+        self.assertEqual(len(lineas), 3)
+        self.assertNotIn("Toledo", contenido)
+        self.assertNotIn("Cádiz", contenido)
+
+    def test_csv_empresa_no_sale_de_su_alcance(self):
+        empresa_user = self.empresas[0][0]
+        contenido = self._csv(
+            "export_viajes_gastos", empresa_user, {"empresa_id": self.empresas[1][1].id}
+        )
+        self.assertEqual(contenido.strip().count("\r\n"), 0)
+
+        contenido = self._csv("export_viajes_gastos", empresa_user, {"es_internacional": "true"})
+        self.assertIn("Roma", contenido)
+        self.assertNotIn("Sevilla", contenido)
+
+    def test_filtros_invalidos_devuelven_400(self):
+        self.client.force_authenticate(user=self.master)
+
+        response = self.client.get(reverse("export_viajes_gastos_zip"), {"fecha_desde": "31/03/2024"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(
+            reverse("export_master_csv"), {"fecha_desde": "2024-04-01", "fecha_hasta": "2024-01-01"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fecha_hasta", response.data)
+
+    def test_job_en_segundo_plano_aplica_filtros(self):
+        self.client.force_authenticate(user=self.master)
+        response = self.client.post(
+            reverse("export_jobs"),
+            {"tipo": ExportJob.TIPO_MASTER_CSV, "filtros": {"fecha_hasta": "2024-03-01"}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["filtros"], {"fecha_hasta": "2024-03-01"})
+
+        job = ejecutar_export_job(reclamar_siguiente_job())
+
+        self.assertEqual(job.estado, ExportJob.ESTADO_COMPLETADO)
+        self.assertEqual(job.filas_procesadas, 2)
+        with job.archivo.open("rb") as archivo:
+            contenido = archivo.read().decode("utf-8")
+        self.assertIn("Sevilla", contenido)
+        self.assertIn("Toledo", contenido)
+        self.assertNotIn("Roma", contenido)
@@ -0,0 +1,256 @@
+"""
+Tests para las exportaciones en segundo plano.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.exportacion.jobs import (
+    ERROR_EXPORTACION,
+    ERROR_EXPORTACION_INTERRUMPIDA,
+    ejecutar_export_job,
+    reclamar_siguiente_job,
+)
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    ExportJob,
+    Gasto,
+    Viaje,
+)
+
+
+class ExportJobTestCase(APITestCase):
+    def setUp(self):
+        self.temp_media = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=os.path.join(self.temp_media, "media"),
+            EXPORT_JOBS_DIR=os.path.join(self.temp_media, "export_jobs"),
+        )
+        self.override.enable()
+        super().setUp()
+
+        self.master = CustomUser.objects.create_user(
+            username="master_jobs",
+            email="master_jobs@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_jobs",
+            email="empresa_jobs@example.com",
+            password="test1234",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user,
+            nombre_empresa="Empresa Jobs",
+            nif="B40000004",
+            correo_contacto="contacto@jobs.com",
+        )
+        self.empleado_user = CustomUser.objects.create_user(
+            username="empleado_jobs",
+            email="empleado_jobs@example.com",
+            password="test1234",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=self.empleado_user,
+            empresa=self.empresa,
+            nombre="Marta",
+            apellido="Jobs",
+            dni="44444444A",
+        )
+
+        for mes in (3, 4):
+            viaje = Viaje.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                destino=f"Destino {mes}",
+                fecha_inicio=date(2024, mes, 1),
+                fecha_fin=date(2024, mes, 1),
+                estado="REVISADO",
+                motivo="Reunión",
+            )
+            dia = DiaViaje.objects.create(viaje=viaje, fecha=viaje.fecha_inicio)
+            Gasto.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                viaje=viaje,
+                dia=dia,
+                concepto="Comida",
+                monto=Decimal("20.00"),
+                estado="APROBADO",
+                fecha_gasto=viaje.fecha_inicio,
+            )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.temp_media, ignore_errors=True)
+        super().tearDown()
+
+    def _crear_job(self, user, payload):
+        self.client.force_authenticate(user=user)
+        return self.client.post(reverse("export_jobs"), payload, format="json")
+
+    def test_flujo_completo_zip(self):
+        response = self._crear_job(self.master, {"tipo": ExportJob.TIPO_VIAJES_GASTOS_ZIP})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["estado"], ExportJob.ESTADO_PENDIENTE)
+        self.assertIsNone(response.data["download_url"])
+        job_id = response.data["id"]
+
+        pendiente = self.client.get(reverse("export_job_download", args=[job_id]))
+        self.assertEqual(pendiente.status_code, 409)
+
+        call_command("procesar_exportaciones", "--once", stdout=StringIO())
+
+        detalle = self.client.get(reverse("export_job_detail", args=[job_id]))
+        self.assertEqual(detalle.data["estado"], ExportJob.ESTADO_COMPLETADO)
+        self.assertEqual(detalle.data["filas_procesadas"], 2)
+        self.assertGreater(detalle.data["bytes_procesados"], 0)
+        self.assertEqual(detalle.data["nombre_archivo"], "todos_los_viajes_viajes_completos.zip")
+        self.assertTrue(detalle.data["download_url"].endswith(f"/export/jobs/{job_id}/download/"))
+
+        descarga = self.client.get(reverse("export_job_download", args=[job_id]))
+        self.assertEqual(descarga.status_code, 200)
+        contenido = b"".join(descarga.streaming_content)
+        self.assertEqual(len(contenido), detalle.data["bytes_procesados"])
+        archivo = zipfile.ZipFile(BytesIO(contenido))
+        self.assertIn("resumen_viajes_gastos.csv", archivo.namelist())
+
+    def test_csv_empresa_reutiliza_generador(self):
+        self._crear_job(self.empresa_user, {"tipo": ExportJob.TIPO_EMPRESA_CSV})
+
+        job = ejecutar_export_job(reclamar_siguiente_job())
+
+        self.assertEqual(job.estado, ExportJob.ESTADO_COMPLETADO)
+        with job.archivo.open("rb") as archivo:
+            contenido = archivo.read().decode("utf-8")
+        self.assertTrue(contenido.startswith("Empleado;Destino"))
+        self.assertEqual(contenido.count("Marta Jobs"), 2)
+
+    def test_empleado_no_puede_pedir_csv_master(self):
+        response = self._crear_job(self.empleado_user, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_empleado_no_puede_exportar_a_otro_empleado(self):
+        otro_user = CustomUser.objects.create_user(
+            username="otro_jobs", email="otro_jobs@example.com", password="test1234", role="EMPLEADO"
+        )
+        otro = EmpleadoProfile.objects.create(
+            user=otro_user, empresa=self.empresa, nombre="Otro", apellido="Jobs", dni="55555555K"
+        )
+
+        response = self._crear_job(
+            self.empleado_user,
+            {"tipo": ExportJob.TIPO_VIAJES_GASTOS_CSV, "empleado_id": otro.id},
+        )
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_job_solo_visible_para_su_autor(self):
+        response = self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        self.client.force_authenticate(user=self.empresa_user)
+        detalle = self.client.get(reverse("export_job_detail", args=[response.data["id"]]))
+
+        self.assertEqual(detalle.status_code, 404)
+
+    def test_un_job_solo_se_reclama_una_vez(self):
+        self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        primero = reclamar_siguiente_job()
+
+        self.assertIsNotNone(primero)
+        self.assertEqual(primero.estado, ExportJob.ESTADO_EN_PROCESO)
+        self.assertIsNone(reclamar_siguiente_job())
+
+    def test_error_no_expone_el_detalle_de_la_excepcion(self):
+        response = self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        with mock.patch(
+            "users.exportacion.jobs.resolver_exportacion",
+            side_effect=RuntimeError("/app/media/secreto.pdf no existe"),
+        ), self.assertLogs("users.exportacion.jobs", level="ERROR") as logs:
+            job = ejecutar_export_job(reclamar_siguiente_job())
+
+        self.assertEqual(job.estado, ExportJob.ESTADO_ERROR)
+        self.assertEqual(job.error, ERROR_EXPORTACION)
+        self.assertIn("secreto.pdf", "\n".join(logs.output))
+        detalle = self.client.get(reverse("export_job_detail", args=[response.data["id"]]))
+        self.assertEqual(detalle.data["error"], ERROR_EXPORTACION)
+
+    @override_settings(EXPORT_JOB_TIMEOUT_SECONDS=60, EXPORT_JOB_MAX_INTENTOS=2)
+    def test_job_huerfano_vuelve_a_la_cola_hasta_agotar_intentos(self):
+        self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+        hace_un_rato = timezone.now() - timedelta(minutes=5)
+
+        primero = reclamar_siguiente_job()
+        ExportJob.objects.filter(pk=primero.pk).update(ultimo_latido=hace_un_rato)
+        segundo = reclamar_siguiente_job()
+
+        self.assertEqual(segundo.pk, primero.pk)
+        self.assertEqual(segundo.intentos, 2)
+
+        ExportJob.objects.filter(pk=segundo.pk).update(ultimo_latido=hace_un_rato)
+        self.assertIsNone(reclamar_siguiente_job())
+        agotado = ExportJob.objects.get(pk=primero.pk)
+        self.assertEqual(agotado.estado, ExportJob.ESTADO_ERROR)
+        self.assertEqual(agotado.error, ERROR_EXPORTACION_INTERRUMPIDA)
+
+    def test_job_con_latido_reciente_no_se_reencola(self):
+        self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        job = reclamar_siguiente_job()
+
+        self.assertIsNotNone(job.ultimo_latido)
+        self.assertIsNone(reclamar_siguiente_job())
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).estado, ExportJob.ESTADO_EN_PROCESO)
+
+    def test_archivo_privado_con_nombre_aleatorio(self):
+        self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+
+        job = ejecutar_export_job(reclamar_siguiente_job())
+
+        self.assertEqual(job.nombre_archivo, "viajes_todas_empresas.csv")
+        self.assertRegex(job.archivo.name, r"^exportaciones/[0-9a-f]{32}\.csv$")
+        self.assertTrue(job.archivo.path.startswith(os.path.join(self.temp_media, "export_jobs")))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_media, "media")))
+        self.assertRaises(ValueError, getattr, job.archivo, "url")
+
+    def test_worker_reasignado_no_pisa_el_nuevo_intento(self):
+        self._crear_job(self.master, {"tipo": ExportJob.TIPO_MASTER_CSV})
+        antiguo = reclamar_siguiente_job()
+        # Mientras tanto el trabajo se reencoló y otro worker lo reclamó
+        ExportJob.objects.filter(pk=antiguo.pk).update(
+            estado=ExportJob.ESTADO_PENDIENTE, ultimo_latido=None
+        )
+        nuevo = reclamar_siguiente_job()
+
+        with self.assertLogs("users.exportacion.jobs", level="WARNING"):
+            resultado = ejecutar_export_job(antiguo)
+
+        self.assertEqual(resultado.estado, ExportJob.ESTADO_EN_PROCESO)
+        self.assertEqual(resultado.intentos, nuevo.intentos)
+        self.assertFalse(resultado.archivo)
+        self.assertEqual(os.listdir(os.path.join(self.temp_media, "export_jobs", "exportaciones")), [])
+
+        terminado = ejecutar_export_job(nuevo)
+        self.assertEqual(terminado.estado, ExportJob.ESTADO_COMPLETADO)
+        self.assertEqual(len(os.listdir(os.path.join(self.temp_media, "export_jobs", "exportaciones"))), 1)
@@ -0,0 +1,127 @@
+"""
+Tests de número de queries en la exportación de viajes.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from users.exportacion.services import (
+    calcular_dias_viaje,
+    iterar_csv_viajes_con_gastos,
+    iterar_csv_viajes_master,
+    iterar_zip_viajes_con_gastos,
+    obtener_viajes_para_exportacion,
+    preparar_viajes_para_exportacion,
+)
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    Viaje,
+)
+
+
+class ExportQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.master = CustomUser.objects.create_user(
+            username="master_queries",
+            email="master_queries@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_queries",
+            email="empresa_queries@example.com",
+            password="test1234",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user,
+            nombre_empresa="Empresa Queries",
+            nif="B30000003",
+            correo_contacto="contacto@queries.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_queries",
+            email="empleado_queries@example.com",
+            password="test1234",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Eva",
+            apellido="Queries",
+            dni="33333333P",
+        )
+
+    def _crear_viajes(self, total: int) -> None:
+        for offset in range(total):
+            inicio = date(2024, 1, 1) + timedelta(days=offset * 5)
+            viaje = Viaje.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                destino=f"Destino {offset}",
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=2),
+                estado="REVISADO",
+                dias_viajados=3,
+            )
+            dias = [
+                DiaViaje.objects.create(viaje=viaje, fecha=inicio + timedelta(days=i), exento=i != 2)
+                for i in range(3)
+            ]
+            for dia in dias[:2]:
+                Gasto.objects.create(
+                    empleado=self.empleado,
+                    empresa=self.empresa,
+                    viaje=viaje,
+                    dia=dia,
+                    concepto="Taxi",
+                    monto=Decimal("12.00"),
+                    estado="APROBADO",
+                    fecha_gasto=dia.fecha,
+                )
+
+    def test_csv_con_gastos_usa_queries_constantes(self):
+        self._crear_viajes(2)
+        viajes, _ = obtener_viajes_para_exportacion(self.master)
+        with self.assertNumQueries(2):
+            contenido_pequeno = "".join(iterar_csv_viajes_con_gastos(viajes))
+
+        self._crear_viajes(10)
+        viajes, _ = obtener_viajes_para_exportacion(self.master)
+        with self.assertNumQueries(2):
+            contenido = "".join(iterar_csv_viajes_con_gastos(viajes))
+
+        self.assertEqual(contenido_pequeno.count("\r\n"), 5)
+        self.assertEqual(contenido.count("\r\n"), 25)
+        self.assertIn(";3;2;1;Taxi;12.00;", contenido)
+
+    def test_csv_master_sin_gastos_usa_una_query(self):
+        self._crear_viajes(8)
+
+        with self.assertNumQueries(1):
+            "".join(iterar_csv_viajes_master(Viaje.objects.filter(estado="REVISADO")))
+
+    def test_zip_usa_queries_constantes(self):
+        self._crear_viajes(6)
+        viajes, _ = obtener_viajes_para_exportacion(self.master)
+
+        with self.assertNumQueries(2):
+            b"".join(iterar_zip_viajes_con_gastos(viajes, rol_usuario="MASTER"))
+
+    def test_conteos_anotados_coinciden_con_calculo_directo(self):
+        self._crear_viajes(3)
+
+        preparados = {v.id: v for v in preparar_viajes_para_exportacion(Viaje.objects.all())}
+        for viaje in Viaje.objects.all():
+            self.assertEqual(calcular_dias_viaje(viaje), calcular_dias_viaje(preparados[viaje.id]))
+
+    def test_preparar_es_idempotente(self):
+        viajes = preparar_viajes_para_exportacion(Viaje.objects.all())
+
+        self.assertIs(preparar_viajes_para_exportacion(viajes), viajes)
@@ -0,0 +1,126 @@
+"""
+Tests para la lectura anticipada de comprobantes en las exportaciones ZIP.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+
+from users.exportacion.prefetch import PrefetcherComprobantes, leer_comprobante
+from users.exportacion.services import iterar_zip_viajes_con_gastos
+from users.models import EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+
+class _StorageLento(FileSystemStorage):
+    """Storage con latencia aleatoria para desordenar las lecturas concurrentes."""
+
+    def _open(self, name, mode="rb"):
+        time.sleep(random.uniform(0, 0.005))
+        return super()._open(name, mode)
+
+
+class PrefetcherComprobantesTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.storage = _StorageLento(location=self.directorio)
+        os.makedirs(self.storage.path("comprobantes"))
+
+        empresa = EmpresaProfile(id=1, nombre_empresa="Empresa Prefetch", nif="B50000005")
+        empleado = EmpleadoProfile(id=1, empresa=empresa, nombre="Iván", apellido="Prefetch", dni="55555555K")
+        self.viaje = Viaje(
+            id=1,
+            empresa=empresa,
+            empleado=empleado,
+            destino="Valencia",
+            fecha_inicio=date(2024, 2, 1),
+            fecha_fin=date(2024, 2, 2),
+            estado="REVISADO",
+            dias_viajados=2,
+        )
+        self.viaje.dias_exentos_count = 2
+        self.viaje.dias_no_exentos_count = 0
+        self.viaje.gastos_exportacion = []
+
+        self.contenidos = {}
+        for indice in range(30):
+            tamano = 100_000 if indice == 7 else 1_000 + indice
+            self.viaje.gastos_exportacion.append(self._crear_gasto(indice + 1, os.urandom(tamano)))
+
+        # Un gasto cuyo comprobante ya no está en el storage
+        self.gasto_perdido = self._crear_gasto(99, None)
+        self.viaje.gastos_exportacion.append(self.gasto_perdido)
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _crear_gasto(self, gasto_id: int, contenido: bytes | None) -> Gasto:
+        nombre = f"comprobantes/factura_{gasto_id}.pdf"
+        if contenido is not None:
+            with open(self.storage.path(nombre), "wb") as destino:
+                destino.write(contenido)
+            self.contenidos[gasto_id] = contenido
+
+        gasto = Gasto(
+            id=gasto_id,
+            empresa=self.viaje.empresa,
+            empleado=self.viaje.empleado,
+            viaje=self.viaje,
+            concepto=f"Gasto {gasto_id}",
+            monto=Decimal("12.50"),
+            estado="APROBADO",
+            comprobante=nombre,
+        )
+        gasto.comprobante.storage = self.storage
+        return gasto
+
+    def test_resultados_en_el_orden_de_entrada(self):
+        gastos = self.viaje.gastos_exportacion
+        resultados = list(PrefetcherComprobantes(gastos, lambda gasto: gasto, max_workers=4))
+
+        self.assertEqual([gasto.id for gasto, _ in resultados], [gasto.id for gasto in gastos])
+        for gasto, leido in resultados[:-1]:
+            if leido.contenido is not None:
+                self.assertEqual(leido.contenido, self.contenidos[gasto.id])
+        self.assertFalse(resultados[-1][1].existe)
+
+    def test_archivos_grandes_no_se_cargan_en_memoria(self):
+        prefetcher = PrefetcherComprobantes(
+            self.viaje.gastos_exportacion, lambda gasto: gasto, max_workers=2, max_bytes_en_vuelo=50_000
+        )
+        leidos = {gasto.id: leido for gasto, leido in prefetcher}
+
+        self.assertEqual(prefetcher.limite_por_archivo, 10_000)
+        self.assertIsNone(leidos[8].contenido)
+        self.assertTrue(leidos[8].existe)
+        self.assertEqual(leidos[1].contenido, self.contenidos[1])
+
+    def test_leer_comprobante_inexistente(self):
+        leido = leer_comprobante(self.gasto_perdido, limite_bytes=1024)
+        self.assertFalse(leido.existe)
+        self.assertIsNone(leido.contenido)
+
+    def test_zip_en_paralelo_igual_que_en_serie(self):
+        def contenido_zip(max_workers):
+            archivo = zipfile.ZipFile(BytesIO(b"".join(
+                iterar_zip_viajes_con_gastos(
+                    [self.viaje], rol_usuario="MASTER", max_workers=max_workers, max_bytes_en_vuelo=50_000
+                )
+            )))
+            return {nombre: archivo.read(nombre) for nombre in archivo.namelist()}
+
+        serie = contenido_zip(1)
+        paralelo = contenido_zip(4)
+
+        self.assertEqual(serie, paralelo)
+        comprobantes = [nombre for nombre in paralelo if nombre.endswith(".pdf")]
+        self.assertEqual(len(comprobantes), 30)
+        self.assertIn(b"Archivo_no_encontrado_gasto_99", paralelo["resumen_viajes_gastos.csv"])
+        self.assertIn(self.contenidos[8], paralelo.values())
@@ -0,0 +1,120 @@
+"""
+Tests para la exportación CSV en streaming.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.exportacion.services import (
+    generar_csv_viajes_con_gastos,
+    iterar_csv_viajes_con_gastos,
+    iterar_csv_viajes_master,
+)
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    Viaje,
+)
+
+
+class StreamingCSVExportTestCase(APITestCase):
+    def setUp(self):
+        self.master = CustomUser.objects.create_user(
+            username="master_export",
+            email="master_export@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_export",
+            email="empresa_export@example.com",
+            password="test1234",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user,
+            nombre_empresa="Empresa Export",
+            nif="B10000001",
+            correo_contacto="contacto@export.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_export",
+            email="empleado_export@example.com",
+            password="test1234",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Ana",
+            apellido="Export",
+            dni="11111111H",
+        )
+
+        for offset in range(3):
+            viaje = Viaje.objects.create(
+                empleado=self.empleado,
+                empresa=self.empresa,
+                destino=f"Destino {offset}",
+                fecha_inicio=date(2024, 1 + offset, 1),
+                fecha_fin=date(2024, 1 + offset, 2),
+                estado="REVISADO",
+                motivo="Motivo\ncon salto",
+                dias_viajados=2,
+            )
+            dia = DiaViaje.objects.create(viaje=viaje, fecha=viaje.fecha_inicio, exento=True)
+            DiaViaje.objects.create(viaje=viaje, fecha=viaje.fecha_fin, exento=False)
+            if offset:
+                Gasto.objects.create(
+                    empleado=self.empleado,
+                    empresa=self.empresa,
+                    viaje=viaje,
+                    dia=dia,
+                    concepto="Hotel",
+                    monto=Decimal("80.00"),
+                    estado="APROBADO",
+                    fecha_gasto=viaje.fecha_inicio,
+                )
+
+    def test_iterar_csv_produce_una_linea_por_fila(self):
+        lineas = list(iterar_csv_viajes_master(Viaje.objects.all(), chunk_size=1))
+
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[0].startswith("Empresa;Empleado;Destino"))
+        self.assertIn("Motivo con salto", lineas[1])
+
+    def test_generar_csv_equivale_al_streaming(self):
+        viajes = Viaje.objects.order_by("id")
+
+        self.assertEqual(
+            generar_csv_viajes_con_gastos(viajes),
+            "".join(iterar_csv_viajes_con_gastos(viajes)),
+        )
+
+    def test_master_csv_se_sirve_en_streaming(self):
+        self.client.force_authenticate(user=self.master)
+
+        response = self.client.get(reverse("export_master_csv"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        contenido = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(contenido.count("\r\n"), 4)
+        self.assertIn("Empresa Export;Ana Export;Destino 0", contenido)
+
+    def test_viajes_gastos_csv_incluye_viajes_sin_gastos(self):
+        self.client.force_authenticate(user=self.master)
+
+        response = self.client.get(reverse("export_viajes_gastos"))
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        contenido = b"".join(response.streaming_content).decode("utf-8")
+        self.assertIn("Sin gastos registrados", contenido)
+        self.assertEqual(contenido.count("Hotel;80.00"), 2)
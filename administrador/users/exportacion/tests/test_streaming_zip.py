@@ -0,0 +1,194 @@
+"""
+Tests para la exportación ZIP en streaming.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.exportacion import services
+from users.exportacion.services import (
+    ComprobanteIncompletoError,
+    agregar_comprobante_a_zip,
+    generar_zip_viajes_con_gastos,
+    iterar_zip_viajes_con_gastos,
+)
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    Viaje,
+)
+
+
+class StreamingZipExportTestCase(APITestCase):
+    def setUp(self):
+        self.temp_media = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.temp_media,
+            EXPORT_CACHE_DIR=os.path.join(self.temp_media, "export_cache"),
+        )
+        self.override.enable()
+        super().setUp()
+
+        self.master = CustomUser.objects.create_user(
+            username="master_zip",
+            email="master_zip@example.com",
+            password="test1234",
+            role="MASTER",
+        )
+        empresa_user = CustomUser.objects.create_user(
+            username="empresa_zip",
+            email="empresa_zip@example.com",
+            password="test1234",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=empresa_user,
+            nombre_empresa="Empresa Zip",
+            nif="B20000002",
+            correo_contacto="contacto@zip.com",
+        )
+        self.empleado_user = CustomUser.objects.create_user(
+            username="empleado_zip",
+            email="empleado_zip@example.com",
+            password="test1234",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=self.empleado_user,
+            empresa=self.empresa,
+            nombre="Luis",
+            apellido="Zip",
+            dni="22222222J",
+        )
+
+        self.viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Lisboa",
+            fecha_inicio=date(2024, 5, 1),
+            fecha_fin=date(2024, 5, 2),
+            estado="REVISADO",
+            motivo="Feria",
+            dias_viajados=2,
+        )
+        dia = DiaViaje.objects.create(viaje=self.viaje, fecha=self.viaje.fecha_inicio)
+        self.contenido_comprobante = os.urandom(3 * services.COMPROBANTE_CHUNK_SIZE + 17)
+        self.gasto = Gasto.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            viaje=self.viaje,
+            dia=dia,
+            concepto="Hotel centro",
+            monto=Decimal("150.00"),
+            estado="APROBADO",
+            fecha_gasto=self.viaje.fecha_inicio,
+            comprobante=SimpleUploadedFile("factura.pdf", self.contenido_comprobante),
+        )
+
+        Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Oporto",
+            fecha_inicio=date(2024, 6, 1),
+            fecha_fin=date(2024, 6, 1),
+            estado="REVISADO",
+            motivo="Visita",
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.temp_media, ignore_errors=True)
+        super().tearDown()
+
+    def _abrir_zip(self, bloques) -> zipfile.ZipFile:
+        return zipfile.ZipFile(BytesIO(b"".join(bloques)))
+
+    def test_zip_en_streaming_emite_varios_bloques(self):
+        bloques = list(iterar_zip_viajes_con_gastos(Viaje.objects.order_by("id"), rol_usuario="MASTER"))
+
+        self.assertGreater(len(bloques), 1)
+        archivo = self._abrir_zip(bloques)
+        self.assertIsNone(archivo.testzip())
+
+        nombres = archivo.namelist()
+        self.assertEqual(nombres[-1], "resumen_viajes_gastos.csv")
+        comprobante = next(n for n in nombres if n.endswith(".pdf"))
+        self.assertTrue(comprobante.startswith("Empresa_Zip/Luis_Zip/Viaje_"))
+        self.assertEqual(archivo.read(comprobante), self.contenido_comprobante)
+        self.assertTrue(any(n.endswith("Sin_gastos_registrados.txt") for n in nombres))
+
+        resumen = archivo.read("resumen_viajes_gastos.csv").decode("utf-8")
+        self.assertTrue(resumen.startswith("\ufeffEmpresa;Empleado;DNI"))
+        self.assertIn("Hotel centro;150.00", resumen)
+        self.assertIn("Sin gastos registrados", resumen)
+
+    def _comprobante_que_falla(self, lecturas_correctas):
+        origen = mock.MagicMock()
+        origen.__enter__.return_value = origen
+        origen.read.side_effect = [
+            *[b"x" * services.COMPROBANTE_CHUNK_SIZE] * lecturas_correctas, OSError("disco")
+        ]
+        return mock.patch.object(type(self.gasto.comprobante), "open", return_value=origen)
+
+    def test_error_al_empezar_la_lectura_no_escribe_el_comprobante(self):
+        buffer = BytesIO()
+        agregados = set()
+
+        with zipfile.ZipFile(buffer, "w") as zip_file, self._comprobante_que_falla(0):
+            resultado = agregar_comprobante_a_zip(zip_file, self.gasto, "Viaje/", agregados)
+
+        self.assertEqual(resultado, f"Error_archivo_gasto_{self.gasto.id}")
+        self.assertEqual(agregados, set())
+        self.assertEqual(zipfile.ZipFile(buffer).namelist(), [])
+
+    def test_error_a_mitad_del_comprobante_aborta_el_zip(self):
+        agregados = set()
+
+        with zipfile.ZipFile(BytesIO(), "w") as zip_file, self._comprobante_que_falla(1):
+            with self.assertRaises(ComprobanteIncompletoError):
+                agregar_comprobante_a_zip(zip_file, self.gasto, "Viaje/", agregados)
+
+        self.assertEqual(agregados, set())
+
+    def test_generar_zip_mantiene_contenido(self):
+        zip_buffer = generar_zip_viajes_con_gastos(Viaje.objects.all(), rol_usuario="EMPLEADO")
+
+        archivo = zipfile.ZipFile(zip_buffer)
+        self.assertTrue(any(n.startswith(f"Viaje_{self.viaje.id}_Lisboa/") for n in archivo.namelist()))
+        self.assertIn("resumen_viajes_gastos.csv", archivo.namelist())
+
+    def test_vista_zip_usa_streaming(self):
+        self.client.force_authenticate(user=self.master)
+
+        response = self.client.get(reverse("export_viajes_gastos_zip"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archivo = self._abrir_zip(response.streaming_content)
+        self.assertEqual(len([n for n in archivo.namelist() if n.endswith(".pdf")]), 1)
+
+    def test_vista_zip_empleado_individual_usa_streaming(self):
+        self.client.force_authenticate(user=self.empleado_user)
+
+        response = self.client.get(
+            reverse("export_empleado_individual_zip", args=[self.empleado.id])
+        )
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        archivo = self._abrir_zip(response.streaming_content)
+        self.assertIn("resumen_viajes_gastos.csv", archivo.namelist())
@@ -7,6 +7,9 @@ from .views import (
     ExportEmpleadoIndividualView,
     ExportEmpleadoIndividualZipView,
     ExportEmpresaCSVView,
+    ExportJobDetailView,
+    ExportJobDownloadView,
+    ExportJobListCreateView,
     # Exportación CSV
     ExportMasterCSVView,
     ExportViajesGastosView,
@@ -26,4 +29,9 @@ urlpatterns = [
     path('export/viajes-gastos-zip/', ExportViajesGastosZipView.as_view(), name='export_viajes_gastos_zip'),
     path('export/empleado/<int:empleado_id>/viajes-gastos-zip/', ExportEmpleadoIndividualZipView.as_view(),
          name='export_empleado_individual_zip'),
+
+    # Exportación en segundo plano
+    path('export/jobs/', ExportJobListCreateView.as_view(), name='export_jobs'),
+    path('export/jobs/<int:job_id>/', ExportJobDetailView.as_view(), name='export_job_detail'),
+    path('export/jobs/<int:job_id>/download/', ExportJobDownloadView.as_view(), name='export_job_download'),
 ]
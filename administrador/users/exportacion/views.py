@@ -1,9 +1,11 @@
 """
 Vistas para exportación de datos
 """
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
@@ -12,17 +14,70 @@ from users.common.exceptions import (
     EmpresaProfileNotFoundError,
     UnauthorizedAccessError,
 )
-from users.common.services import get_user_empresa
-from users.models import EmpleadoProfile, EmpresaProfile, Viaje
+from users.common.services import can_access_empleado, get_user_empleado, get_user_empresa
+from users.models import EmpleadoProfile, EmpresaProfile, ExportJob, Viaje
 
+from .cache import clave_exportacion, get_export_cache
+from .jobs import crear_export_job
+from .serializers import ExportFiltrosSerializer, ExportJobCreateSerializer, ExportJobSerializer
 from .services import (
-    generar_csv_viajes_con_gastos,
-    generar_csv_viajes_empresa,
-    generar_csv_viajes_master,
-    generar_zip_viajes_con_gastos,
+    filtrar_viajes_exportacion,
+    iterar_csv_viajes_con_gastos,
+    iterar_csv_viajes_empresa,
+    iterar_csv_viajes_master,
+    iterar_zip_viajes_con_gastos,
     obtener_viajes_para_exportacion,
 )
 
+
+def csv_streaming_response(lineas, filename: str) -> StreamingHttpResponse:
+    """Envía un CSV línea a línea sin construirlo completo en memoria"""
+    response = StreamingHttpResponse(lineas, content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def filtros_exportacion(request) -> dict:
+    """Valida los filtros de exportación de la query string (400 si no son válidos)"""
+    serializer = ExportFiltrosSerializer(data=request.query_params.dict())
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def exportacion_cacheada(
+    request,
+    tipo: str,
+    viajes,
+    bloques,
+    filename: str,
+    empleado_id: int | None = None,
+    filtros: dict | None = None
+):
+    """
+    Sirve una exportación desde la caché de artefactos o la genera en streaming.
+
+    ``bloques`` es el generador de la exportación; solo se consume si el
+    artefacto no está en caché, y mientras se envía se guarda una copia.
+    """
+    extension = "zip" if tipo == ExportJob.TIPO_VIAJES_GASTOS_ZIP else "csv"
+    content_type = "application/zip" if extension == "zip" else "text/csv"
+
+    cache = get_export_cache()
+    clave = clave_exportacion(request.user, tipo, viajes, empleado_id, filtros) if cache.activa else None
+
+    if clave:
+        archivo = cache.abrir(clave, extension)
+        if archivo is not None:
+            return FileResponse(
+                archivo, as_attachment=True, filename=filename, content_type=content_type
+            )
+        bloques = cache.guardar_mientras_se_envia(clave, extension, bloques)
+
+    response = StreamingHttpResponse(bloques, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 # ============================================================================
 # VISTAS DE EXPORTACIÓN CSV
 # ============================================================================
@@ -36,17 +91,15 @@ class ExportMasterCSVView(APIView):
         if request.user.role != "MASTER":
             raise UnauthorizedAccessError("Solo MASTER puede exportar todos los viajes")
 
-        viajes = Viaje.objects.filter(estado="REVISADO").select_related(
-            "empresa", "empleado"
+        viajes = filtrar_viajes_exportacion(
+            Viaje.objects.filter(estado="REVISADO").select_related("empresa", "empleado"),
+            filtros_exportacion(request)
         )
 
-        csv_content = generar_csv_viajes_master(viajes)
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="viajes_todas_empresas.csv"'
-        response.write(csv_content)
-
-        return response
+        return csv_streaming_response(
+            iterar_csv_viajes_master(viajes),
+            "viajes_todas_empresas.csv"
+        )
 
 
 class ExportEmpresaCSVView(APIView):
@@ -62,19 +115,20 @@ class ExportEmpresaCSVView(APIView):
         if not empresa:
             raise EmpresaProfileNotFoundError()
 
-        viajes = Viaje.objects.filter(
-            empresa=empresa, estado="REVISADO"
-        ).select_related("empleado")
-
-        csv_content = generar_csv_viajes_empresa(viajes)
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            f'attachment; filename="{empresa.nombre_empresa}_viajes.csv"'
+        filtros = filtros_exportacion(request)
+        viajes = filtrar_viajes_exportacion(
+            Viaje.objects.filter(empresa=empresa, estado="REVISADO").select_related("empleado"),
+            filtros
         )
-        response.write(csv_content)
 
-        return response
+        return exportacion_cacheada(
+            request,
+            ExportJob.TIPO_EMPRESA_CSV,
+            viajes,
+            iterar_csv_viajes_empresa(viajes),
+            f"{empresa.nombre_empresa}_viajes.csv",
+            filtros=filtros
+        )
 
 
 class ExportViajesGastosView(APIView):
@@ -83,22 +137,22 @@ class ExportViajesGastosView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        filtros = filtros_exportacion(request)
         try:
-            viajes, filename_base = obtener_viajes_para_exportacion(request.user)
+            viajes, filename_base = obtener_viajes_para_exportacion(request.user, filtros=filtros)
         except EmpresaProfile.DoesNotExist as err:
             raise EmpresaProfileNotFoundError() from err
         except EmpleadoProfile.DoesNotExist as err:
             raise EmpleadoProfileNotFoundError() from err
 
-        csv_content = generar_csv_viajes_con_gastos(viajes)
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            f'attachment; filename="{filename_base}_viajes_con_gastos.csv"'
+        return exportacion_cacheada(
+            request,
+            ExportJob.TIPO_VIAJES_GASTOS_CSV,
+            viajes,
+            iterar_csv_viajes_con_gastos(viajes),
+            f"{filename_base}_viajes_con_gastos.csv",
+            filtros=filtros
         )
-        response.write(csv_content)
-
-        return response
 
 
 class ExportEmpleadoIndividualView(APIView):
@@ -121,23 +175,25 @@ class ExportEmpleadoIndividualView(APIView):
 
         # MASTER puede ver cualquier empleado
 
+        filtros = filtros_exportacion(request)
         try:
             viajes, filename_base = obtener_viajes_para_exportacion(
                 request.user,
-                empleado_id=empleado_id
+                empleado_id=empleado_id,
+                filtros=filtros
             )
         except Exception as e:
             return HttpResponse(f"Error: {str(e)}", status=500)
 
-        csv_content = generar_csv_viajes_con_gastos(viajes)
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            f'attachment; filename="{filename_base}_viajes_detallados.csv"'
+        return exportacion_cacheada(
+            request,
+            ExportJob.TIPO_VIAJES_GASTOS_CSV,
+            viajes,
+            iterar_csv_viajes_con_gastos(viajes),
+            f"{filename_base}_viajes_detallados.csv",
+            empleado_id=empleado_id,
+            filtros=filtros
         )
-        response.write(csv_content)
-
-        return response
 
 
 # ============================================================================
@@ -150,26 +206,24 @@ class ExportViajesGastosZipView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        filtros = filtros_exportacion(request)
         try:
-            viajes, filename_base = obtener_viajes_para_exportacion(request.user)
+            viajes, filename_base = obtener_viajes_para_exportacion(request.user, filtros=filtros)
         except EmpresaProfile.DoesNotExist as err:
             raise EmpresaProfileNotFoundError() from err
         except EmpleadoProfile.DoesNotExist as err:
             raise EmpleadoProfileNotFoundError() from err
 
-        # Generar ZIP
-        zip_buffer = generar_zip_viajes_con_gastos(
+        # Generar ZIP en streaming (o servirlo desde la caché)
+        return exportacion_cacheada(
+            request,
+            ExportJob.TIPO_VIAJES_GASTOS_ZIP,
             viajes,
-            rol_usuario=request.user.role
+            iterar_zip_viajes_con_gastos(viajes, rol_usuario=request.user.role),
+            f"{filename_base}_viajes_completos.zip",
+            filtros=filtros
         )
 
-        response = HttpResponse(zip_buffer.read(), content_type='application/zip')
-        response['Content-Disposition'] = (
-            f'attachment; filename="{filename_base}_viajes_completos.zip"'
-        )
-
-        return response
-
 
 class ExportEmpleadoIndividualZipView(APIView):
     """Exporta los viajes con gastos y archivos de un empleado específico en ZIP"""
@@ -191,23 +245,111 @@ class ExportEmpleadoIndividualZipView(APIView):
 
         # MASTER puede ver cualquier empleado
 
+        filtros = filtros_exportacion(request)
         try:
             viajes, filename_base = obtener_viajes_para_exportacion(
                 request.user,
-                empleado_id=empleado_id
+                empleado_id=empleado_id,
+                filtros=filtros
             )
         except Exception as e:
             return HttpResponse(f"Error: {str(e)}", status=500)
 
-        # Generar ZIP
-        zip_buffer = generar_zip_viajes_con_gastos(
+        # Generar ZIP en streaming (o servirlo desde la caché)
+        return exportacion_cacheada(
+            request,
+            ExportJob.TIPO_VIAJES_GASTOS_ZIP,
             viajes,
-            rol_usuario=request.user.role
+            iterar_zip_viajes_con_gastos(viajes, rol_usuario=request.user.role),
+            f"{filename_base}_viajes_detallados.zip",
+            empleado_id=empleado_id,
+            filtros=filtros
         )
 
-        response = HttpResponse(zip_buffer.read(), content_type='application/zip')
-        response['Content-Disposition'] = (
-            f'attachment; filename="{filename_base}_viajes_detallados.zip"'
+
+# ============================================================================
+# EXPORTACIONES EN SEGUNDO PLANO
+# ============================================================================
+
+def _validar_solicitud_export_job(user, tipo: str, empleado: EmpleadoProfile | None) -> None:
+    """Aplica a los trabajos en segundo plano los mismos permisos que a las vistas síncronas"""
+    if tipo == ExportJob.TIPO_MASTER_CSV and user.role != "MASTER":
+        raise UnauthorizedAccessError("Solo MASTER puede exportar todos los viajes")
+
+    if tipo == ExportJob.TIPO_EMPRESA_CSV:
+        if user.role != "EMPRESA":
+            raise UnauthorizedAccessError("Solo EMPRESA puede usar esta exportación")
+        if not get_user_empresa(user):
+            raise EmpresaProfileNotFoundError()
+
+    if empleado is not None:
+        if not can_access_empleado(user, empleado):
+            raise UnauthorizedAccessError("No puedes exportar datos de este empleado")
+        return
+
+    if user.role == "EMPRESA" and not get_user_empresa(user):
+        raise EmpresaProfileNotFoundError()
+    if user.role == "EMPLEADO" and not get_user_empleado(user):
+        raise EmpleadoProfileNotFoundError()
+
+
+class ExportJobListCreateView(APIView):
+    """Encola exportaciones en segundo plano y lista las del usuario"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        jobs = ExportJob.objects.filter(usuario=request.user).order_by('-fecha_creacion', '-id')
+        serializer = ExportJobSerializer(jobs, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = ExportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        tipo = serializer.validated_data['tipo']
+        empleado_id = serializer.validated_data.get('empleado_id')
+        empleado = get_object_or_404(EmpleadoProfile, id=empleado_id) if empleado_id else None
+        filtros = serializer.validated_data.get('filtros') or {}
+
+        _validar_solicitud_export_job(request.user, tipo, empleado)
+
+        job = crear_export_job(
+            request.user, tipo, empleado, ExportFiltrosSerializer(filtros).data
+        )
+        return Response(
+            ExportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
         )
 
-        return response
+
+class ExportJobDetailView(APIView):
+    """Devuelve el estado y progreso de una exportación en segundo plano"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id, usuario=request.user)
+        serializer = ExportJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ExportJobDownloadView(APIView):
+    """Descarga el archivo generado por una exportación en segundo plano"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id, usuario=request.user)
+
+        if job.estado != ExportJob.ESTADO_COMPLETADO or not job.archivo:
+            return Response(
+                {"error": "La exportación todavía no está disponible", "estado": job.estado},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return FileResponse(
+            job.archivo.open('rb'),
+            as_attachment=True,
+            filename=job.nombre_archivo
+        )
@@ -5,6 +5,7 @@ Servicios de lógica de negocio para gastos
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from django.db.models import QuerySet
+from django.utils import timezone
 
 from users.common.files import compress_if_image
 from users.common.services import mark_company_review_pending
@@ -185,6 +186,11 @@ def eliminar_gasto(gasto: Gasto) -> None:
     viaje = gasto.viaje
     gasto.delete()
 
+    if viaje:
+        # El borrado elimina su snapshot en cascada: la siguiente publicación
+        # incremental debe revisar el viaje para recalcular su resumen mensual
+        Viaje.objects.filter(pk=viaje.pk).update(updated_at=timezone.now())
+
     if empresa and viaje and viaje.estado == "REVISADO":
         mark_company_review_pending(empresa)
 
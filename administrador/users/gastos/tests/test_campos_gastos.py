@@ -0,0 +1,81 @@
+"""
+Tests para ?fields= / ?omit= en /gastos/.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.common.services import publish_due_releases
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+
+class CamposGastosTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.master = CustomUser.objects.create_user(
+            username="master_campos_gastos", email="master_campos_gastos@test.com", password="pass", role="MASTER",
+        )
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_campos_gastos", email="empresa_campos_gastos@test.com", password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user, nombre_empresa="Empresa Campos Gastos", nif="B77400001",
+            correo_contacto="campos_gastos@test.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_campos_gastos", email="empleado_campos_gastos@test.com", password="pass",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Íñigo", apellido="Gastos", dni="77400001G",
+        )
+        revisado = self._viaje("REVISADO")
+        self._gasto(revisado, "APROBADO")
+        publish_due_releases()
+        self._gasto(self._viaje("EN_REVISION"), "PENDIENTE")
+
+    def _viaje(self, estado):
+        return Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Jaén", fecha_inicio=date(2024, 7, 1),
+            fecha_fin=date(2024, 7, 2), estado=estado, dias_viajados=2,
+        )
+
+    def _gasto(self, viaje, estado):
+        return Gasto.objects.create(
+            empleado=self.empleado, empresa=self.empresa, viaje=viaje, concepto="Tren",
+            monto=Decimal("30.00"), estado=estado,
+        )
+
+    def test_snapshots_y_gastos_en_vivo_respetan_fields(self):
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.empresa_user.pk))
+        self.client.get(reverse('lista_gastos'))
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('lista_gastos'), {'fields': 'id,concepto,estado'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        for gasto in response.data:
+            self.assertEqual(set(gasto), {'id', 'concepto', 'estado'})
+        self.assertEqual({gasto['estado'] for gasto in response.data}, {"APROBADO", "PENDIENTE"})
+        for consulta in contexto.captured_queries:
+            self.assertNotIn('users_empleadoprofile', consulta['sql'])
+
+    def test_master_con_omit(self):
+        self.client.force_authenticate(user=self.master)
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('lista_gastos'), {'omit': 'empleado,empresa,viaje'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn('empresa', response.data[0])
+        self.assertIn('monto', response.data[0])
+        self.assertEqual(len(contexto.captured_queries), 1)
@@ -0,0 +1,83 @@
+"""
+Tests para la paginación por cursor de /gastos/.
+"""
+from datetime import UTC, date, datetime
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.common.services import publish_due_releases
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+
+class GastoListPaginadoTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_gastos_pag", email="empresa_gastos_pag@test.com", password="pass", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user, nombre_empresa="Empresa Gastos Pag", nif="B77100001",
+            correo_contacto="gastos_pag@test.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_gastos_pag", email="empleado_gastos_pag@test.com", password="pass", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Eva", apellido="Gastos", dni="77100001G",
+        )
+
+        revisado = self._viaje("REVISADO")
+        # Fechas de solicitud repetidas entre snapshots y gastos en vivo
+        for dia in (2, 2, 4, 6):
+            self._gasto(revisado, dia, "APROBADO")
+        publish_due_releases()
+        en_revision = self._viaje("EN_REVISION")
+        for dia in (2, 4, 4, 8, 9):
+            self._gasto(en_revision, dia, "PENDIENTE")
+
+    def _viaje(self, estado):
+        return Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Soria", fecha_inicio=date(2024, 2, 1),
+            fecha_fin=date(2024, 2, 2), estado=estado, dias_viajados=2,
+        )
+
+    def _gasto(self, viaje, dia, estado):
+        gasto = Gasto.objects.create(
+            empleado=self.empleado, empresa=self.empresa, viaje=viaje, concepto="Taxi",
+            monto=Decimal("12.00"), estado=estado,
+        )
+        Gasto.objects.filter(pk=gasto.pk).update(
+            fecha_solicitud=datetime(2024, 2, dia, 10, 0, tzinfo=UTC)
+        )
+
+    def test_recorre_todas_las_paginas_sin_repetidos(self):
+        self.client.force_authenticate(user=self.empresa_user)
+        sin_paginar = self.client.get(reverse('lista_gastos')).data
+
+        vistos = []
+        params = {'page_size': 2}
+        while True:
+            response = self.client.get(reverse('lista_gastos'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            vistos.extend(response.data['results'])
+            if response.data['next_cursor'] is None:
+                break
+            params = {'page_size': 2, 'cursor': response.data['next_cursor']}
+
+        self.assertEqual(len(vistos), 9)
+        self.assertCountEqual([g['id'] for g in vistos], [g['id'] for g in sin_paginar])
+        self.assertEqual(
+            [(g['fecha_solicitud'], g['id']) for g in vistos],
+            sorted(((g['fecha_solicitud'], g['id']) for g in vistos), reverse=True),
+        )
+
+    def test_page_size_invalido(self):
+        self.client.force_authenticate(user=self.empresa_user)
+
+        response = self.client.get(reverse('lista_gastos'), {'page_size': 'muchos'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -3,6 +3,7 @@ Vistas para gestión de gastos
 """
 import mimetypes
 
+from django.db.models import F
 from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
@@ -17,13 +18,19 @@ from users.common.exceptions import (
     EmpresaProfileNotFoundError,
     UnauthorizedAccessError,
 )
+from users.common.fieldsets import campos_solicitados
+from users.common.pagination import KeysetPagination, serializar_por_fuente
 from users.common.services import (
+    FuenteVisible,
+    cargar_filas_visibles,
     get_user_empleado,
     get_user_empresa,
     get_visible_gastos_queryset,
     get_visible_viajes_queryset,
+    proyectar_fuentes,
+    unir_fuentes_visibles,
 )
-from users.models import Gasto, Viaje
+from users.models import Gasto, GastoReviewSnapshot, Viaje
 from users.serializers import GastoSerializer, GastoSnapshotSerializer
 
 from .services import (
@@ -35,6 +42,10 @@ from .services import (
     validar_viaje_para_gasto,
 )
 
+# Orden de los listados: la unión proyecta la fecha de solicitud y el id del
+# gasto original (también en los snapshots)
+GASTOS_ORDERING = ("-orden_fecha", "-orden_id")
+
 
 class CrearGastoView(APIView):
     """Permite a un empleado registrar un gasto en un viaje"""
@@ -102,17 +113,36 @@ class AprobarRechazarGastoView(APIView):
 
 
 class GastoListView(APIView):
-    """Vista para listar los gastos con detalles de los viajes"""
+    """
+    Vista para listar los gastos con detalles de los viajes.
+
+    Con ``?page_size=`` o ``?cursor=`` la lista se pagina por
+    ``(fecha_solicitud, id)`` descendente. Snapshots y gastos en vivo se unen
+    con ``UNION ALL`` en la base de datos. ``?fields=`` / ``?omit=`` limitan
+    los campos de cada gasto y las relaciones que se cargan.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
+        paginador = KeysetPagination(GASTOS_ORDERING)
+        campos = campos_solicitados(request, GastoSerializer.campos_disponibles())
+
+        def serializar_en_vivo(gastos):
+            return GastoSerializer(gastos, many=True, context={'request': request}, fields=campos).data
+
+        def preparar(serializer_class, queryset):
+            return queryset if campos is None else serializer_class.preparar_queryset(queryset, campos)
 
         if user.role == "MASTER":
-            gastos = obtener_gastos_por_rol(user)
-            serializer = GastoSerializer(gastos, many=True, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            gastos = preparar(GastoSerializer, obtener_gastos_por_rol(user))
+            if paginador.is_requested(request):
+                gastos = gastos.annotate(orden_fecha=F('fecha_solicitud'), orden_id=F('id'))
+                return paginador.get_paginated_response(
+                    serializar_en_vivo(paginador.paginate_queryset(gastos, request))
+                )
+            return Response(serializar_en_vivo(gastos), status=status.HTTP_200_OK)
 
         if user.role == "EMPRESA":
             empresa = get_user_empresa(user)
@@ -131,19 +161,33 @@ class GastoListView(APIView):
 
         visible_viajes = get_visible_viajes_queryset(user)
 
-        snapshot_data = []
         if visible_viajes.uses_snapshot:
-            snapshot_qs = get_visible_gastos_queryset(visible_viajes).select_related('gasto', 'viaje_snapshot')
-            snapshot_serializer = GastoSnapshotSerializer(snapshot_qs, many=True, context={'request': request})
-            snapshot_data = snapshot_serializer.data
+            snapshot_qs = GastoSnapshotSerializer.preparar_queryset(
+                get_visible_gastos_queryset(visible_viajes),
+                GastoSnapshotSerializer.campos_disponibles() if campos is None else campos,
+            )
+        else:
+            snapshot_qs = GastoReviewSnapshot.objects.none()
 
-        live_serializer = GastoSerializer(live_qs, many=True, context={'request': request})
-        live_data = live_serializer.data
+        def serializar_snapshots(snapshots):
+            return GastoSnapshotSerializer(snapshots, many=True, context={'request': request}, fields=campos).data
 
-        combined = snapshot_data + list(live_data)
-        combined.sort(key=lambda item: item.get('fecha_solicitud') or '', reverse=True)
+        fuentes = [
+            FuenteVisible(snapshot_qs, 'gasto__fecha_solicitud', 'gasto_id'),
+            FuenteVisible(preparar(GastoSerializer, live_qs), 'fecha_solicitud', 'id'),
+        ]
+        if paginador.is_requested(request):
+            filas = paginador.paginate_union(proyectar_fuentes(fuentes), request)
+        else:
+            filas = unir_fuentes_visibles(fuentes).order_by(*GASTOS_ORDERING, 'fuente')
+        data = serializar_por_fuente(
+            cargar_filas_visibles(filas, fuentes),
+            [serializar_snapshots, serializar_en_vivo],
+        )
 
-        return Response(combined, status=status.HTTP_200_OK)
+        if paginador.is_requested(request):
+            return paginador.get_paginated_response(data)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class GastoUpdateDeleteView(APIView):
@@ -0,0 +1,127 @@
+"""Compara la exportación ZIP con lectura de comprobantes en serie y en paralelo."""
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from users.exportacion.services import iterar_zip_viajes_con_gastos
+from users.models import EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+GASTOS_POR_VIAJE = 10
+
+
+class _StorageConLatencia(FileSystemStorage):
+    """Storage local que simula la latencia de un almacenamiento remoto."""
+
+    def __init__(self, latencia: float, **kwargs):
+        super().__init__(**kwargs)
+        self.latencia = latencia
+
+    def exists(self, name):
+        time.sleep(self.latencia)
+        return super().exists(name)
+
+    def size(self, name):
+        time.sleep(self.latencia)
+        return super().size(name)
+
+    def _open(self, name, mode="rb"):
+        time.sleep(self.latencia)
+        return super()._open(name, mode)
+
+
+class Command(BaseCommand):
+    help = "Benchmark de la exportación ZIP con comprobantes sintéticos (serie vs. paralelo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--comprobantes', type=int, default=5000,
+            help='Número de comprobantes sintéticos (por defecto 5000).'
+        )
+        parser.add_argument(
+            '--tamano', type=int, default=16 * 1024,
+            help='Tamaño en bytes de cada comprobante (por defecto 16 KiB).'
+        )
+        parser.add_argument(
+            '--latencia-ms', type=float, default=2.0,
+            help='Latencia simulada por operación de storage en milisegundos (por defecto 2).'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Hilos de lectura para la pasada en paralelo (por defecto 8).'
+        )
+
+    def handle(self, *args, **options):
+        directorio = tempfile.mkdtemp(prefix="benchmark_zip_")
+        try:
+            storage = _StorageConLatencia(options['latencia_ms'] / 1000, location=directorio)
+            viajes = self._crear_datos_sinteticos(storage, options['comprobantes'], options['tamano'])
+
+            serie = self._medir(viajes, max_workers=1)
+            paralelo = self._medir(viajes, max_workers=options['workers'])
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self.stdout.write(f"Comprobantes: {options['comprobantes']} x {options['tamano']} bytes, "
+                          f"latencia {options['latencia_ms']} ms")
+        self.stdout.write(f"Serie:    {serie[0]:.2f} s ({serie[1]} bytes)")
+        self.stdout.write(f"Paralelo: {paralelo[0]:.2f} s ({paralelo[1]} bytes, {options['workers']} hilos)")
+        if paralelo[0] > 0:
+            self.stdout.write(self.style.SUCCESS(f"Mejora: x{serie[0] / paralelo[0]:.2f}"))
+
+    def _crear_datos_sinteticos(self, storage, total: int, tamano: int) -> list[Viaje]:
+        """Construye viajes y gastos en memoria (sin base de datos) con comprobantes en disco."""
+        empresa = EmpresaProfile(id=1, nombre_empresa="Empresa Benchmark", nif="B00000000")
+        empleado = EmpleadoProfile(id=1, empresa=empresa, nombre="Ana", apellido="Benchmark", dni="00000000T")
+        contenido = os.urandom(tamano)
+        os.makedirs(storage.path("comprobantes"), exist_ok=True)
+
+        viajes = []
+        for indice in range(total):
+            if indice % GASTOS_POR_VIAJE == 0:
+                viaje = Viaje(
+                    id=len(viajes) + 1,
+                    empresa=empresa,
+                    empleado=empleado,
+                    destino="Madrid",
+                    fecha_inicio=date(2024, 1, 1),
+                    fecha_fin=date(2024, 1, 3),
+                    estado="REVISADO",
+                    dias_viajados=3,
+                )
+                viaje.dias_exentos_count = 3
+                viaje.dias_no_exentos_count = 0
+                viaje.gastos_exportacion = []
+                viajes.append(viaje)
+
+            nombre = f"comprobantes/factura_{indice}.pdf"
+            with open(storage.path(nombre), "wb") as destino:
+                destino.write(contenido)
+            gasto = Gasto(
+                id=indice + 1,
+                empresa=empresa,
+                empleado=empleado,
+                viaje=viaje,
+                concepto=f"Gasto {indice}",
+                monto=Decimal("10.00"),
+                estado="APROBADO",
+                comprobante=nombre,
+            )
+            gasto.comprobante.storage = storage
+            viaje.gastos_exportacion.append(gasto)
+
+        return viajes
+
+    def _medir(self, viajes: list[Viaje], max_workers: int) -> tuple[float, int]:
+        inicio = time.perf_counter()
+        total_bytes = sum(
+            len(bloque)
+            for bloque in iterar_zip_viajes_con_gastos(viajes, rol_usuario="MASTER", max_workers=max_workers)
+        )
+        return time.perf_counter() - inicio, total_bytes
+
@@ -0,0 +1,144 @@
+"""Compara las métricas por empleado con subconsultas correlacionadas y con el motor agrupado."""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Viaje
+from users.reportes.services import calcular_metricas_empleados
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de calcular_metricas_empleados frente a las cuatro subconsultas "
+        "correlacionadas por empleado. Los datos se crean dentro de una transacción "
+        "que se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empleados', type=int, default=5000,
+            help='Número de empleados de la empresa sintética (por defecto 5000).'
+        )
+        parser.add_argument(
+            '--viajes', type=int, default=4,
+            help='Viajes por empleado (por defecto 4).'
+        )
+        parser.add_argument(
+            '--dias', type=int, default=3,
+            help='Días por viaje (por defecto 3).'
+        )
+        parser.add_argument(
+            '--repeticiones', type=int, default=5,
+            help='Ejecuciones medidas de cada variante (por defecto 5).'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            empresa = self._crear_empresa_sintetica(options['empleados'], options['viajes'], options['dias'])
+            empleados = EmpleadoProfile.objects.filter(empresa=empresa)
+
+            subconsultas = self._medir(
+                "Subconsultas correlacionadas", lambda: self._metricas_con_subconsultas(empleados),
+                options['repeticiones'],
+            )
+            agrupado = self._medir(
+                "Motor agrupado", lambda: calcular_metricas_empleados(empleados), options['repeticiones'],
+            )
+            self.stdout.write(f"Mejora: x{subconsultas / agrupado:.1f}")
+
+            transaction.set_rollback(True)
+
+    def _medir(self, etiqueta: str, funcion, repeticiones: int) -> float:
+        funcion()  # calentamiento
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            filas = len(funcion())
+        media = (time.perf_counter() - inicio) / repeticiones
+        self.stdout.write(f"{etiqueta}: {media * 1000:.1f} ms ({filas} empleados)")
+        return media
+
+    def _metricas_con_subconsultas(self, empleados) -> list:
+        """Implementación anterior: cuatro subconsultas correlacionadas por empleado."""
+        viajes_qs = Viaje.objects.filter(empleado=OuterRef('pk'))
+        dias_qs = DiaViaje.objects.filter(viaje__empleado=OuterRef('pk'))
+
+        def contar(queryset, campo, agregado):
+            return Coalesce(
+                Subquery(queryset.values(campo).annotate(total=agregado).values('total'),
+                         output_field=IntegerField()),
+                Value(0),
+            )
+
+        return list(
+            empleados.annotate(
+                trips=contar(viajes_qs, 'empleado', Count('pk')),
+                days=contar(viajes_qs, 'empleado', Sum('dias_viajados')),
+                nonExemptDays=contar(dias_qs.filter(exento=False), 'viaje__empleado', Count('pk')),
+                exemptDays=contar(dias_qs.filter(exento=True), 'viaje__empleado', Count('pk')),
+            )
+            .filter(Q(trips__gt=0) | Q(days__gt=0) | Q(nonExemptDays__gt=0) | Q(exemptDays__gt=0))
+            .values('id', 'nombre', 'apellido', 'user__email', 'trips', 'days', 'nonExemptDays', 'exemptDays')
+        )
+
+    def _crear_empresa_sintetica(self, total_empleados: int, viajes: int, dias: int) -> EmpresaProfile:
+        inicio = time.perf_counter()
+        user = CustomUser.objects.create_user(
+            username="benchmark_metricas", email="benchmark_metricas@example.com", role="EMPRESA"
+        )
+        empresa = EmpresaProfile.objects.create(
+            user=user, nombre_empresa="Benchmark Métricas", nif="B99999998"
+        )
+        usuarios = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    username=f"benchmark_metricas_{indice}",
+                    email=f"benchmark_metricas_{indice}@example.com",
+                    role="EMPLEADO",
+                )
+                for indice in range(total_empleados)
+            ],
+            batch_size=1000,
+        )
+        empleados = EmpleadoProfile.objects.bulk_create(
+            [
+                EmpleadoProfile(
+                    user=usuario, empresa=empresa, nombre="Bench", apellido=str(indice), dni=f"BM{indice:07d}"
+                )
+                for indice, usuario in enumerate(usuarios)
+            ],
+            batch_size=1000,
+        )
+        base = date(2024, 1, 1)
+        creados = Viaje.objects.bulk_create(
+            [
+                Viaje(
+                    empresa=empresa,
+                    empleado=empleado,
+                    destino=f"Destino {numero}",
+                    fecha_inicio=base + timedelta(days=numero * (dias + 1)),
+                    fecha_fin=base + timedelta(days=numero * (dias + 1) + dias - 1),
+                    estado="REVISADO",
+                    dias_viajados=dias,
+                )
+                for empleado in empleados
+                for numero in range(viajes)
+            ],
+            batch_size=1000,
+        )
+        DiaViaje.objects.bulk_create(
+            [
+                DiaViaje(viaje=viaje, fecha=viaje.fecha_inicio + timedelta(days=offset), exento=offset % 2 == 0)
+                for viaje in creados
+                for offset in range(dias)
+            ],
+            batch_size=1000,
+        )
+        self.stdout.write(
+            f"Datos sintéticos: {total_empleados} empleados, {len(creados)} viajes, "
+            f"{len(creados) * dias} días ({time.perf_counter() - inicio:.2f} s)"
+        )
+        return empresa
@@ -0,0 +1,129 @@
+"""Mide el tiempo de publicación de snapshots para una empresa sintética."""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.common.snapshots import publicar_snapshots_empresa
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de sync_company_review_snapshots sobre una empresa sintética. "
+        "Los datos se crean dentro de una transacción que se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--viajes', type=int, default=10000,
+            help='Número de viajes REVISADO de la empresa sintética (por defecto 10000).'
+        )
+        parser.add_argument(
+            '--dias', type=int, default=3,
+            help='Días por viaje (por defecto 3).'
+        )
+        parser.add_argument(
+            '--gastos', type=int, default=2,
+            help='Gastos aprobados por viaje (por defecto 2).'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            empresa = self._crear_empresa_sintetica(options['viajes'], options['dias'], options['gastos'])
+
+            self._medir("Primera publicación", empresa)
+            self._medir("Republicación sin cambios", empresa)
+
+            modificados = list(
+                Viaje.objects.filter(empresa=empresa).values_list("id", flat=True)[::10]
+            )
+            Viaje.objects.filter(id__in=modificados).update(
+                destino="Destino modificado", updated_at=timezone.now()
+            )
+            self._medir(f"Republicación con {len(modificados)} viajes modificados", empresa)
+
+            desde = timezone.now()
+            self._medir("Republicación incremental sin cambios", empresa, desde=desde)
+            ultimo = Viaje.objects.filter(empresa=empresa).latest("id")
+            ultimo.destino = "Último destino"
+            ultimo.save(update_fields=["destino"])
+            self._medir("Republicación incremental con 1 viaje modificado", empresa, desde=desde)
+
+            transaction.set_rollback(True)
+
+    def _medir(self, etiqueta: str, empresa: EmpresaProfile, desde=None) -> None:
+        inicio = time.perf_counter()
+        resultado = publicar_snapshots_empresa(empresa, timezone.now(), desde=desde)
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f"{etiqueta}: {duracion:.2f} s "
+            f"(creados={resultado.creados}, actualizados={resultado.actualizados}, "
+            f"eliminados={resultado.eliminados})"
+        )
+
+    def _crear_empresa_sintetica(self, total_viajes: int, dias: int, gastos: int) -> EmpresaProfile:
+        user = CustomUser.objects.create_user(
+            username="benchmark_publicacion", email="benchmark_publicacion@example.com", role="EMPRESA"
+        )
+        empresa = EmpresaProfile.objects.create(
+            user=user, nombre_empresa="Benchmark Publicación", nif="B99999999"
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="benchmark_publicacion_empleado",
+            email="benchmark_publicacion_empleado@example.com",
+            role="EMPLEADO",
+        )
+        empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=empresa, nombre="Bench", apellido="Mark", dni="99999999R"
+        )
+
+        inicio = time.perf_counter()
+        base = date(2020, 1, 1)
+        Viaje.objects.bulk_create(
+            [
+                Viaje(
+                    empresa=empresa,
+                    empleado=empleado,
+                    destino=f"Destino {indice}",
+                    fecha_inicio=base + timedelta(days=indice),
+                    fecha_fin=base + timedelta(days=indice + dias - 1),
+                    estado="REVISADO",
+                    dias_viajados=dias,
+                )
+                for indice in range(total_viajes)
+            ],
+            batch_size=1000,
+        )
+        viajes = list(Viaje.objects.filter(empresa=empresa).values_list("id", "fecha_inicio"))
+        DiaViaje.objects.bulk_create(
+            [
+                DiaViaje(viaje_id=viaje_id, fecha=fecha + timedelta(days=offset), revisado=True)
+                for viaje_id, fecha in viajes
+                for offset in range(dias)
+            ],
+            batch_size=1000,
+        )
+        Gasto.objects.bulk_create(
+            [
+                Gasto(
+                    empresa=empresa,
+                    empleado=empleado,
+                    viaje_id=viaje_id,
+                    concepto=f"Gasto {numero}",
+                    monto=Decimal("25.00"),
+                    estado="APROBADO",
+                )
+                for viaje_id, _fecha in viajes
+                for numero in range(gastos)
+            ],
+            batch_size=1000,
+        )
+        self.stdout.write(
+            f"Datos sintéticos: {total_viajes} viajes, {total_viajes * dias} días, "
+            f"{total_viajes * gastos} gastos ({time.perf_counter() - inicio:.2f} s)"
+        )
+        return empresa
@@ -0,0 +1,42 @@
+"""Worker que procesa las exportaciones encoladas en segundo plano."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.exportacion.jobs import procesar_cola_exportaciones
+
+
+class Command(BaseCommand):
+    help = "Procesa las exportaciones pendientes (ExportJob) usando la base de datos como cola"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Procesa los trabajos pendientes y termina en lugar de quedarse sondeando.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos de espera entre sondeos cuando la cola está vacía (por defecto 5).'
+        )
+        parser.add_argument(
+            '--max-jobs', type=int, default=None,
+            help='Número máximo de trabajos a procesar antes de terminar.'
+        )
+
+    def handle(self, *args, **options):
+        max_jobs = options['max_jobs']
+        total = 0
+
+        while True:
+            restantes = None if max_jobs is None else max_jobs - total
+            procesados = procesar_cola_exportaciones(max_jobs=restantes)
+            total += procesados
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(f'Procesadas {procesados} exportaciones.'))
+
+            if options['once'] or (max_jobs is not None and total >= max_jobs):
+                break
+            if not procesados:
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(f'Worker de exportaciones finalizado ({total} trabajos).')
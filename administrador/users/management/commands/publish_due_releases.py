@@ -0,0 +1,46 @@
+"""Scheduler que publica los snapshots de las empresas con la release vencida."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.common.services import RELEASES_BATCH_SIZE, publish_due_releases
+
+
+class Command(BaseCommand):
+    help = (
+        "Publica los snapshots revisados de las empresas cuya release está vencida "
+        "(next_release_at o manual_release_at alcanzados, o force_release activo)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Publica las releases vencidas y termina en lugar de quedarse sondeando.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=60.0,
+            help='Segundos de espera entre sondeos (por defecto 60).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=RELEASES_BATCH_SIZE,
+            help=f'Empresas cargadas por consulta (por defecto {RELEASES_BATCH_SIZE}).'
+        )
+        parser.add_argument(
+            '--max-empresas', type=int, default=None,
+            help='Número máximo de empresas a publicar en cada pasada.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            publicadas = publish_due_releases(
+                batch_size=options['batch_size'],
+                max_empresas=options['max_empresas'],
+            )
+            if publicadas:
+                self.stdout.write(self.style.SUCCESS(f'Publicadas {publicadas} empresas.'))
+
+            if options['once']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write('Publicación de releases finalizada.')
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-17 01:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0042_alter_passwordresettoken_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('MASTER_CSV', 'CSV de viajes de todas las empresas'), ('EMPRESA_CSV', 'CSV de viajes de la empresa'), ('VIAJES_GASTOS_CSV', 'CSV de viajes con gastos'), ('VIAJES_GASTOS_ZIP', 'ZIP de viajes, gastos y comprobantes')], max_length=20)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=15)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('bytes_procesados', models.PositiveBigIntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='exportaciones/')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('error', models.TextField(blank=True, default='')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('empleado', models.ForeignKey(blank=True, help_text='Empleado concreto a exportar (opcional)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='users.empleadoprofile')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='exportjob_cola_idx')],
+            },
+        ),
+    ]
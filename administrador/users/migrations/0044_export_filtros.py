@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0043_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='filtros',
+            field=models.JSONField(blank=True, default=dict, help_text='Filtros de la exportación (fechas, estado...)'),
+        ),
+        migrations.AddIndex(
+            model_name='viaje',
+            index=models.Index(fields=['empresa', 'fecha_inicio'], name='viaje_empresa_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.5 on 2026-10-17 02:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+
+def rellenar_resumenes(apps, schema_editor):
+    # Agregación congelada: no debe seguir los cambios de users.common.rollups
+    ViajeReviewSnapshot = apps.get_model('users', 'ViajeReviewSnapshot')
+    DiaViajeReviewSnapshot = apps.get_model('users', 'DiaViajeReviewSnapshot')
+    ResumenMensualSnapshot = apps.get_model('users', 'ResumenMensualSnapshot')
+    now = timezone.now()
+
+    resumenes = {}
+    viajes_por_mes = (
+        ViajeReviewSnapshot.objects
+        .annotate(mes=TruncMonth('fecha_inicio'))
+        .values('empresa_id', 'empleado_id', 'mes')
+        .annotate(
+            viajes=Count('id'),
+            viajes_nacionales=Count('id', filter=Q(es_internacional=False)),
+            viajes_internacionales=Count('id', filter=Q(es_internacional=True)),
+            dias=Coalesce(Sum('dias_viajados'), Value(0)),
+        )
+        .order_by()
+    )
+    for fila in viajes_por_mes:
+        clave = (fila.pop('empresa_id'), fila.pop('empleado_id'), fila.pop('mes'))
+        resumenes[clave] = {**fila, 'dias_exentos': 0, 'dias_no_exentos': 0}
+
+    dias_por_mes = (
+        DiaViajeReviewSnapshot.objects
+        .annotate(mes=TruncMonth('viaje_snapshot__fecha_inicio'))
+        .values('viaje_snapshot__empresa_id', 'viaje_snapshot__empleado_id', 'mes')
+        .annotate(
+            exentos=Count('id', filter=Q(exento=True)),
+            no_exentos=Count('id', filter=Q(exento=False)),
+        )
+        .order_by()
+    )
+    for fila in dias_por_mes:
+        clave = (fila['viaje_snapshot__empresa_id'], fila['viaje_snapshot__empleado_id'], fila['mes'])
+        if clave in resumenes:
+            resumenes[clave]['dias_exentos'] = fila['exentos']
+            resumenes[clave]['dias_no_exentos'] = fila['no_exentos']
+
+    ResumenMensualSnapshot.objects.bulk_create(
+        [
+            ResumenMensualSnapshot(
+                empresa_id=empresa_id, empleado_id=empleado_id, mes=mes, published_at=now, **valores
+            )
+            for (empresa_id, empleado_id, mes), valores in resumenes.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0045_updated_at_publicacion_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de inicio de los viajes')),
+                ('viajes', models.PositiveIntegerField(default=0)),
+                ('viajes_nacionales', models.PositiveIntegerField(default=0)),
+                ('viajes_internacionales', models.PositiveIntegerField(default=0)),
+                ('dias', models.PositiveIntegerField(default=0, help_text='Suma de dias_viajados')),
+                ('dias_exentos', models.PositiveIntegerField(default=0)),
+                ('dias_no_exentos', models.PositiveIntegerField(default=0)),
+                ('published_at', models.DateTimeField()),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='users.empleadoprofile')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='users.empresaprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'empleado', 'mes'), name='resumen_mensual_unico')],
+            },
+        ),
+        migrations.RunPython(rellenar_resumenes, migrations.RunPython.noop),
+    ]
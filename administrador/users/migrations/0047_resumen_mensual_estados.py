@@ -0,0 +1,59 @@
+# Generated by Django 5.1.5 on 2026-10-17 02:27
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import TruncMonth
+
+
+def rellenar_estados(apps, schema_editor):
+    # Agregación congelada: no debe seguir los cambios de users.common.rollups
+    ViajeReviewSnapshot = apps.get_model('users', 'ViajeReviewSnapshot')
+    GastoReviewSnapshot = apps.get_model('users', 'GastoReviewSnapshot')
+    ResumenMensualSnapshot = apps.get_model('users', 'ResumenMensualSnapshot')
+
+    gasto_rechazado = GastoReviewSnapshot.objects.filter(viaje_snapshot=OuterRef('pk'), estado='RECHAZADO')
+    estados_por_mes = (
+        ViajeReviewSnapshot.objects
+        .annotate(mes=TruncMonth('fecha_inicio'))
+        .values('empresa_id', 'empleado_id', 'mes')
+        .annotate(
+            pendientes=Count('id', filter=Q(estado__in=['EN_REVISION', 'REABIERTO'])),
+            revisados=Count('id', filter=Q(estado='REVISADO')),
+            rechazados=Count('id', filter=Exists(gasto_rechazado)),
+        )
+        .order_by()
+    )
+    for fila in estados_por_mes:
+        ResumenMensualSnapshot.objects.filter(
+            empresa_id=fila['empresa_id'], empleado_id=fila['empleado_id'], mes=fila['mes']
+        ).update(
+            viajes_pendientes=fila['pendientes'],
+            viajes_revisados=fila['revisados'],
+            viajes_rechazados=fila['rechazados'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0046_resumen_mensual_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumenmensualsnapshot',
+            name='viajes_pendientes',
+            field=models.PositiveIntegerField(default=0, help_text='EN_REVISION o REABIERTO'),
+        ),
+        migrations.AddField(
+            model_name='resumenmensualsnapshot',
+            name='viajes_rechazados',
+            field=models.PositiveIntegerField(default=0, help_text='Viajes con algún gasto rechazado'),
+        ),
+        migrations.AddField(
+            model_name='resumenmensualsnapshot',
+            name='viajes_revisados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rellenar_estados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-17 02:41
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def fusionar_dias_duplicados(apps, schema_editor):
+    """Deja un solo DiaViaje por (viaje, fecha) moviendo sus gastos al que se conserva."""
+    DiaViaje = apps.get_model('users', 'DiaViaje')
+    Gasto = apps.get_model('users', 'Gasto')
+
+    duplicados = (
+        DiaViaje.objects
+        .values('viaje_id', 'fecha')
+        .annotate(total=Count('id'), conservar=Min('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in duplicados:
+        sobrantes = DiaViaje.objects.filter(
+            viaje_id=grupo['viaje_id'], fecha=grupo['fecha']
+        ).exclude(pk=grupo['conservar'])
+        Gasto.objects.filter(dia__in=sobrantes).update(dia_id=grupo['conservar'])
+        # Los snapshots de los días sobrantes se borran en cascada; la
+        # siguiente publicación los regenera
+        sobrantes.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0047_resumen_mensual_estados'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_dias_duplicados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Migración aparte de 0048: en PostgreSQL no se puede alterar la tabla en
+    # la misma transacción que acaba de modificar filas con FKs diferidas
+
+    dependencies = [
+        ('users', '0048_fusionar_dias_duplicados'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='diaviaje',
+            constraint=models.UniqueConstraint(fields=('viaje', 'fecha'), name='dia_viaje_unico'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-17 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0049_dia_viaje_unico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario_destino', 'leida', 'fecha_creacion'], name='notificacion_bandeja_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='viajereviewsnapshot',
+            index=models.Index(fields=['empresa', 'fecha_inicio'], name='viaje_snapshot_fecha_idx'),
+        ),
+    ]
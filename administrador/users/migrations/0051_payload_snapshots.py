@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0050_indices_listados_paginados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gastoreviewsnapshot',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='viajereviewsnapshot',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0051_payload_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='ultimo_latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-17 04:01
+
+import os
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+import users.models
+
+
+def mover_archivos_fuera_de_media(apps, schema_editor):
+    """Pasa los archivos ya generados de MEDIA al storage privado con nombre aleatorio."""
+    ExportJob = apps.get_model('users', 'ExportJob')
+    storage = users.models.ExportJobStorage()
+
+    for job in ExportJob.objects.exclude(archivo='').exclude(archivo__isnull=True).iterator():
+        anterior = job.archivo.name
+        if not default_storage.exists(anterior):
+            continue
+        extension = os.path.splitext(anterior)[1].lower()
+        with default_storage.open(anterior, 'rb') as origen:
+            job.archivo.name = storage.save(f'exportaciones/{uuid.uuid4().hex}{extension}', origen)
+        job.save(update_fields=['archivo'])
+        default_storage.delete(anterior)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0052_exportjob_latido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, storage=users.models.ExportJobStorage(), upload_to=users.models.ruta_export_job),
+        ),
+        migrations.RunPython(mover_archivos_fuera_de_media, migrations.RunPython.noop),
+    ]
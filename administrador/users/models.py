@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import os
 import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.utils.timezone import now
 
@@ -14,6 +17,26 @@ def password_reset_token_expiration_default():
     return now() + timedelta(hours=1)
 
 
+class ModificacionRastreadaModel(models.Model):
+    """
+    Base abstracta con marca de última modificación.
+
+    ``updated_at`` se actualiza también en los ``save(update_fields=...)``,
+    así la publicación incremental de snapshots puede fiarse de ella. Los
+    ``QuerySet.update()`` deben incluir ``updated_at=timezone.now()``.
+    """
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "updated_at"}
+        super().save(*args, **kwargs)
+
+
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
         ('MASTER', 'Master'),
@@ -121,7 +144,7 @@ class PasswordResetToken(models.Model):
         """verificamos si el token es valido"""
         return now() < self.expires_at
 
-class Viaje(models.Model):
+class Viaje(ModificacionRastreadaModel):
     """Modelo para manejar los viajes solicitados por empleados"""
 
     ESTADO_CHOICES = [
@@ -144,10 +167,16 @@ class Viaje(models.Model):
     empresa_visitada = models.CharField(max_length=255, null=True, blank=True)  # noqa: DJ001  # Empresa visitada
     motivo = models.TextField(max_length=500, default="No se ha declarado el motivo por parte del empleado")  # noqa: DJ001  # Motivo del viaje
 
+    class Meta:
+        indexes = [
+            # Exportaciones filtradas por rango de fechas dentro de una empresa
+            models.Index(fields=["empresa", "fecha_inicio"], name="viaje_empresa_fecha_idx"),
+        ]
+
     def __str__(self):
         return f"{self.empleado.nombre} viaja a {self.destino} ({self.estado})"
 
-class DiaViaje(models.Model):
+class DiaViaje(ModificacionRastreadaModel):
     """Modelo para manejar los días de viaje"""
 
     viaje = models.ForeignKey(Viaje, on_delete=models.CASCADE, related_name="dias")
@@ -157,6 +186,12 @@ class DiaViaje(models.Model):
     exento = models.BooleanField(default=True)
     revisado = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # Permite crear los días con bulk_create(ignore_conflicts=True)
+            models.UniqueConstraint(fields=["viaje", "fecha"], name="dia_viaje_unico"),
+        ]
+
     def __str__(self) -> str:
         return f"DiaViaje {self.id} ({self.fecha})"
 
@@ -179,6 +214,14 @@ class ViajeReviewSnapshot(models.Model):
     motivo = models.TextField(max_length=500, null=True, blank=True)  # noqa: DJ001
     published_at = models.DateTimeField(auto_now_add=True)
     source_updated_at = models.DateTimeField(null=True, blank=True)
+    # Campos congelados ya serializados; lo escribe el publicador
+    payload = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listados paginados por fecha de inicio dentro de una empresa
+            models.Index(fields=["empresa", "fecha_inicio"], name="viaje_snapshot_fecha_idx"),
+        ]
 
     def __str__(self):
         return f"Snapshot Viaje {self.viaje_id} ({self.estado})"
@@ -203,7 +246,7 @@ class DiaViajeReviewSnapshot(models.Model):
         return f"Snapshot Día {self.dia_id} (exento={self.exento})"
 
 
-class Gasto(models.Model):
+class Gasto(ModificacionRastreadaModel):
     """Modelo de gastos asociados a viajes"""
 
     ESTADO_CHOICES = [
@@ -247,11 +290,44 @@ class GastoReviewSnapshot(models.Model):
     fecha_gasto = models.DateField(null=True, blank=True, help_text="Fecha del gasto")
     published_at = models.DateTimeField(auto_now_add=True)
     source_updated_at = models.DateTimeField(null=True, blank=True)
+    # Campos congelados ya serializados; lo escribe el publicador
+    payload = models.JSONField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Snapshot Gasto {self.gasto_id} ({self.estado})"
 
 
+class ResumenMensualSnapshot(models.Model):
+    """Totales publicados por empresa, empleado y mes de inicio del viaje.
+
+    Se recalculan al publicar los snapshots de la empresa y los reportes
+    los leen en lugar de agregar las tablas de snapshots en cada petición.
+    """
+
+    empresa = models.ForeignKey("EmpresaProfile", on_delete=models.CASCADE, related_name="resumenes_mensuales")
+    empleado = models.ForeignKey("EmpleadoProfile", on_delete=models.CASCADE, related_name="resumenes_mensuales")
+    mes = models.DateField(help_text="Primer día del mes de inicio de los viajes")
+    viajes = models.PositiveIntegerField(default=0)
+    viajes_nacionales = models.PositiveIntegerField(default=0)
+    viajes_internacionales = models.PositiveIntegerField(default=0)
+    viajes_pendientes = models.PositiveIntegerField(default=0, help_text="EN_REVISION o REABIERTO")
+    viajes_revisados = models.PositiveIntegerField(default=0)
+    viajes_rechazados = models.PositiveIntegerField(default=0, help_text="Viajes con algún gasto rechazado")
+    dias = models.PositiveIntegerField(default=0, help_text="Suma de dias_viajados")
+    dias_exentos = models.PositiveIntegerField(default=0)
+    dias_no_exentos = models.PositiveIntegerField(default=0)
+    published_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # También sirve de índice para las consultas por empresa y por empleado
+            models.UniqueConstraint(fields=["empresa", "empleado", "mes"], name="resumen_mensual_unico"),
+        ]
+
+    def __str__(self):
+        return f"Resumen {self.empresa_id}/{self.empleado_id} {self.mes:%Y-%m}"
+
+
 class Notificacion(models.Model):
     TIPO_VIAJE_SOLICITADO = "VIAJE_SOLICITADO"
     TIPO_VIAJE_APROBADO = "VIAJE_APROBADO"
@@ -271,6 +347,12 @@ class Notificacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     leida = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Bandeja de no leídas paginada por fecha de creación
+            models.Index(fields=["usuario_destino", "leida", "fecha_creacion"], name="notificacion_bandeja_idx"),
+        ]
+
     def __str__(self):
         return f"{self.tipo} - {self.usuario_destino}"
 
@@ -372,3 +454,90 @@ class ConversacionLectura(models.Model):
 
     def __str__(self):
         return f"Lectura conversacion {self.conversacion_id} - {self.usuario_id}"
+
+
+class ExportJobStorage(FileSystemStorage):
+    """
+    Storage privado de los archivos de ExportJob en ``EXPORT_JOBS_DIR``.
+
+    Está fuera de MEDIA_ROOT y no tiene URL pública: los archivos solo se
+    descargan a través de ``ExportJobDownloadView``.
+    """
+
+    @property
+    def base_location(self):
+        return settings.EXPORT_JOBS_DIR
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return None
+
+
+def ruta_export_job(instance, filename):
+    """Nombre aleatorio del archivo; el nombre de descarga va en ``nombre_archivo``."""
+    extension = os.path.splitext(filename)[1].lower()
+    return f"exportaciones/{uuid.uuid4().hex}{extension}"
+
+
+class ExportJob(models.Model):
+    """Exportación de viajes procesada en segundo plano por el worker de exportaciones"""
+
+    TIPO_MASTER_CSV = "MASTER_CSV"
+    TIPO_EMPRESA_CSV = "EMPRESA_CSV"
+    TIPO_VIAJES_GASTOS_CSV = "VIAJES_GASTOS_CSV"
+    TIPO_VIAJES_GASTOS_ZIP = "VIAJES_GASTOS_ZIP"
+
+    TIPO_CHOICES = [
+        (TIPO_MASTER_CSV, "CSV de viajes de todas las empresas"),
+        (TIPO_EMPRESA_CSV, "CSV de viajes de la empresa"),
+        (TIPO_VIAJES_GASTOS_CSV, "CSV de viajes con gastos"),
+        (TIPO_VIAJES_GASTOS_ZIP, "ZIP de viajes, gastos y comprobantes"),
+    ]
+
+    ESTADO_PENDIENTE = "PENDIENTE"
+    ESTADO_EN_PROCESO = "EN_PROCESO"
+    ESTADO_COMPLETADO = "COMPLETADO"
+    ESTADO_ERROR = "ERROR"
+
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, "Pendiente"),
+        (ESTADO_EN_PROCESO, "En proceso"),
+        (ESTADO_COMPLETADO, "Completado"),
+        (ESTADO_ERROR, "Error"),
+    ]
+
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="export_jobs")
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    empleado = models.ForeignKey(
+        EmpleadoProfile,
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+        null=True,
+        blank=True,
+        help_text="Empleado concreto a exportar (opcional)",
+    )
+    filtros = models.JSONField(default=dict, blank=True, help_text="Filtros de la exportación (fechas, estado...)")
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    bytes_procesados = models.PositiveBigIntegerField(default=0)
+    archivo = models.FileField(upload_to=ruta_export_job, storage=ExportJobStorage(), null=True, blank=True)
+    nombre_archivo = models.CharField(max_length=255, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    # El worker lo renueva mientras procesa; sin latido el trabajo se reencola
+    ultimo_latido = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "fecha_creacion"], name="exportjob_cola_idx"),
+        ]
+
+    def __str__(self):
+        return f"ExportJob {self.id} {self.tipo} ({self.estado})"
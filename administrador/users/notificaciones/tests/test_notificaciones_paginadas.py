@@ -0,0 +1,55 @@
+"""
+Tests para la paginación por cursor de /notificaciones/.
+"""
+from datetime import UTC, datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import CustomUser, Notificacion
+
+
+class NotificacionesPaginadasTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.usuario = CustomUser.objects.create_user(
+            username="empresa_avisos", email="empresa_avisos@test.com", password="pass", role="EMPRESA",
+        )
+        for hora in (9, 9, 9, 10, 11):
+            notificacion = Notificacion.objects.create(
+                tipo=Notificacion.TIPO_VIAJE_SOLICITADO, mensaje=f"Aviso {hora}", usuario_destino=self.usuario,
+            )
+            Notificacion.objects.filter(pk=notificacion.pk).update(
+                fecha_creacion=datetime(2024, 5, 1, hora, tzinfo=UTC)
+            )
+        Notificacion.objects.create(
+            tipo=Notificacion.TIPO_VIAJE_SOLICITADO, mensaje="Leída", usuario_destino=self.usuario, leida=True,
+        )
+        self.client.force_authenticate(user=self.usuario)
+
+    def test_recorre_las_no_leidas_por_fecha_descendente(self):
+        primera = self.client.get(reverse('lista_notificaciones'), {'page_size': 2})
+        self.assertEqual(primera.status_code, status.HTTP_200_OK)
+        self.assertEqual([n['mensaje'] for n in primera.data['results']], ["Aviso 11", "Aviso 10"])
+        self.assertIn('cursor=', primera.data['next'])
+
+        vistos = list(primera.data['results'])
+        cursor = primera.data['next_cursor']
+        while cursor:
+            response = self.client.get(reverse('lista_notificaciones'), {'page_size': 2, 'cursor': cursor})
+            vistos.extend(response.data['results'])
+            cursor = response.data['next_cursor']
+
+        ids = [n['id'] for n in vistos]
+        self.assertEqual(len(ids), 5)
+        # Los empates de fecha se resuelven por id descendente
+        self.assertEqual(ids[2:], sorted(ids[2:], reverse=True))
+
+    def test_sin_parametros_mantiene_la_lista(self):
+        response = self.client.get(reverse('lista_notificaciones'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
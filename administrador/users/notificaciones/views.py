@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from users.common.pagination import KeysetPagination
 from users.models import EmpresaProfile, Notificacion
 from users.serializers import NotificacionSerializer
 
@@ -21,7 +22,12 @@ class ListaNotificacionesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Obtiene las notificaciones no leídas del usuario o, si es MASTER, de un usuario destino."""
+        """
+        Obtiene las notificaciones no leídas del usuario o, si es MASTER, de un usuario destino.
+
+        Con ``?page_size=`` o ``?cursor=`` se pagina por ``(fecha_creacion, id)``
+        descendente con la respuesta ``{"next", "next_cursor", "results"}``.
+        """
         empresa_id = request.query_params.get("empresa_id")
         user_id = request.query_params.get("user_id")
 
@@ -52,6 +58,11 @@ class ListaNotificacionesView(APIView):
                 leida=False
             )
 
+        paginador = KeysetPagination(("-fecha_creacion", "-id"))
+        if paginador.is_requested(request):
+            pagina = paginador.paginate_queryset(notificaciones, request)
+            return paginador.get_paginated_response(NotificacionSerializer(pagina, many=True).data)
+
         notificaciones = notificaciones.order_by("-fecha_creacion")
 
         serializer = NotificacionSerializer(notificaciones, many=True)
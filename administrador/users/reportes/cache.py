@@ -0,0 +1,195 @@
+"""
+Caché de respuestas de los reportes.
+
+Los reportes de EMPRESA y EMPLEADO solo leen datos publicados, que no
+cambian hasta la siguiente release de la empresa. Por eso la clave incluye
+``last_release_at`` de la empresa: publicar una release cambia la clave y
+las entradas anteriores dejan de leerse sin tener que invalidarlas. Los de
+MASTER leen datos en vivo y se cachean con un TTL corto
+(``REPORT_CACHE_MASTER_TIMEOUT``).
+
+El backend se configura con el alias ``reportes`` de ``CACHES`` (locmem,
+fichero o Redis). Los contadores de aciertos y fallos se guardan en el
+mismo backend, así que con Redis son globales y con locmem por proceso.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from users.common.services import get_user_empleado, get_user_empresa
+
+REPORT_CACHE_ALIAS = "reportes"
+
+# Endpoints registrados con ``cachear_reporte`` (para las estadísticas)
+_endpoints_cacheados: list[str] = []
+
+
+def get_report_cache():
+    """Backend de caché de los reportes."""
+    return caches[REPORT_CACHE_ALIAS]
+
+
+# ============================================================================
+# CLAVES
+# ============================================================================
+
+def _alcance_usuario(user) -> tuple[str, str, int] | None:
+    """
+    Alcance de los datos que ve el usuario.
+
+    Returns:
+        ``(alcance, epoca, timeout)`` o None si no se puede determinar (rol
+        desconocido o perfil inexistente); en ese caso no se usa la caché y
+        la vista responde con su error habitual.
+    """
+    if user.role == "MASTER":
+        return "MASTER", "", settings.REPORT_CACHE_MASTER_TIMEOUT
+
+    if user.role == "EMPRESA":
+        empresa = get_user_empresa(user)
+        if not empresa:
+            return None
+        alcance = f"EMPRESA:{empresa.id}"
+    elif user.role == "EMPLEADO":
+        empleado = get_user_empleado(user)
+        if not empleado:
+            return None
+        empresa = empleado.empresa
+        alcance = f"EMPLEADO:{empleado.id}"
+    else:
+        return None
+
+    epoca = empresa.last_release_at.isoformat() if empresa.last_release_at else "sin-release"
+    return alcance, epoca, settings.REPORT_CACHE_TIMEOUT
+
+
+def clave_reporte(endpoint: str, user, query_params) -> tuple[str, int] | None:
+    """
+    Clave de caché de un reporte y su TTL.
+
+    La clave combina endpoint, rol, id de empresa/empleado, parámetros de la
+    consulta (ordenados) y, para EMPRESA y EMPLEADO, la época de publicación
+    (``last_release_at``) de la empresa.
+
+    Args:
+        endpoint: Nombre del reporte (el ``name`` de su URL)
+        user: Usuario autenticado
+        query_params: ``request.query_params``
+
+    Returns:
+        ``(clave, timeout)`` o None si la petición no se puede cachear
+
+    Example:
+        clave, timeout = clave_reporte("trips-type", request.user, request.query_params)
+    """
+    alcance = _alcance_usuario(user)
+    if alcance is None:
+        return None
+    scope, epoca, timeout = alcance
+
+    parametros = sorted((nombre, sorted(valores)) for nombre, valores in query_params.lists())
+    huella = hashlib.sha256(repr((endpoint, scope, epoca, parametros)).encode()).hexdigest()
+    return f"reporte:{endpoint}:{huella}", timeout
+
+
+# ============================================================================
+# CONTADORES
+# ============================================================================
+
+def _clave_contador(endpoint: str, tipo: str) -> str:
+    return f"reporte-stats:{endpoint}:{tipo}"
+
+
+def _incrementar(endpoint: str, tipo: str) -> None:
+    cache = get_report_cache()
+    clave = _clave_contador(endpoint, tipo)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Primer incremento: si otro proceso crea el contador a la vez,
+        # ``add`` falla y se incrementa el suyo
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def obtener_estadisticas_cache() -> dict:
+    """
+    Aciertos y fallos de la caché de reportes, en total y por endpoint.
+
+    Example:
+        {"hits": 10, "misses": 4, "hit_ratio": 0.71,
+         "endpoints": {"trips-type": {"hits": 6, "misses": 2}, ...}}
+    """
+    claves = [
+        _clave_contador(endpoint, tipo)
+        for endpoint in _endpoints_cacheados
+        for tipo in ("hits", "misses")
+    ]
+    valores = get_report_cache().get_many(claves)
+
+    endpoints = {
+        endpoint: {
+            tipo: valores.get(_clave_contador(endpoint, tipo), 0)
+            for tipo in ("hits", "misses")
+        }
+        for endpoint in _endpoints_cacheados
+    }
+    hits = sum(contador["hits"] for contador in endpoints.values())
+    misses = sum(contador["misses"] for contador in endpoints.values())
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 2) if hits + misses else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+# ============================================================================
+# DECORADOR
+# ============================================================================
+
+def cachear_reporte(endpoint: str):
+    """
+    Cachea las respuestas 200 del ``get`` de una vista de reportes.
+
+    Solo se guarda ``response.data``; las respuestas de error no se cachean.
+
+    Args:
+        endpoint: Nombre del reporte, usado en la clave y en los contadores
+
+    Example:
+        class TripsTypeView(APIView):
+            @cachear_reporte("trips-type")
+            def get(self, request):
+                ...
+    """
+    if endpoint not in _endpoints_cacheados:
+        _endpoints_cacheados.append(endpoint)
+
+    def decorador(get):
+        @wraps(get)
+        def envoltorio(self, request, *args, **kwargs):
+            clave = clave_reporte(endpoint, request.user, request.query_params)
+            if clave is None:
+                return get(self, request, *args, **kwargs)
+            clave, timeout = clave
+
+            cache = get_report_cache()
+            datos = cache.get(clave)
+            if datos is not None:
+                _incrementar(endpoint, "hits")
+                return Response(datos, status=status.HTTP_200_OK)
+
+            _incrementar(endpoint, "misses")
+            response = get(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(clave, response.data, timeout)
+            return response
+
+        return envoltorio
+
+    return decorador
@@ -0,0 +1,223 @@
+"""
+Servicios de cálculo para los reportes de viajes
+"""
+from dataclasses import dataclass
+
+from django.db.models import Count, Exists, OuterRef, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from users.common.rollups import RESUMEN_CAMPOS, obtener_viajes_por_mes_publicados
+from users.models import DiaViaje, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+
+# ============================================================================
+# MÉTRICAS POR EMPLEADO
+# ============================================================================
+
+@dataclass
+class MetricasEmpleado:
+    """Viajes, días viajados y días exentos/no exentos de un empleado"""
+    empleado_id: int
+    empresa_id: int
+    nombre: str
+    apellido: str
+    email: str
+    trips: int = 0
+    travel_days: int = 0
+    exempt_days: int = 0
+    non_exempt_days: int = 0
+
+    @property
+    def nombre_completo(self) -> str:
+        return f"{self.nombre} {self.apellido}"
+
+
+def calcular_metricas_empleados(empleados: QuerySet) -> list[MetricasEmpleado]:
+    """
+    Calcula las métricas de viajes de los empleados indicados.
+
+    Usa consultas agrupadas por empleado en lugar de subconsultas
+    correlacionadas por fila:
+
+    - ``Viaje``: viajes y ``SUM(dias_viajados)``
+    - ``DiaViaje``: días exentos y no exentos con agregados condicionales
+      (``FILTER``)
+    - ``EmpleadoProfile``: nombre, apellido, email y empresa
+
+    Los días no se agregan en la misma consulta que los viajes porque el
+    join repetiría ``dias_viajados`` una vez por cada día del viaje. El
+    número de consultas es constante (tres) sea cual sea el número de
+    empleados.
+
+    Args:
+        empleados: Empleados a incluir (por ejemplo los de una empresa)
+
+    Returns:
+        Métricas de los empleados con algún viaje, ordenadas por id de empleado
+
+    Example:
+        metricas = calcular_metricas_empleados(
+            EmpleadoProfile.objects.filter(empresa=empresa)
+        )
+    """
+    viajes_por_empleado = {
+        empleado_id: (viajes, dias)
+        for empleado_id, viajes, dias in Viaje.objects
+        .filter(empleado__in=empleados)
+        .values("empleado_id")
+        .annotate(viajes=Count("id"), dias=Coalesce(Sum("dias_viajados"), Value(0)))
+        .values_list("empleado_id", "viajes", "dias")
+        .order_by()
+    }
+    if not viajes_por_empleado:
+        return []
+
+    dias_por_empleado = {
+        empleado_id: (exentos, no_exentos)
+        for empleado_id, exentos, no_exentos in DiaViaje.objects
+        .filter(viaje__empleado__in=empleados)
+        .values("viaje__empleado_id")
+        .annotate(
+            exentos=Count("id", filter=Q(exento=True)),
+            no_exentos=Count("id", filter=Q(exento=False)),
+        )
+        .values_list("viaje__empleado_id", "exentos", "no_exentos")
+        .order_by()
+    }
+
+    metricas = []
+    datos_empleados = (
+        empleados
+        .order_by("id")
+        .values_list("id", "empresa_id", "nombre", "apellido", "user__email")
+    )
+    for empleado_id, empresa_id, nombre, apellido, email in datos_empleados:
+        totales_viajes = viajes_por_empleado.get(empleado_id)
+        if totales_viajes is None:
+            continue
+        metricas.append(MetricasEmpleado(
+            empleado_id, empresa_id, nombre, apellido, email,
+            *totales_viajes,
+            *dias_por_empleado.get(empleado_id, (0, 0)),
+        ))
+    return metricas
+
+
+# ============================================================================
+# TOTALES Y SERIES COMPARTIDOS POR LOS REPORTES
+# ============================================================================
+
+def calcular_totales_master(*, viajes: bool = True, dias: bool = True) -> dict[str, int]:
+    """
+    Totales en vivo de los viajes REVISADOS de todo el sistema.
+
+    Devuelve las mismas claves que ``obtener_totales_publicados`` para que
+    los reportes traten igual a MASTER y a EMPRESA/EMPLEADO. Cada bloque es
+    una sola consulta agregada; el que no se pide queda a cero.
+
+    Args:
+        viajes: Calcular viajes (nacionales/internacionales) y días viajados
+        dias: Calcular días exentos y no exentos
+
+    Returns:
+        Diccionario con las claves de ``RESUMEN_CAMPOS``
+    """
+    totales = dict.fromkeys(RESUMEN_CAMPOS, 0)
+    if viajes:
+        totales.update(
+            Viaje.objects.filter(estado='REVISADO').aggregate(
+                viajes=Count('id'),
+                viajes_nacionales=Count('id', filter=Q(es_internacional=False)),
+                viajes_internacionales=Count('id', filter=Q(es_internacional=True)),
+                dias=Coalesce(Sum('dias_viajados'), Value(0)),
+            )
+        )
+    if dias:
+        totales.update(
+            DiaViaje.objects.filter(viaje__estado='REVISADO').aggregate(
+                dias_exentos=Count('id', filter=Q(exento=True)),
+                dias_no_exentos=Count('id', filter=Q(exento=False)),
+            )
+        )
+    return totales
+
+
+def _fila_mes(mes, total: int, pendientes: int, revisados: int, rechazados: int) -> dict:
+    return {
+        'month': mes.strftime('%Y-%m'),
+        'totalTrips': total,
+        'pendingTrips': pendientes,
+        'reviewedTrips': revisados,
+        'rejectedTrips': rechazados,
+    }
+
+
+def calcular_viajes_por_mes(viajes: QuerySet, anios: tuple[int, int] | None = None) -> list[dict]:
+    """
+    Viajes iniciados por mes con su desglose por estado (datos en vivo).
+
+    ``rejectedTrips`` usa ``EXISTS`` sobre los gastos en lugar de un join,
+    así que cada viaje aporta una sola fila y no hace falta ``DISTINCT``.
+
+    Args:
+        viajes: Viajes a agrupar (``Viaje``)
+        anios: Rango de años ``(desde, hasta)`` incluidos
+
+    Returns:
+        Filas ``{month, totalTrips, pendingTrips, reviewedTrips, rejectedTrips}``
+        ordenadas por mes (``month`` con formato ``YYYY-MM``)
+    """
+    if anios is not None:
+        viajes = viajes.filter(fecha_inicio__year__gte=anios[0], fecha_inicio__year__lte=anios[1])
+
+    gasto_rechazado = Gasto.objects.filter(viaje=OuterRef('pk'), estado='RECHAZADO')
+    viajes_agrupados = (
+        viajes.annotate(month=TruncMonth('fecha_inicio'))
+        .values('month')
+        .annotate(
+            totalTrips=Count('pk'),
+            pendingTrips=Count('pk', filter=Q(estado__in=['EN_REVISION', 'REABIERTO'])),
+            reviewedTrips=Count('pk', filter=Q(estado='REVISADO')),
+            rejectedTrips=Count('pk', filter=Exists(gasto_rechazado)),
+        )
+        .order_by('month')
+    )
+    return [
+        _fila_mes(v['month'], v['totalTrips'], v['pendingTrips'], v['reviewedTrips'], v['rejectedTrips'])
+        for v in viajes_agrupados
+    ]
+
+
+def calcular_viajes_por_mes_publicados(
+    empresa: EmpresaProfile,
+    empleado: EmpleadoProfile | None = None,
+    anios: tuple[int, int] | None = None
+) -> list[dict]:
+    """
+    Igual que ``calcular_viajes_por_mes`` pero desde los resúmenes mensuales
+    publicados (EMPRESA y EMPLEADO).
+    """
+    return [
+        _fila_mes(
+            fila['mes'], fila['viajes'], fila['viajes_pendientes'],
+            fila['viajes_revisados'], fila['viajes_rechazados'],
+        )
+        for fila in obtener_viajes_por_mes_publicados(empresa, empleado, anios=anios)
+    ]
+
+
+def calcular_resumen_personal(empleado: EmpleadoProfile) -> dict[str, int]:
+    """
+    Resumen personal de un empleado (datos en vivo) con dos consultas.
+
+    Returns:
+        ``{reviewedTrips, pendingTrips, exemptDays, nonExemptDays}``
+    """
+    viajes = Viaje.objects.filter(empleado=empleado).aggregate(
+        reviewedTrips=Count('id', filter=Q(estado='REVISADO')),
+        pendingTrips=Count('id', filter=Q(estado__in=['EN_REVISION', 'REABIERTO'])),
+    )
+    dias = DiaViaje.objects.filter(viaje__empleado=empleado, viaje__estado='REVISADO').aggregate(
+        exemptDays=Count('id', filter=Q(exento=True)),
+        nonExemptDays=Count('id', filter=Q(exento=False)),
+    )
+    return {**viajes, **dias}
@@ -0,0 +1,117 @@
+"""
+Tests para el resumen de viajes por empresa (flujo MASTER).
+"""
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Viaje
+
+
+class MasterCompanyTripsSummaryTestCase(APITestCase):
+    def setUp(self):
+        self.master = CustomUser.objects.create_user(
+            username="master_resumen",
+            email="master_resumen@example.com",
+            password="pass",
+            role="MASTER",
+        )
+        self.client.force_authenticate(user=self.master)
+        self.total_empresas = 0
+
+    def _crear_empresa(self, empleados: int = 2) -> EmpresaProfile:
+        indice = self.total_empresas
+        self.total_empresas += 1
+        user = CustomUser.objects.create_user(
+            username=f"empresa_resumen_{indice}",
+            email=f"empresa_resumen_{indice}@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        empresa = EmpresaProfile.objects.create(
+            user=user,
+            nombre_empresa=f"Empresa Resumen {indice}",
+            nif=f"B720000{indice:02d}",
+            correo_contacto=f"resumen{indice}@example.com",
+        )
+        for numero in range(empleados):
+            empleado_user = CustomUser.objects.create_user(
+                username=f"empleado_resumen_{indice}_{numero}",
+                email=f"empleado_resumen_{indice}_{numero}@example.com",
+                password="pass",
+                role="EMPLEADO",
+            )
+            empleado = EmpleadoProfile.objects.create(
+                user=empleado_user,
+                empresa=empresa,
+                nombre=f"Nombre{numero}",
+                apellido=f"Apellido{indice}",
+                dni=f"72{indice:03d}{numero:03d}X",
+            )
+            # Dos viajes de 2 días (uno exento) y uno sin días generados
+            for offset, estado in enumerate(["REVISADO", "EN_REVISION"]):
+                inicio = date(2024, 1 + offset, 1)
+                viaje = Viaje.objects.create(
+                    empleado=empleado,
+                    empresa=empresa,
+                    destino="Zaragoza",
+                    fecha_inicio=inicio,
+                    fecha_fin=inicio.replace(day=2),
+                    estado=estado,
+                    dias_viajados=2,
+                )
+                DiaViaje.objects.create(viaje=viaje, fecha=inicio, exento=True)
+                DiaViaje.objects.create(viaje=viaje, fecha=inicio.replace(day=2), exento=False)
+            Viaje.objects.create(
+                empleado=empleado,
+                empresa=empresa,
+                destino="Huesca",
+                fecha_inicio=date(2024, 3, 1),
+                fecha_fin=date(2024, 3, 3),
+                estado="REABIERTO",
+                dias_viajados=3,
+            )
+        return empresa
+
+    def _resumen(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse("company-trips-summary") + "?include=empleados")
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(contexto.captured_queries)
+
+    def test_desglose_de_empleados_por_empresa(self):
+        empresa = self._crear_empresa(empleados=2)
+        sin_empleados = self._crear_empresa(empleados=0)
+
+        data, _ = self._resumen()
+
+        resumen = next(row for row in data if row["empresa_id"] == empresa.id)
+        self.assertEqual(
+            (resumen["trips"], resumen["days"], resumen["exemptDays"], resumen["nonExemptDays"]),
+            (6, 14, 4, 4),
+        )
+        self.assertEqual(len(resumen["empleados"]), 2)
+        empleado = resumen["empleados"][0]
+        self.assertEqual(empleado["email"], "empleado_resumen_0_0@example.com")
+        self.assertEqual(
+            (empleado["trips"], empleado["travelDays"], empleado["exemptDays"], empleado["nonExemptDays"]),
+            (3, 7, 2, 2),
+        )
+        vacia = next(row for row in data if row["empresa_id"] == sin_empleados.id)
+        self.assertEqual(vacia["empleados"], [])
+
+    def test_numero_de_consultas_constante(self):
+        self._crear_empresa()
+        _, consultas_una_empresa = self._resumen()
+
+        for _ in range(5):
+            self._crear_empresa()
+        data, consultas_seis_empresas = self._resumen()
+
+        self.assertEqual(len(data), 6)
+        # Empresas + métricas por empleado (viajes, días y datos de los empleados)
+        self.assertEqual(consultas_una_empresa, 4)
+        self.assertEqual(consultas_seis_empresas, consultas_una_empresa)
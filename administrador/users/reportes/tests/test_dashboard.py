@@ -0,0 +1,143 @@
+"""
+Tests para el endpoint combinado del dashboard.
+"""
+from datetime import date
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.common.services import ensure_company_is_up_to_date
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+from users.reportes.cache import get_report_cache, obtener_estadisticas_cache
+
+
+class DashboardTestCase(APITestCase):
+    def setUp(self):
+        get_report_cache().clear()
+        self.master = CustomUser.objects.create_user(
+            username="master_dashboard",
+            email="master_dashboard@example.com",
+            password="pass",
+            role="MASTER",
+        )
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_dashboard",
+            email="empresa_dashboard@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user,
+            nombre_empresa="Empresa Dashboard",
+            nif="B74000001",
+            correo_contacto="contacto@dashboard.com",
+        )
+        self.empleados = []
+        for indice in range(2):
+            user = CustomUser.objects.create_user(
+                username=f"empleado_dashboard_{indice}",
+                email=f"empleado_dashboard_{indice}@example.com",
+                password="pass",
+                role="EMPLEADO",
+            )
+            self.empleados.append(EmpleadoProfile.objects.create(
+                user=user,
+                empresa=self.empresa,
+                nombre=f"Empleado{indice}",
+                apellido="Dashboard",
+                dni=f"7400000{indice}D",
+            ))
+
+        ana, bea = self.empleados
+        viaje = self._crear_viaje(ana, date(2024, 4, 8), 3, exentos=2)
+        Gasto.objects.create(
+            empleado=ana, empresa=self.empresa, viaje=viaje,
+            concepto="Hotel", monto=90, estado="RECHAZADO",
+        )
+        self._crear_viaje(ana, date(2024, 6, 3), 1, exentos=0, es_internacional=True)
+        self._crear_viaje(bea, date(2024, 6, 10), 2, exentos=1, estado="EN_REVISION")
+        self._crear_viaje(bea, date(2023, 11, 2), 2, exentos=2)
+
+        self.empresa.force_release = True
+        self.empresa.save(update_fields=["force_release"])
+        ensure_company_is_up_to_date(self.empresa, current_time=timezone.now())
+
+    def _crear_viaje(self, empleado, inicio, dias, exentos, es_internacional=False, estado="REVISADO"):
+        viaje = Viaje.objects.create(
+            empleado=empleado,
+            empresa=self.empresa,
+            destino="Destino",
+            fecha_inicio=inicio,
+            fecha_fin=date.fromordinal(inicio.toordinal() + dias - 1),
+            estado=estado,
+            es_internacional=es_internacional,
+            dias_viajados=dias,
+        )
+        for offset in range(dias):
+            DiaViaje.objects.create(
+                viaje=viaje,
+                fecha=date.fromordinal(inicio.toordinal() + offset),
+                exento=offset < exentos,
+                revisado=True,
+            )
+        return viaje
+
+    def _comparar_con_reportes(self, user, consulta=""):
+        self.client.force_authenticate(user=user)
+        dashboard = self.client.get(reverse("report-dashboard") + consulta)
+        self.assertEqual(dashboard.status_code, 200)
+
+        esperado = {
+            "tripsPerMonth": self.client.get(reverse("trips-per-month") + consulta).data,
+            "tripsType": self.client.get(reverse("trips-type")).data,
+            "exemptDays": self.client.get(reverse("exempt-days")).data,
+            "generalInfo": self.client.get(reverse("general-info")).data,
+        }
+        if user.role != "MASTER":
+            esperado["employeeSummary"] = self.client.get(reverse("employee-trips-summary")).data
+        for widget, datos in esperado.items():
+            self.assertEqual(dashboard.data[widget], datos, widget)
+        return dashboard.data
+
+    def test_coincide_con_los_reportes_individuales(self):
+        data = self._comparar_con_reportes(self.empresa_user)
+        self.assertEqual(data["tripsType"]["total"], 3)
+        self.assertEqual(len(data["employeeSummary"]), 2)
+
+        self._comparar_con_reportes(self.empresa_user, "?year=2024")
+        self._comparar_con_reportes(self.empleados[1].user)
+
+        data = self._comparar_con_reportes(self.master)
+        self.assertIsNone(data["employeeSummary"])
+        self.assertEqual(data["tripsPerMonth"]["data"][1]["rejectedTrips"], 1)
+
+    def test_resumen_de_empleados_en_vivo_con_widgets_cacheados(self):
+        bea = self.empleados[1]
+        antes = self._comparar_con_reportes(self.empresa_user)
+        antes_personal = self._comparar_con_reportes(bea.user)
+
+        # Un viaje nuevo en revisión no llega a los widgets publicados, pero sí al resumen
+        self._crear_viaje(bea, date(2024, 9, 2), 2, exentos=0, estado="EN_REVISION")
+        despues = self._comparar_con_reportes(self.empresa_user)
+        despues_personal = self._comparar_con_reportes(bea.user)
+
+        self.assertEqual(despues["tripsType"], antes["tripsType"])
+        self.assertNotEqual(despues["employeeSummary"], antes["employeeSummary"])
+        self.assertNotEqual(despues_personal["employeeSummary"], antes_personal["employeeSummary"])
+        self.assertEqual(obtener_estadisticas_cache()["endpoints"]["dashboard"]["hits"], 2)
+
+    def test_numero_de_consultas(self):
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.empresa_user.pk))
+
+        # Perfil, empleados, resúmenes publicados, métricas por empleado (3) y viajes por mes
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse("report-dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_year_invalido(self):
+        self.client.force_authenticate(user=self.master)
+
+        response = self.client.get(reverse("report-dashboard") + "?year=abc")
+
+        self.assertEqual(response.status_code, 400)
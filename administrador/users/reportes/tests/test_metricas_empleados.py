@@ -0,0 +1,90 @@
+"""
+Tests para el motor de métricas por empleado.
+"""
+from datetime import date
+
+from django.test import TestCase
+
+from users.models import CustomUser, DiaViaje, EmpleadoProfile, EmpresaProfile, Viaje
+from users.reportes.services import calcular_metricas_empleados
+
+
+class MetricasEmpleadosTestCase(TestCase):
+    def setUp(self):
+        self.empresas = [self._crear_empresa(indice) for indice in range(2)]
+        self.ana = self._crear_empleado(self.empresas[0], "Ana", 0)
+        self.luis = self._crear_empleado(self.empresas[0], "Luis", 1)
+        self.sin_viajes = self._crear_empleado(self.empresas[0], "Eva", 2)
+        self.otra = self._crear_empleado(self.empresas[1], "Otra", 3)
+
+        # Viaje con más dias_viajados que días generados: no debe multiplicarse
+        viaje = self._crear_viaje(self.ana, dias_viajados=5)
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 1), exento=True)
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 2), exento=True)
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 3), exento=False)
+        # Viaje sin días generados
+        self._crear_viaje(self.ana, dias_viajados=2, estado="EN_REVISION")
+
+        viaje = self._crear_viaje(self.luis, dias_viajados=1)
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 1), exento=False)
+        self._crear_viaje(self.otra, dias_viajados=3)
+
+    def _crear_empresa(self, indice):
+        user = CustomUser.objects.create_user(
+            username=f"empresa_metricas_{indice}",
+            email=f"empresa_metricas_{indice}@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        return EmpresaProfile.objects.create(
+            user=user,
+            nombre_empresa=f"Empresa Métricas {indice}",
+            nif=f"B7300000{indice}",
+            correo_contacto=f"metricas{indice}@example.com",
+        )
+
+    def _crear_empleado(self, empresa, nombre, indice):
+        user = CustomUser.objects.create_user(
+            username=f"empleado_metricas_{indice}",
+            email=f"{nombre.lower()}@example.com",
+            password="pass",
+            role="EMPLEADO",
+        )
+        return EmpleadoProfile.objects.create(
+            user=user, empresa=empresa, nombre=nombre, apellido="Métricas", dni=f"7300000{indice}Q"
+        )
+
+    def _crear_viaje(self, empleado, dias_viajados, estado="REVISADO"):
+        return Viaje.objects.create(
+            empleado=empleado,
+            empresa=empleado.empresa,
+            destino="Toledo",
+            fecha_inicio=date(2024, 5, 1),
+            fecha_fin=date(2024, 5, dias_viajados),
+            estado=estado,
+            dias_viajados=dias_viajados,
+        )
+
+    def test_metricas_sin_doble_conteo(self):
+        with self.assertNumQueries(3):
+            metricas = calcular_metricas_empleados(EmpleadoProfile.objects.filter(empresa=self.empresas[0]))
+
+        self.assertEqual([m.empleado_id for m in metricas], [self.ana.id, self.luis.id])
+        ana, luis = metricas
+        self.assertEqual((ana.trips, ana.travel_days, ana.exempt_days, ana.non_exempt_days), (2, 7, 2, 1))
+        self.assertEqual((luis.trips, luis.travel_days, luis.exempt_days, luis.non_exempt_days), (1, 1, 0, 1))
+        self.assertEqual(ana.email, "ana@example.com")
+        self.assertEqual(ana.nombre_completo, "Ana Métricas")
+
+    def test_metricas_de_todas_las_empresas(self):
+        metricas = calcular_metricas_empleados(EmpleadoProfile.objects.all())
+
+        self.assertEqual(
+            {m.empleado_id: m.empresa_id for m in metricas},
+            {self.ana.id: self.empresas[0].id, self.luis.id: self.empresas[0].id, self.otra.id: self.empresas[1].id},
+        )
+
+    def test_sin_viajes_no_hay_metricas(self):
+        with self.assertNumQueries(1):
+            metricas = calcular_metricas_empleados(EmpleadoProfile.objects.filter(pk=self.sin_viajes.pk))
+        self.assertEqual(metricas, [])
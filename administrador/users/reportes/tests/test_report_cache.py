@@ -0,0 +1,152 @@
+"""
+Tests para la caché de respuestas de los reportes.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.common.services import ensure_company_is_up_to_date
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    ResumenMensualSnapshot,
+    Viaje,
+)
+from users.reportes.cache import clave_reporte, get_report_cache
+
+
+class ReportCacheTestCase(APITestCase):
+    def setUp(self):
+        get_report_cache().clear()
+
+        self.master = CustomUser.objects.create_user(
+            username="master_cache",
+            email="master_cache@example.com",
+            password="pass",
+            role="MASTER",
+        )
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_cache",
+            email="empresa_cache@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user,
+            nombre_empresa="Empresa Cache",
+            nif="B73000001",
+            correo_contacto="contacto@cache.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_cache",
+            email="empleado_cache@example.com",
+            password="pass",
+            role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user,
+            empresa=self.empresa,
+            nombre="Empleado",
+            apellido="Cache",
+            dni="73000001C",
+        )
+        viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Teruel",
+            fecha_inicio=date(2024, 5, 6),
+            fecha_fin=date(2024, 5, 7),
+            estado="REVISADO",
+            dias_viajados=2,
+        )
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 6), exento=True, revisado=True)
+        DiaViaje.objects.create(viaje=viaje, fecha=date(2024, 5, 7), exento=False, revisado=True)
+
+        self.now = timezone.now()
+        self.empresa.force_release = True
+        self.empresa.save(update_fields=["force_release"])
+        ensure_company_is_up_to_date(self.empresa, current_time=self.now)
+
+    def test_respuesta_cacheada_hasta_la_siguiente_release(self):
+        self.client.force_authenticate(user=self.empresa_user)
+        self.assertEqual(self.client.get(reverse("exempt-days")).data, {"exempt": 1, "nonExempt": 1})
+
+        # Un cambio en los resúmenes sin nueva release no se ve: acierto de caché
+        ResumenMensualSnapshot.objects.filter(empresa=self.empresa).update(dias_exentos=5)
+        self.assertEqual(self.client.get(reverse("exempt-days")).data, {"exempt": 1, "nonExempt": 1})
+
+        # La nueva release cambia la época de la clave
+        self.empresa.force_release = True
+        self.empresa.save(update_fields=["force_release"])
+        ensure_company_is_up_to_date(self.empresa, current_time=self.now + timedelta(minutes=1))
+        self.empresa_user.refresh_from_db()
+        ResumenMensualSnapshot.objects.filter(empresa=self.empresa).update(dias_exentos=5)
+
+        self.assertEqual(self.client.get(reverse("exempt-days")).data, {"exempt": 5, "nonExempt": 1})
+
+    def test_viajes_por_mes_cambian_con_la_siguiente_release(self):
+        self.client.force_authenticate(user=self.empleado.user)
+
+        def viajes_de_mayo():
+            data = self.client.get(reverse("trips-per-month"), {"year": "2024"}).data["data"]
+            return {mes["month"]: mes["totalTrips"] for mes in data}["2024-05"]
+
+        self.assertEqual(viajes_de_mayo(), 1)
+
+        Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Soria", fecha_inicio=date(2024, 5, 20),
+            fecha_fin=date(2024, 5, 20), estado="REVISADO", dias_viajados=1,
+        )
+        self.assertEqual(viajes_de_mayo(), 1)
+
+        self.empresa.force_release = True
+        self.empresa.save(update_fields=["force_release"])
+        ensure_company_is_up_to_date(self.empresa, current_time=self.now + timedelta(minutes=1))
+        self.empleado.user.refresh_from_db()
+
+        self.assertEqual(viajes_de_mayo(), 2)
+
+    def test_claves_por_alcance_y_parametros(self):
+        clave_empresa, timeout_empresa = clave_reporte(
+            "trips-per-month", self.empresa_user, QueryDict("year=2024&extra=1")
+        )
+        clave_ordenada, _ = clave_reporte("trips-per-month", self.empresa_user, QueryDict("extra=1&year=2024"))
+        clave_otro_anio, _ = clave_reporte("trips-per-month", self.empresa_user, QueryDict("year=2023"))
+        clave_empleado, _ = clave_reporte("trips-per-month", self.empleado.user, QueryDict("year=2024&extra=1"))
+        clave_master, timeout_master = clave_reporte("trips-per-month", self.master, QueryDict("year=2024&extra=1"))
+
+        self.assertEqual(clave_empresa, clave_ordenada)
+        self.assertEqual(len({clave_empresa, clave_otro_anio, clave_empleado, clave_master}), 4)
+        self.assertEqual(timeout_empresa, settings.REPORT_CACHE_TIMEOUT)
+        self.assertEqual(timeout_master, settings.REPORT_CACHE_MASTER_TIMEOUT)
+
+    def test_errores_no_se_cachean(self):
+        self.client.force_authenticate(user=self.master)
+
+        self.assertEqual(self.client.get(reverse("trips-per-month") + "?year=abc").status_code, 400)
+        self.assertEqual(self.client.get(reverse("trips-per-month") + "?year=abc").status_code, 400)
+
+        estadisticas = self.client.get(reverse("report-cache-stats")).data
+        self.assertEqual(estadisticas["endpoints"]["trips-per-month"], {"hits": 0, "misses": 2})
+
+    def test_estadisticas_de_aciertos_y_fallos(self):
+        self.client.force_authenticate(user=self.master)
+        for _ in range(3):
+            self.client.get(reverse("trips-type"))
+        self.client.get(reverse("general-info"))
+
+        response = self.client.get(reverse("report-cache-stats"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["hits"], response.data["misses"]), (2, 2))
+        self.assertEqual(response.data["hit_ratio"], 0.5)
+        self.assertEqual(response.data["endpoints"]["trips-type"], {"hits": 2, "misses": 1})
+
+        self.client.force_authenticate(user=self.empresa_user)
+        self.assertEqual(self.client.get(reverse("report-cache-stats")).status_code, 403)
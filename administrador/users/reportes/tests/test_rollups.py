@@ -0,0 +1,229 @@
+"""
+Tests para los resúmenes mensuales publicados que sirven los reportes.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.common.rollups import obtener_totales_publicados, refrescar_resumenes_empresa
+from users.common.services import sync_company_review_snapshots
+from users.common.snapshots import publicar_snapshots_empresa
+from users.gastos.services import eliminar_gasto
+from users.models import (
+    CustomUser,
+    DiaViaje,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    ResumenMensualSnapshot,
+    Viaje,
+)
+from users.reportes.cache import get_report_cache
+
+
+class ResumenMensualSnapshotTestCase(APITestCase):
+    def setUp(self):
+        get_report_cache().clear()
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_rollup",
+            email="empresa_rollup@example.com",
+            password="pass",
+            role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user,
+            nombre_empresa="Empresa Rollup",
+            nif="B71000001",
+            correo_contacto="contacto@rollup.com",
+        )
+        self.empleados = []
+        for indice in range(2):
+            user = CustomUser.objects.create_user(
+                username=f"empleado_rollup_{indice}",
+                email=f"empleado_rollup_{indice}@example.com",
+                password="pass",
+                role="EMPLEADO",
+            )
+            self.empleados.append(EmpleadoProfile.objects.create(
+                user=user,
+                empresa=self.empresa,
+                nombre=f"Empleado{indice}",
+                apellido="Rollup",
+                dni=f"7100000{indice}T",
+            ))
+
+        ana, bea = self.empleados
+        self.viaje_enero = self._crear_viaje(ana, date(2024, 1, 10), 3, exentos=2)
+        self._crear_viaje(ana, date(2024, 1, 20), 2, exentos=0, es_internacional=True)
+        self._crear_viaje(ana, date(2024, 2, 5), 1, exentos=1)
+        self._crear_viaje(bea, date(2024, 1, 15), 2, exentos=1, es_internacional=True)
+        self._crear_viaje(bea, date(2024, 3, 1), 4, exentos=4, estado="EN_REVISION")
+
+        sync_company_review_snapshots(self.empresa)
+
+    def _crear_viaje(self, empleado, inicio, dias, exentos, es_internacional=False, estado="REVISADO"):
+        viaje = Viaje.objects.create(
+            empleado=empleado,
+            empresa=self.empresa,
+            destino="Destino",
+            fecha_inicio=inicio,
+            fecha_fin=date.fromordinal(inicio.toordinal() + dias - 1),
+            estado=estado,
+            es_internacional=es_internacional,
+            dias_viajados=dias,
+        )
+        for offset in range(dias):
+            DiaViaje.objects.create(
+                viaje=viaje,
+                fecha=date.fromordinal(inicio.toordinal() + offset),
+                exento=offset < exentos,
+                revisado=True,
+            )
+        return viaje
+
+    def test_resumenes_por_empleado_y_mes(self):
+        ana, bea = self.empleados
+        filas = {
+            (fila.empleado_id, fila.mes): fila
+            for fila in ResumenMensualSnapshot.objects.filter(empresa=self.empresa)
+        }
+
+        self.assertEqual(set(filas), {
+            (ana.id, date(2024, 1, 1)), (ana.id, date(2024, 2, 1)), (bea.id, date(2024, 1, 1)),
+        })
+        enero_ana = filas[(ana.id, date(2024, 1, 1))]
+        self.assertEqual(
+            (enero_ana.viajes, enero_ana.viajes_nacionales, enero_ana.viajes_internacionales), (2, 1, 1)
+        )
+        self.assertEqual(
+            (enero_ana.dias, enero_ana.dias_exentos, enero_ana.dias_no_exentos), (5, 2, 3)
+        )
+
+        totales = obtener_totales_publicados(self.empresa, bea)
+        self.assertEqual(totales["viajes"], 1)
+        self.assertEqual(totales["dias_exentos"], 1)
+
+    def test_republicar_recalcula_resumenes(self):
+        Viaje.objects.filter(pk=self.viaje_enero.pk).update(estado="REABIERTO", updated_at=timezone.now())
+
+        sync_company_review_snapshots(self.empresa)
+
+        totales = obtener_totales_publicados(self.empresa)
+        self.assertEqual(totales["viajes"], 3)
+        self.assertEqual(totales["dias"], 5)
+        self.assertEqual(totales["dias_exentos"], 2)
+
+        # Sin snapshots no quedan resúmenes
+        self.empresa.viaje_snapshots.all().delete()
+        self.assertEqual(refrescar_resumenes_empresa(self.empresa, timezone.now()), 0)
+        self.assertFalse(ResumenMensualSnapshot.objects.filter(empresa=self.empresa).exists())
+
+    def test_publicacion_incremental_solo_recalcula_los_meses_afectados(self):
+        ana, bea = self.empleados
+        publicado = {
+            (fila.empleado_id, fila.mes): fila.published_at
+            for fila in ResumenMensualSnapshot.objects.filter(empresa=self.empresa)
+        }
+        desde = timezone.now()
+        # El viaje de enero de Ana pasa a marzo: cambian los dos meses
+        Viaje.objects.filter(pk=self.viaje_enero.pk).update(
+            fecha_inicio=date(2024, 3, 10), updated_at=desde + timedelta(seconds=1)
+        )
+
+        now = timezone.now() + timedelta(minutes=1)
+        resultado = publicar_snapshots_empresa(self.empresa, now, desde=desde)
+        escritos = refrescar_resumenes_empresa(self.empresa, now, resultado.resumenes_afectados)
+
+        self.assertEqual(resultado.resumenes_afectados, {
+            (self.empresa.id, ana.id, date(2024, 1, 1)), (self.empresa.id, ana.id, date(2024, 3, 1)),
+        })
+        self.assertEqual(escritos, 2)
+        filas = {
+            (fila.empleado_id, fila.mes): fila
+            for fila in ResumenMensualSnapshot.objects.filter(empresa=self.empresa)
+        }
+        self.assertEqual((filas[(ana.id, date(2024, 1, 1))].viajes, filas[(ana.id, date(2024, 3, 1))].viajes), (1, 1))
+        self.assertEqual(filas[(ana.id, date(2024, 3, 1))].dias_exentos, 2)
+        self.assertEqual(filas[(ana.id, date(2024, 1, 1))].published_at, now)
+        for clave in ((ana.id, date(2024, 2, 1)), (bea.id, date(2024, 1, 1))):
+            self.assertEqual(filas[clave].published_at, publicado[clave])
+
+        # Un viaje retirado recalcula su mes y borra el resumen que queda vacío
+        Viaje.objects.filter(pk=self.viaje_enero.pk).update(
+            estado="REABIERTO", updated_at=desde + timedelta(seconds=2)
+        )
+        resultado = publicar_snapshots_empresa(self.empresa, now, desde=desde)
+        refrescar_resumenes_empresa(self.empresa, now, resultado.resumenes_afectados)
+
+        self.assertFalse(ResumenMensualSnapshot.objects.filter(empleado=ana, mes=date(2024, 3, 1)).exists())
+        self.assertEqual(obtener_totales_publicados(self.empresa)["viajes"], 3)
+
+    def _publicar_incremental(self, desde):
+        now = timezone.now()
+        resultado = publicar_snapshots_empresa(self.empresa, now, desde=desde)
+        refrescar_resumenes_empresa(self.empresa, now, resultado.resumenes_afectados)
+
+    def test_borrar_gasto_rechazado_recalcula_su_mes(self):
+        gasto = Gasto.objects.create(
+            empleado=self.empleados[0], empresa=self.empresa, viaje=self.viaje_enero,
+            concepto="Taxi", monto=Decimal("10.00"), estado="RECHAZADO", fecha_gasto=date(2024, 1, 10),
+        )
+        sync_company_review_snapshots(self.empresa, incremental=False)
+        self.assertEqual(obtener_totales_publicados(self.empresa)["viajes_rechazados"], 1)
+        desde = timezone.now()
+
+        eliminar_gasto(gasto)
+        self._publicar_incremental(desde)
+
+        self.assertEqual(obtener_totales_publicados(self.empresa)["viajes_rechazados"], 0)
+
+    def test_borrar_viaje_revisado_recalcula_los_resumenes(self):
+        master = CustomUser.objects.create_user(
+            username="master_rollup", email="master_rollup@example.com", password="pass", role="MASTER",
+        )
+        desde = timezone.now()
+        self.client.force_authenticate(user=master)
+
+        response = self.client.delete(reverse("viaje_detail", args=[self.viaje_enero.pk]))
+        self._publicar_incremental(desde)
+
+        self.assertEqual(response.status_code, 204)
+        self.empresa.refresh_from_db()
+        self.assertTrue(self.empresa.has_pending_review_changes)
+        totales = obtener_totales_publicados(self.empresa)
+        self.assertEqual((totales["viajes"], totales["dias"], totales["dias_exentos"]), (3, 5, 2))
+
+    def test_reportes_de_empresa_leen_los_resumenes(self):
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.empresa_user.pk))
+
+        # Cambios sin publicar no afectan a los reportes
+        DiaViaje.objects.filter(viaje=self.viaje_enero).update(exento=False, updated_at=timezone.now())
+
+        # Perfil de la empresa + una consulta a los resúmenes
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("exempt-days"))
+        self.assertEqual(response.data, {"exempt": 4, "nonExempt": 4})
+
+        response = self.client.get(reverse("trips-type"))
+        self.assertEqual(response.data["national"], 2)
+        self.assertEqual(response.data["international"], 2)
+        self.assertEqual(response.data["total_days"], 8)
+
+        response = self.client.get(reverse("company-trips-summary") + "?include=empleados")
+        resumen = response.data[0]
+        self.assertEqual((resumen["trips"], resumen["days"]), (4, 8))
+        self.assertEqual(
+            [(e["empleado_id"], e["trips"], e["travelDays"]) for e in resumen["empleados"]],
+            [(self.empleados[0].id, 3, 6), (self.empleados[1].id, 1, 2)],
+        )
+
+    def test_reportes_de_empleado_solo_ven_sus_resumenes(self):
+        self.client.force_authenticate(user=self.empleados[1].user)
+
+        response = self.client.get(reverse("general-info"))
+
+        self.assertEqual(response.data["national_trips"], 0)
+        self.assertEqual(response.data["international_trips"], 1)
@@ -6,11 +6,14 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Viaje
+from users.common.services import sync_company_review_snapshots
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
+from users.reportes.cache import get_report_cache
 
 
 class TripsPerMonthReportTests(TestCase):
     def setUp(self):
+        get_report_cache().clear()
         self.client = APIClient()
 
         self.master = CustomUser.objects.create_user(
@@ -116,3 +119,58 @@ class TripsPerMonthReportTests(TestCase):
         self.assertEqual(march['totalTrips'], 1)
         self.assertEqual(march['pendingTrips'], 1)
         self.assertEqual(march['reviewedTrips'], 0)
+
+    def test_rejected_trips_count_each_trip_once(self):
+        viaje = Viaje.objects.get(destino='Barcelona')
+        for concepto in ('Hotel', 'Taxi'):
+            Gasto.objects.create(
+                empleado=self.empleado_profile, empresa=self.empresa_profile, viaje=viaje,
+                concepto=concepto, monto=10, estado='RECHAZADO',
+            )
+
+        self.authenticate(self.master_token)
+        response = self.client.get(reverse('trips-per-month'), {'year': '2025'})
+
+        january = response.data['data'][0]
+        self.assertEqual((january['totalTrips'], january['rejectedTrips']), (2, 1))
+
+    def test_year_range(self):
+        Viaje.objects.create(
+            empleado=self.empleado_profile,
+            empresa=self.empresa_profile,
+            destino='Bilbao',
+            fecha_inicio=date(2023, 12, 4),
+            fecha_fin=date(2023, 12, 5),
+            estado='REVISADO'
+        )
+        self.authenticate(self.master_token)
+        url = reverse('trips-per-month')
+
+        response = self.client.get(url, {'year_from': '2023', 'year_to': '2025'})
+        self.assertEqual(response.data['year'], '2023-2025')
+        self.assertEqual([item['month'] for item in response.data['data']],
+                         ['2023-12', '2025-01', '2025-02', '2025-03'])
+
+        response = self.client.get(url, {'year_from': '2021', 'year_to': '2022'})
+        self.assertEqual(response.data['message'], 'No se encontraron viajes para los años 2021-2022.')
+
+        for params in ({'year_from': '2024'}, {'year_from': '2025', 'year_to': '2023'}, {'year': 'x'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empresa_reads_published_monthly_rollups(self):
+        Gasto.objects.create(
+            empleado=self.empleado_profile, empresa=self.empresa_profile,
+            viaje=Viaje.objects.get(destino='Valencia'), concepto='Tren', monto=30, estado='RECHAZADO',
+        )
+        sync_company_review_snapshots(self.empresa_profile)
+        self.authenticate(str(RefreshToken.for_user(self.empresa_profile.user).access_token))
+
+        # Usuario (JWT), perfil de la empresa y resúmenes mensuales
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('trips-per-month'), {'year_from': '2025', 'year_to': '2025'})
+
+        # Solo se publican los viajes revisados
+        self.assertEqual(response.data['data'], [
+            {'month': '2025-01', 'totalTrips': 1, 'pendingTrips': 0, 'reviewedTrips': 1, 'rejectedTrips': 0},
+            {'month': '2025-02', 'totalTrips': 1, 'pendingTrips': 0, 'reviewedTrips': 1, 'rejectedTrips': 1},
+        ])
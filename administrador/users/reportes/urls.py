@@ -5,10 +5,12 @@ from django.urls import path
 
 from .views import (
     CompanyTripsSummaryView,
+    DashboardView,
     EmployeeTripsSummaryView,
     ExemptDaysView,
     GeneralInfoView,
     MasterCompanyEmployeesView,
+    ReportCacheStatsView,
     TripsPerMonthView,
     TripsTypeView,
 )
@@ -25,4 +27,10 @@ urlpatterns = [
     path('report/empleados/', EmployeeTripsSummaryView.as_view(), name='employee-trips-summary'),
     path('report/empresa/<int:empresa_id>/empleados/viajes/', MasterCompanyEmployeesView.as_view(),
          name='master-company-employees'),
+
+    # Dashboard (todos los widgets en una petición)
+    path('report/dashboard/', DashboardView.as_view(), name='report-dashboard'),
+
+    # Estado de la caché de reportes
+    path('report/cache-stats/', ReportCacheStatsView.as_view(), name='report-cache-stats'),
 ]
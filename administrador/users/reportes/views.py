@@ -1,8 +1,10 @@
 """
 Vistas para reportes y analytics de viajes
 """
-from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
-from django.db.models.functions import Coalesce, TruncMonth
+from collections import defaultdict
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -15,11 +17,10 @@ from users.common.exceptions import (
     EmpresaProfileNotFoundError,
     UnauthorizedAccessError,
 )
+from users.common.rollups import obtener_totales_publicados, obtener_totales_publicados_por_empleado
 from users.common.services import (
     get_user_empleado,
     get_user_empresa,
-    get_visible_dias_queryset,
-    get_visible_viajes_queryset,
 )
 from users.models import (
     DiaViaje,
@@ -27,6 +28,15 @@ from users.models import (
     EmpresaProfile,
     Viaje,
 )
+from users.reportes.cache import cachear_reporte, obtener_estadisticas_cache
+from users.reportes.services import (
+    MetricasEmpleado,
+    calcular_metricas_empleados,
+    calcular_resumen_personal,
+    calcular_totales_master,
+    calcular_viajes_por_mes,
+    calcular_viajes_por_mes_publicados,
+)
 from users.serializers import (
     CompanyTripsSummarySerializer,
     ExemptDaysSerializer,
@@ -42,10 +52,9 @@ class CompanyTripsSummaryView(APIView):
     Query Parameters:
     - ?include=empleados : Incluye desglose de empleados para cada empresa
 
-    TODO: Optimizar con Prefetch para reducir queries cuando include=empleados
-          Actualmente: 1 query para empresas + N queries para empleados (una por empresa)
-          Objetivo: Reducir a 2 queries totales usando Prefetch con anotaciones
-          Beneficio: Significativo cuando hay 50+ empresas con empleados
+    Para MASTER el desglose de empleados de todas las empresas sale de
+    ``calcular_metricas_empleados``, así que el número de consultas no
+    depende del número de empresas.
     """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -59,8 +68,7 @@ class CompanyTripsSummaryView(APIView):
             empresa = get_user_empresa(request.user)
             if not empresa:
                 raise EmpresaProfileNotFoundError()
-            visible_viajes = get_visible_viajes_queryset(request.user)
-            data = self._get_empresa_summary(empresa, visible_viajes, include_empleados)
+            data = self._get_empresa_summary(empresa, include_empleados)
         else:
             raise UnauthorizedAccessError("No autorizado para ver resúmenes de empresas")
 
@@ -135,6 +143,8 @@ class CompanyTripsSummaryView(APIView):
             ),
         )
 
+        empleados_por_empresa = self._get_master_empleados_stats() if include_empleados else {}
+
         data = []
         for empresa in empresas:
             payload = {
@@ -146,254 +156,180 @@ class CompanyTripsSummaryView(APIView):
                 'nonExemptDays': empresa.nonExemptDays,
             }
             if include_empleados:
-                payload['empleados'] = self._get_master_empleados_stats(empresa)
+                payload['empleados'] = empleados_por_empresa.get(empresa.id, [])
             data.append(payload)
         return data
 
-    def _get_master_empleados_stats(self, empresa):
+    def _get_master_empleados_stats(self) -> dict[int, list[dict]]:
         """
-        Obtiene estadísticas de empleados para una empresa específica
+        Obtiene las estadísticas de los empleados de todas las empresas
         utilizando los modelos en vivo (flujo MASTER).
-        """
-        # Subqueries para cada empleado (ambos estados (EN_REVISION y REVISADO))
-        viajes_qs = Viaje.objects.filter(
-            empleado=OuterRef('pk')
-        )
 
-        dias_qs = DiaViaje.objects.filter(
-            viaje__empleado=OuterRef('pk')
-        )
-
-        non_exentos_qs = dias_qs.filter(exento=False)
-        exentos_qs = dias_qs.filter(exento=True)
-
-        empleados = EmpleadoProfile.objects.filter(empresa=empresa).annotate(
-            trips=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            days=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                .annotate(total=Sum('dias_viajados'))
-                .values('total'),
-                output_field=IntegerField()
-            ), Value(0)),
-            nonExemptDays=Coalesce(Subquery(
-                non_exentos_qs.values('viaje__empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            exemptDays=Coalesce(Subquery(
-                exentos_qs.values('viaje__empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-        ).filter(
-            Q(trips__gt=0) |
-            Q(days__gt=0) |
-            Q(nonExemptDays__gt=0) |
-            Q(exemptDays__gt=0)
-        )
+        Returns:
+            Diccionario ``empresa_id -> lista de métricas de sus empleados``
+        """
+        empleados_por_empresa = defaultdict(list)
+        for metricas in calcular_metricas_empleados(EmpleadoProfile.objects.all()):
+            empleados_por_empresa[metricas.empresa_id].append({
+                'empleado_id': metricas.empleado_id,
+                'nombre': metricas.nombre,
+                'apellido': metricas.apellido,
+                'email': metricas.email,
+                'trips': metricas.trips,
+                'travelDays': metricas.travel_days,
+                'exemptDays': metricas.exempt_days,
+                'nonExemptDays': metricas.non_exempt_days,
+            })
+        return empleados_por_empresa
 
-        return [{
-            'empleado_id': emp.id,
-            'nombre': emp.nombre,
-            'apellido': emp.apellido,
-            'email': emp.user.email,
-            'trips': emp.trips,
-            'travelDays': emp.days,
-            'exemptDays': emp.exemptDays,
-            'nonExemptDays': emp.nonExemptDays,
-        } for emp in empleados]
-
-    def _get_empresa_summary(self, empresa, visible_viajes, include_empleados: bool):
+    def _get_empresa_summary(self, empresa, include_empleados: bool):
         """
-        Construye el resumen usando snapshots publicados para EMPRESA.
+        Construye el resumen desde los resúmenes publicados para EMPRESA.
         """
-        snapshots = visible_viajes.queryset.filter(empresa=empresa)
-
-        trips = snapshots.count()
-        days = snapshots.aggregate(
-            total=Coalesce(Sum('dias_viajados'), Value(0))
-        )['total'] or 0
-
-        dias_qs = get_visible_dias_queryset(visible_viajes).filter(
-            viaje_snapshot__empresa=empresa
-        )
-        exempt_days = dias_qs.filter(exento=True).count()
-        non_exempt_days = dias_qs.filter(exento=False).count()
+        totales = obtener_totales_publicados(empresa)
 
         empresa_data = {
             'empresa_id': empresa.id,
             'empresa': empresa.nombre_empresa,
-            'trips': trips,
-            'days': days,
-            'exemptDays': exempt_days,
-            'nonExemptDays': non_exempt_days,
+            'trips': totales['viajes'],
+            'days': totales['dias'],
+            'exemptDays': totales['dias_exentos'],
+            'nonExemptDays': totales['dias_no_exentos'],
         }
 
         if include_empleados:
-            empresa_data['empleados'] = self._get_empresa_empleados_stats(
-                empresa,
-                snapshots,
-                dias_qs
-            )
+            empresa_data['empleados'] = [{
+                'empleado_id': fila['empleado_id'],
+                'nombre': fila['empleado__nombre'],
+                'apellido': fila['empleado__apellido'],
+                'email': fila['empleado__user__email'],
+                'trips': fila['viajes'],
+                'travelDays': fila['dias'],
+                'exemptDays': fila['dias_exentos'],
+                'nonExemptDays': fila['dias_no_exentos'],
+            } for fila in obtener_totales_publicados_por_empleado(empresa)]
 
         return [empresa_data]
 
-    def _get_empresa_empleados_stats(self, empresa, snapshots, dias_qs):
-        """
-        Calcula métricas de empleados a partir de snapshots publicados.
-        """
-        empleado_ids = list(
-            snapshots.values_list('empleado_id', flat=True).distinct()
-        )
-        if not empleado_ids:
-            return []
-
-        empleados = EmpleadoProfile.objects.filter(
-            id__in=empleado_ids,
-            empresa=empresa
-        ).select_related('user')
-
-        trips_agg = {
-            row['empleado_id']: row['trips']
-            for row in snapshots.values('empleado_id').annotate(
-                trips=Count('id')
-            )
-        }
-        days_agg = {
-            row['empleado_id']: row['days']
-            for row in snapshots.values('empleado_id').annotate(
-                days=Coalesce(Sum('dias_viajados'), Value(0))
-            )
-        }
-
-        exempt_agg = {
-            row['viaje_snapshot__empleado_id']: row['total']
-            for row in dias_qs.filter(exento=True).values(
-                'viaje_snapshot__empleado_id'
-            ).annotate(total=Count('id'))
-        }
-        non_exempt_agg = {
-            row['viaje_snapshot__empleado_id']: row['total']
-            for row in dias_qs.filter(exento=False).values(
-                'viaje_snapshot__empleado_id'
-            ).annotate(total=Count('id'))
-        }
-
-        data = []
-        for empleado in empleados:
-            trips = trips_agg.get(empleado.id, 0)
-            days = days_agg.get(empleado.id, 0)
-            exempt = exempt_agg.get(empleado.id, 0)
-            non_exempt = non_exempt_agg.get(empleado.id, 0)
-
-            # Evitar incluir empleados sin métricas relevantes
-            if not any([trips, days, exempt, non_exempt]):
-                continue
-
-            data.append({
-                'empleado_id': empleado.id,
-                'nombre': empleado.nombre,
-                'apellido': empleado.apellido,
-                'email': empleado.user.email,
-                'trips': trips,
-                'travelDays': days,
-                'exemptDays': exempt,
-                'nonExemptDays': non_exempt,
-            })
-
-        return data
-
 
 class TripsPerMonthView(APIView):
     """
     Número de viajes iniciados por mes (ambos estados (EN_REVISION y REVISADO)), filtrado según el rol
 
+    EMPRESA y EMPLEADO leen los resúmenes mensuales publicados (doce filas
+    por año como mucho); MASTER agrupa los viajes en vivo.
+
     Query Parameters:
     - ?year=2024 : Filtra viajes por año específico (ej: 2024, 2025)
+    - ?year_from=2023&year_to=2025 : Rango de años (comparativas interanuales)
     """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @cachear_reporte("trips-per-month")
     def get(self, request):
         user = request.user
-        if user.role == "EMPRESA":
+        try:
+            anios = _rango_anios(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if user.role == "MASTER":
+            data = calcular_viajes_por_mes(Viaje.objects.all(), anios)
+        elif user.role == "EMPRESA":
             empresa = get_user_empresa(user)
             if not empresa:
                 raise EmpresaProfileNotFoundError()
+            data = calcular_viajes_por_mes_publicados(empresa, anios=anios)
         elif user.role == "EMPLEADO":
             empleado = get_user_empleado(user)
             if not empleado:
                 raise EmpleadoProfileNotFoundError()
-        elif user.role != "MASTER":
+            data = calcular_viajes_por_mes_publicados(empleado.empresa, empleado, anios)
+        else:
             raise UnauthorizedAccessError("Rol de usuario no reconocido")
 
+        return Response(_datos_viajes_por_mes(data, request.query_params, anios), status=status.HTTP_200_OK)
+
+
+def _rango_anios(query_params) -> tuple[int, int] | None:
+    """
+    Rango de años pedido con ``?year=`` o con ``?year_from=`` y ``?year_to=``.
+
+    Returns:
+        ``(desde, hasta)`` o None si no se filtra por año
+
+    Raises:
+        ValueError: Con el mensaje de error para la respuesta 400
+    """
+    year_param = query_params.get('year')
+    if year_param:
         try:
-            visible_viajes = get_visible_viajes_queryset(user)
-        except ValueError as exc:
-            raise UnauthorizedAccessError(str(exc)) from exc
-
-        viajes = visible_viajes.queryset
-        gastos_relation = 'gastos_snapshot' if visible_viajes.uses_snapshot else 'gasto'
-        rejected_filter = Q(**{f"{gastos_relation}__estado": "RECHAZADO"})
-
-        # Filtrado por año (opcional)
-        year_param = request.query_params.get('year')
-        if year_param:
-            try:
-                year = int(year_param)
-                viajes = viajes.filter(fecha_inicio__year=year)
-            except ValueError:
-                return Response(
-                    {"error": f"El parámetro 'year' debe ser un número válido. Recibido: {year_param}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        # Agrupación por mes y conteo de viajes
-        viajes_agrupados = (
-            viajes.annotate(month=TruncMonth('fecha_inicio'))
-            .values('month')
-            .annotate(
-                totalTrips=Count('pk', distinct=True),
-                pendingTrips=Count('pk', filter=Q(estado__in=['EN_REVISION', 'REABIERTO']), distinct=True),
-                reviewedTrips=Count('pk', filter=Q(estado='REVISADO'), distinct=True),
-                rejectedTrips=Count('pk', filter=rejected_filter, distinct=True)
-            )
-            .order_by('month')
-        )
+            year = int(year_param)
+        except ValueError:
+            raise ValueError(
+                f"El parámetro 'year' debe ser un número válido. Recibido: {year_param}"
+            ) from None
+        return year, year
+
+    year_from = query_params.get('year_from')
+    year_to = query_params.get('year_to')
+    if not year_from and not year_to:
+        return None
+    try:
+        desde, hasta = int(year_from), int(year_to)
+    except (TypeError, ValueError):
+        raise ValueError(
+            "Los parámetros 'year_from' y 'year_to' deben indicarse juntos y ser números válidos."
+        ) from None
+    if desde > hasta:
+        raise ValueError("'year_from' no puede ser mayor que 'year_to'.")
+    return desde, hasta
+
+
+def _datos_viajes_por_mes(data: list[dict], query_params, anios: tuple[int, int] | None) -> dict:
+    """Formato de la respuesta de viajes por mes."""
+    year_param = query_params.get('year')
+    if year_param:
+        etiqueta, year_msg = year_param, f" para el año {year_param}"
+    elif anios is not None:
+        etiqueta = f"{anios[0]}-{anios[1]}"
+        year_msg = f" para los años {etiqueta}"
+    else:
+        etiqueta, year_msg = "todos", ""
+
+    if not data:
+        return {
+            "message": f"No se encontraron viajes{year_msg}.",
+            "data": []
+        }
+    return {
+        "year": etiqueta,
+        "data": data
+    }
 
-        # Verificar si hay resultados
-        if not viajes_agrupados:
-            year_msg = f" para el año {year_param}" if year_param else ""
-            return Response(
-                {
-                    "message": f"No se encontraron viajes{year_msg}.",
-                    "data": []
-                },
-                status=status.HTTP_200_OK
-            )
 
-        # Serialización de los datos
-        data = []
-        for v in viajes_agrupados:
-            data.append({
-                'month': v['month'].strftime('%Y-%m'),
-                'totalTrips': v['totalTrips'],
-                'pendingTrips': v['pendingTrips'],
-                'reviewedTrips': v['reviewedTrips'],
-                'rejectedTrips': v['rejectedTrips'],
-            })
+def _obtener_totales_publicados_usuario(user) -> dict[str, int]:
+    """
+    Totales publicados visibles para un usuario EMPRESA o EMPLEADO.
 
-        return Response({
-            "year": year_param if year_param else "todos",
-            "data": data
-        }, status=status.HTTP_200_OK)
+    Raises:
+        EmpresaProfileNotFoundError / EmpleadoProfileNotFoundError si falta el perfil
+        UnauthorizedAccessError para otros roles
+    """
+    if user.role == "EMPRESA":
+        empresa = get_user_empresa(user)
+        if not empresa:
+            raise EmpresaProfileNotFoundError()
+        return obtener_totales_publicados(empresa)
+
+    if user.role == "EMPLEADO":
+        empleado = get_user_empleado(user)
+        if not empleado:
+            raise EmpleadoProfileNotFoundError()
+        return obtener_totales_publicados(empleado.empresa, empleado)
+
+    raise UnauthorizedAccessError("Rol de usuario no reconocido")
 
 
 class TripsTypeView(APIView):
@@ -401,42 +337,29 @@ class TripsTypeView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @cachear_reporte("trips-type")
     def get(self, request):
         user = request.user
 
-        if user.role == "EMPRESA":
-            empresa = get_user_empresa(user)
-            if not empresa:
-                raise EmpresaProfileNotFoundError()
-        elif user.role == "EMPLEADO":
-            empleado = get_user_empleado(user)
-            if not empleado:
-                raise EmpleadoProfileNotFoundError()
-        elif user.role != "MASTER":
-            raise UnauthorizedAccessError("Rol de usuario no reconocido")
-
-        try:
-            visible_viajes = get_visible_viajes_queryset(user)
-        except ValueError as exc:
-            raise UnauthorizedAccessError(str(exc)) from exc
-
-        viajes = visible_viajes.queryset.filter(estado='REVISADO')
-
-        national = viajes.filter(es_internacional=False).count()
-        international = viajes.filter(es_internacional=True).count()
-        total_days = viajes.aggregate(total=Coalesce(Sum('dias_viajados'), Value(0)))['total'] or 0
+        if user.role == "MASTER":
+            totales = calcular_totales_master(dias=False)
+        else:
+            # EMPRESA y EMPLEADO: resúmenes calculados al publicar
+            totales = _obtener_totales_publicados_usuario(user)
 
-        total = national + international
+        serializer = TripsTypeSerializer(_datos_tipo_viajes(totales))
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        data = {
-            'national': national,
-            'international': international,
-            'total': total,
-            'total_days': total_days
-        }
 
-        serializer = TripsTypeSerializer(data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+def _datos_tipo_viajes(totales: dict[str, int]) -> dict[str, int]:
+    national = totales['viajes_nacionales']
+    international = totales['viajes_internacionales']
+    return {
+        'national': national,
+        'international': international,
+        'total': national + international,
+        'total_days': totales['dias'],
+    }
 
 
 class ExemptDaysView(APIView):
@@ -444,49 +367,34 @@ class ExemptDaysView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @cachear_reporte("exempt-days")
     def get(self, request):
         user = request.user
-        if user.role == "EMPRESA":
-            empresa = get_user_empresa(user)
-            if not empresa:
-                raise EmpresaProfileNotFoundError()
-        elif user.role == "EMPLEADO":
-            empleado = get_user_empleado(user)
-            if not empleado:
-                raise EmpleadoProfileNotFoundError()
-        elif user.role != "MASTER":
-            raise UnauthorizedAccessError("Rol de usuario no reconocido")
-
-        try:
-            visible_viajes = get_visible_viajes_queryset(user)
-        except ValueError as exc:
-            raise UnauthorizedAccessError(str(exc)) from exc
 
-        dias_qs = get_visible_dias_queryset(visible_viajes)
-
-        if visible_viajes.uses_snapshot:
-            exempt_count = dias_qs.filter(exento=True).count()
-            non_exempt_count = dias_qs.filter(exento=False).count()
+        if user.role == "MASTER":
+            totales = calcular_totales_master(viajes=False)
         else:
-            dias_qs = dias_qs.filter(viaje__estado='REVISADO')
-            exempt_count = dias_qs.filter(exento=True).count()
-            non_exempt_count = dias_qs.filter(exento=False).count()
-
-        data = {
-            'exempt': exempt_count,
-            'nonExempt': non_exempt_count,
-        }
+            # EMPRESA y EMPLEADO: resúmenes calculados al publicar
+            totales = _obtener_totales_publicados_usuario(user)
 
-        serializer = ExemptDaysSerializer(data)
+        serializer = ExemptDaysSerializer(_datos_dias_exentos(totales))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def _datos_dias_exentos(totales: dict[str, int]) -> dict[str, int]:
+    return {
+        'exempt': totales['dias_exentos'],
+        'nonExempt': totales['dias_no_exentos'],
+    }
+
+
 class GeneralInfoView(APIView):
     """Devuelve totales de empresas, empleados y viajes nacionales/internacionales,
        filtrados según el rol del usuario"""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @cachear_reporte("general-info")
     def get(self, request):
         user = request.user
 
@@ -494,7 +402,7 @@ class GeneralInfoView(APIView):
         if user.role == "MASTER":
             companies = EmpresaProfile.objects.count()
             employees = EmpleadoProfile.objects.count()
-            viajes_qs = Viaje.objects.filter(estado='REVISADO')
+            totales = calcular_totales_master(dias=False)
 
         # EMPRESA: sólo su empresa
         elif user.role == "EMPRESA":
@@ -503,11 +411,7 @@ class GeneralInfoView(APIView):
                 raise EmpresaProfileNotFoundError()
             companies = 1
             employees = EmpleadoProfile.objects.filter(empresa=empresa).count()
-            try:
-                visible_viajes = get_visible_viajes_queryset(user)
-            except ValueError as exc:
-                raise UnauthorizedAccessError(str(exc)) from exc
-            viajes_qs = visible_viajes.queryset.filter(estado='REVISADO')
+            totales = obtener_totales_publicados(empresa)
 
         # EMPLEADO: sólo él
         elif user.role == "EMPLEADO":
@@ -516,28 +420,47 @@ class GeneralInfoView(APIView):
                 raise EmpleadoProfileNotFoundError()
             companies = 1
             employees = 1
-            try:
-                visible_viajes = get_visible_viajes_queryset(user)
-            except ValueError as exc:
-                raise UnauthorizedAccessError(str(exc)) from exc
-            viajes_qs = visible_viajes.queryset.filter(estado='REVISADO')
+            totales = obtener_totales_publicados(empleado.empresa, empleado)
 
         else:
             raise UnauthorizedAccessError("No autorizado")
 
-        # Ahora contamos nacionales e internacionales
-        national = viajes_qs.filter(es_internacional=False).count()
-        international = viajes_qs.filter(es_internacional=True).count()
+        serializer = GeneralInfoSerializer(_datos_info_general(companies, employees, totales))
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        data = {
-            'companies': companies,
-            'employees': employees,
-            'international_trips': international,
-            'national_trips': national,
-        }
 
-        serializer = GeneralInfoSerializer(data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+def _datos_info_general(companies: int, employees: int, totales: dict[str, int]) -> dict[str, int]:
+    return {
+        'companies': companies,
+        'employees': employees,
+        'international_trips': totales['viajes_internacionales'],
+        'national_trips': totales['viajes_nacionales'],
+    }
+
+
+def _serializar_metricas_empleados(metricas: list[MetricasEmpleado]) -> list[dict]:
+    """Formato de los listados de empleados de EMPRESA y MASTER."""
+    return [{
+        'name': m.nombre_completo,
+        'trips': m.trips,
+        'travelDays': m.travel_days,
+        'exemptDays': m.exempt_days,
+        'nonExemptDays': m.non_exempt_days,
+    } for m in metricas]
+
+
+def _datos_resumen_personal(empleado: EmpleadoProfile) -> dict:
+    """Resumen personal de EMPLEADO (viajes revisados, en revisión y días exentos/no exentos)."""
+    nombre_completo = " ".join(filter(None, [empleado.nombre, empleado.apellido])).strip()
+    return {
+        "role": "EMPLEADO",
+        "employee": {
+            "id": empleado.id,
+            "name": nombre_completo or empleado.user.username,
+            "company": empleado.empresa.nombre_empresa if empleado.empresa else None,
+        },
+        "summary": calcular_resumen_personal(empleado),
+    }
 
 
 class EmployeeTripsSummaryView(APIView):
@@ -557,33 +480,7 @@ class EmployeeTripsSummaryView(APIView):
             if not empleado:
                 raise EmpleadoProfileNotFoundError()
 
-            reviewed_qs = Viaje.objects.filter(empleado=empleado, estado='REVISADO')
-            pending_qs = Viaje.objects.filter(
-                empleado=empleado,
-                estado__in=['EN_REVISION', 'REABIERTO']
-            )
-
-            dias_qs = DiaViaje.objects.filter(
-                viaje__empleado=empleado,
-                viaje__estado='REVISADO'
-            )
-
-            nombre_completo = " ".join(filter(None, [empleado.nombre, empleado.apellido])).strip()
-            data = {
-                "role": "EMPLEADO",
-                "employee": {
-                    "id": empleado.id,
-                    "name": nombre_completo or empleado.user.username,
-                    "company": empleado.empresa.nombre_empresa if empleado.empresa else None,
-                },
-                "summary": {
-                    "reviewedTrips": reviewed_qs.count(),
-                    "pendingTrips": pending_qs.count(),
-                    "exemptDays": dias_qs.filter(exento=True).count(),
-                    "nonExemptDays": dias_qs.filter(exento=False).count(),
-                }
-            }
-
+            data = _datos_resumen_personal(empleado)
             return Response(data, status=status.HTTP_200_OK)
 
         if user.role != "EMPRESA":
@@ -593,58 +490,10 @@ class EmployeeTripsSummaryView(APIView):
         if not empresa:
             raise EmpresaProfileNotFoundError()
 
-        # Subqueries para cada empleado (ambos estados (EN_REVISION y REVISADO))
-        viajes_qs = Viaje.objects.filter(
-            empleado=OuterRef('pk')
-        )
-
-        dias_qs = DiaViaje.objects.filter(
-            viaje__empleado=OuterRef('pk')
-        )
-
-        non_exentos_qs = dias_qs.filter(exento=False)
-        exentos_qs = dias_qs.filter(exento=True)
-
-        empleados = EmpleadoProfile.objects.filter(empresa=empresa).annotate(
-            trips=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            days=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                .annotate(total=Sum('dias_viajados'))
-                .values('total'),
-                output_field=IntegerField()
-            ), Value(0)),
-            nonExemptDays=Coalesce(Subquery(
-                non_exentos_qs.values('viaje__empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            exemptDays=Coalesce(Subquery(
-                exentos_qs.values('viaje__empleado')
-                .annotate(count=Count('pk'))
-                .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-        ).filter(
-            Q(trips__gt=0) |
-            Q(days__gt=0) |
-            Q(nonExemptDays__gt=0) |
-            Q(exemptDays__gt=0)
+        # Métricas de todos los viajes (ambos estados (EN_REVISION y REVISADO))
+        data = _serializar_metricas_empleados(
+            calcular_metricas_empleados(EmpleadoProfile.objects.filter(empresa=empresa))
         )
-
-        data = [{
-            'name': f"{e.nombre} {e.apellido}",
-            'trips': e.trips,
-            'travelDays': e.days,
-            'exemptDays': e.exemptDays,
-            'nonExemptDays': e.nonExemptDays,
-        } for e in empleados]
-
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -661,55 +510,101 @@ class MasterCompanyEmployeesView(APIView):
 
         empresa = get_object_or_404(EmpresaProfile, pk=empresa_id)
 
-        viajes_qs = Viaje.objects.filter(
-            empleado=OuterRef('pk')
+        data = _serializar_metricas_empleados(
+            calcular_metricas_empleados(EmpleadoProfile.objects.filter(empresa=empresa))
         )
+        return Response(data, status=status.HTTP_200_OK)
 
-        dias_qs = DiaViaje.objects.filter(
-            viaje__empleado=OuterRef('pk')
-        )
 
-        non_exentos_qs = dias_qs.filter(exento=False)
-        exentos_qs = dias_qs.filter(exento=True)
-
-        empleados = EmpleadoProfile.objects.filter(empresa=empresa).annotate(
-            trips=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                    .annotate(count=Count('pk'))
-                    .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            days=Coalesce(Subquery(
-                viajes_qs.values('empleado')
-                    .annotate(total=Sum('dias_viajados'))
-                    .values('total'),
-                output_field=IntegerField()
-            ), Value(0)),
-            nonExemptDays=Coalesce(Subquery(
-                non_exentos_qs.values('viaje__empleado')
-                    .annotate(count=Count('pk'))
-                    .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-            exemptDays=Coalesce(Subquery(
-                exentos_qs.values('viaje__empleado')
-                    .annotate(count=Count('pk'))
-                    .values('count'),
-                output_field=IntegerField()
-            ), Value(0)),
-        ).filter(
-            Q(trips__gt=0) |
-            Q(days__gt=0) |
-            Q(nonExemptDays__gt=0) |
-            Q(exemptDays__gt=0)
-        )
+class DashboardView(APIView):
+    """
+    Todos los widgets del dashboard en una sola petición: viajes por mes,
+    tipo de viajes, días exentos, información general y resumen de empleados.
+
+    El perfil se resuelve una vez y los widgets de totales comparten el mismo
+    agregado (los resúmenes publicados para EMPRESA/EMPLEADO, o dos consultas
+    agregadas en vivo para MASTER). Solo esos widgets se cachean: el resumen
+    de empleados lee datos en vivo, como ``/report/empleados/``, y se calcula
+    en cada petición. Es ``null`` para MASTER, que no tiene ese reporte.
+
+    Query Parameters:
+    - ?year=2024 o ?year_from=2023&year_to=2025 : Como en trips-per-month
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        data = [{
-            'name': f"{e.nombre} {e.apellido}",
-            'trips': e.trips,
-            'travelDays': e.days,
-            'exemptDays': e.exemptDays,
-            'nonExemptDays': e.nonExemptDays,
-        } for e in empleados]
+    def get(self, request):
+        response = self._widgets(request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
 
+        data = {**response.data, "employeeSummary": self._resumen_empleados(request.user)}
         return Response(data, status=status.HTTP_200_OK)
+
+    @cachear_reporte("dashboard")
+    def _widgets(self, request):
+        user = request.user
+
+        try:
+            anios = _rango_anios(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if user.role == "MASTER":
+            companies = EmpresaProfile.objects.count()
+            employees = EmpleadoProfile.objects.count()
+            totales = calcular_totales_master()
+            por_mes = calcular_viajes_por_mes(Viaje.objects.all(), anios)
+
+        elif user.role == "EMPRESA":
+            empresa = get_user_empresa(user)
+            if not empresa:
+                raise EmpresaProfileNotFoundError()
+            companies = 1
+            employees = EmpleadoProfile.objects.filter(empresa=empresa).count()
+            totales = obtener_totales_publicados(empresa)
+            por_mes = calcular_viajes_por_mes_publicados(empresa, anios=anios)
+
+        elif user.role == "EMPLEADO":
+            empleado = get_user_empleado(user)
+            if not empleado:
+                raise EmpleadoProfileNotFoundError()
+            companies = 1
+            employees = 1
+            totales = obtener_totales_publicados(empleado.empresa, empleado)
+            por_mes = calcular_viajes_por_mes_publicados(empleado.empresa, empleado, anios)
+
+        else:
+            raise UnauthorizedAccessError("Rol de usuario no reconocido")
+
+        data = {
+            "tripsPerMonth": _datos_viajes_por_mes(por_mes, request.query_params, anios),
+            "tripsType": TripsTypeSerializer(_datos_tipo_viajes(totales)).data,
+            "exemptDays": ExemptDaysSerializer(_datos_dias_exentos(totales)).data,
+            "generalInfo": GeneralInfoSerializer(_datos_info_general(companies, employees, totales)).data,
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _resumen_empleados(user):
+        """Resumen de empleados en vivo; el perfil ya lo ha validado ``_widgets``."""
+        if user.role == "EMPRESA":
+            empresa = get_user_empresa(user)
+            return _serializar_metricas_empleados(
+                calcular_metricas_empleados(EmpleadoProfile.objects.filter(empresa=empresa))
+            )
+        if user.role == "EMPLEADO":
+            return _datos_resumen_personal(get_user_empleado(user))
+        return None
+
+
+class ReportCacheStatsView(APIView):
+    """Aciertos y fallos de la caché de reportes (solo MASTER)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != "MASTER":
+            raise UnauthorizedAccessError("Solo MASTER puede acceder a este reporte")
+
+        return Response(obtener_estadisticas_cache(), status=status.HTTP_200_OK)
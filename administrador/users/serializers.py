@@ -1,9 +1,15 @@
+import json
 import re
-from typing import Any
+from collections import defaultdict
+from typing import Any, NamedTuple
 
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models.manager import BaseManager
 from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
 from users.common.files import compress_if_image
 
@@ -23,6 +29,73 @@ from .models import (
 )
 
 
+class CargaCampo(NamedTuple):
+    """Lo que necesita cargar un campo de salida: columnas para ``only()`` y relaciones."""
+    columnas: tuple[str, ...] = ()
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple = ()
+
+
+def _carga_columna(model, nombre: str) -> CargaCampo:
+    try:
+        campo = model._meta.get_field(nombre)
+    except FieldDoesNotExist:
+        return CargaCampo()
+    return CargaCampo(columnas=(nombre,)) if campo.concrete else CargaCampo()
+
+
+class SparseFieldsMixin:
+    """
+    Permite serializar solo algunos campos con ``fields=[...]``.
+
+    ``CARGA_POR_CAMPO`` describe qué columnas y relaciones necesita cada campo
+    de salida (por defecto, la columna del mismo nombre si el modelo la tiene)
+    y ``CARGA_BASE`` lo que se carga siempre. ``preparar_queryset`` rehace con ellos el plan de
+    ``select_related`` / ``prefetch_related`` / ``only()`` del queryset.
+
+    Example:
+        campos = campos_solicitados(request, ViajeSerializer.campos_disponibles())
+        if campos is not None:
+            viajes = ViajeSerializer.preparar_queryset(viajes, campos)
+        ViajeSerializer(viajes, many=True, fields=campos).data
+    """
+
+    CARGA_BASE = CargaCampo()
+    CARGA_POR_CAMPO: dict[str, CargaCampo] = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.campos_solicitados = fields
+        if fields is not None:
+            for nombre in list(self.fields):
+                if nombre not in fields and not self.fields[nombre].write_only:
+                    self.fields.pop(nombre)
+
+    @classmethod
+    def campos_disponibles(cls) -> list[str]:
+        """Campos de salida que se pueden pedir con ``?fields=`` / ``?omit=``."""
+        return [nombre for nombre, campo in cls().fields.items() if not campo.write_only]
+
+    @classmethod
+    def preparar_queryset(cls, queryset, campos: list[str]):
+        """Carga solo las columnas y relaciones que necesitan ``campos``."""
+        columnas = list(cls.CARGA_BASE.columnas)
+        select_related = list(cls.CARGA_BASE.select_related)
+        prefetch_related = list(cls.CARGA_BASE.prefetch_related)
+        for nombre in campos:
+            carga = cls.CARGA_POR_CAMPO.get(nombre) or _carga_columna(queryset.model, nombre)
+            columnas.extend(carga.columnas)
+            select_related.extend(carga.select_related)
+            prefetch_related.extend(carga.prefetch_related)
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select_related:
+            queryset = queryset.select_related(*dict.fromkeys(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset.only(*dict.fromkeys(columnas))
+
+
 class CustomUserSerializer(serializers.ModelSerializer):
     """Serializador unificado para usuarios"""
 
@@ -118,9 +191,15 @@ class EmpleadoProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
-class GastoSerializer(serializers.ModelSerializer):
+class GastoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializador de Gastos con info detallada y soporte de entrada para viaje_id"""
 
+    CARGA_POR_CAMPO = {
+        "empleado": CargaCampo(("empleado",), ("empleado__user", "empleado__empresa")),
+        "empresa": CargaCampo(("empresa",), ("empresa__user",)),
+        "viaje": CargaCampo(("viaje",), ("viaje",)),
+    }
+
     empleado_id = serializers.IntegerField(write_only=True)
     empresa_id = serializers.IntegerField(write_only=True)
     viaje_id = serializers.IntegerField(write_only=True)
@@ -301,8 +380,15 @@ class NotaViajeSerializer(serializers.ModelSerializer):
 """
 
 
-class ViajeSerializer(serializers.ModelSerializer):
+class ViajeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializador para manejar viajes y cálculo automático de días con destino y país"""
+
+    CARGA_POR_CAMPO = {
+        "empleado": CargaCampo(("empleado",), ("empleado__user", "empleado__empresa")),
+        "empresa": CargaCampo(("empresa",), ("empresa__user",)),
+        "notas": CargaCampo(prefetch_related=("notas",)),
+    }
+
     empleado_id = serializers.IntegerField(write_only=True, required=False)
     empresa_id = serializers.IntegerField(write_only=True, required=False)
     empleado = EmpleadoProfileSerializer(read_only=True)
@@ -395,6 +481,13 @@ class ViajeSerializer(serializers.ModelSerializer):
 class ViajeWithGastosSerializer(ViajeSerializer):
     """Extiende el serializer de viajes para incluir los gastos asociados."""
 
+    CARGA_POR_CAMPO = {
+        **ViajeSerializer.CARGA_POR_CAMPO,
+        "gastos": CargaCampo(prefetch_related=(
+            Prefetch("gasto_set", queryset=Gasto.objects.order_by("fecha_gasto", "id")),
+        )),
+    }
+
     gastos = GastoNestedSerializer(many=True, read_only=True, source='gasto_set')
 
     class Meta(ViajeSerializer.Meta):
@@ -402,9 +495,147 @@ class ViajeWithGastosSerializer(ViajeSerializer):
         read_only_fields = ViajeSerializer.Meta.read_only_fields + ['gastos']
 
 
-class ViajeSnapshotSerializer(serializers.Serializer):
+def _perfiles_por_snapshot(snapshots, campos: list[str], context) -> dict[int, dict]:
+    """
+    Bloques ``empleado`` y ``empresa`` pedidos en ``campos`` por id de
+    snapshot, serializando cada perfil una sola vez.
+    """
+    vivos: dict[int, dict] = {snapshot.pk: {} for snapshot in snapshots}
+    for campo, modelo, serializer_class, relaciones in (
+        ("empleado", EmpleadoProfile, EmpleadoProfileSerializer, ("user", "empresa")),
+        ("empresa", EmpresaProfile, EmpresaProfileSerializer, ("user",)),
+    ):
+        if campo not in campos:
+            continue
+        ids = {getattr(snapshot, f"{campo}_id") for snapshot in snapshots} - {None}
+        queryset = modelo.objects.filter(pk__in=ids).select_related(*relaciones)
+        datos = serializer_class(queryset, many=True, context=context).data if ids else []
+        por_id = {perfil["id"]: perfil for perfil in datos}
+        for snapshot in snapshots:
+            vivos[snapshot.pk][campo] = por_id.get(getattr(snapshot, f"{campo}_id"))
+    return vivos
+
+
+# Relaciones que usa GastoSnapshotSerializer al serializar un snapshot campo a campo
+GASTO_SNAPSHOT_RELACIONES = (
+    "gasto__empleado__user", "gasto__empleado__empresa", "gasto__empresa__user", "gasto__viaje",
+    "viaje_snapshot", "empleado__user", "empleado__empresa", "empresa__user",
+)
+
+
+class PayloadSnapshotListSerializer(serializers.ListSerializer):
+    """
+    Lista de snapshots que parte del ``payload`` guardado al publicar.
+
+    Cada fila se compone con su ``payload`` y los valores vivos que el
+    serializador hijo carga para toda la página de una vez; los snapshots
+    sin ``payload`` se serializan campo a campo; si el queryset de la página
+    solo trajo algunas columnas (``preparar_queryset``), antes se recargan
+    completos en una consulta.
+    """
+
+    def to_representation(self, data):
+        filas = list(data.all() if isinstance(data, BaseManager) else data)
+        diferidas = [fila.pk for fila in filas if fila.payload is None and fila.get_deferred_fields()]
+        if diferidas:
+            completas = self.child.cargar_sin_payload(type(filas[0]), diferidas)
+            filas = [completas.get(fila.pk, fila) for fila in filas]
+
+        publicadas = [fila for fila in filas if fila.payload is not None]
+        vivos = self.child.valores_vivos(publicadas) if publicadas else {}
+        campos = self.child.campos_salida()
+
+        resultado = []
+        for fila in filas:
+            if fila.payload is None:
+                resultado.append(self.child.to_representation(fila))
+                continue
+            valores = {**fila.payload, **vivos[fila.pk]}
+            resultado.append({campo: valores[campo] for campo in campos if campo in valores})
+        return resultado
+
+
+class PayloadSnapshotMixin(SparseFieldsMixin):
+    """
+    Serializadores de snapshots con ``payload`` prerenderizado.
+
+    El publicador guarda en ``payload`` los campos congelados tal como los
+    escribe el renderer JSON de la API. Los de ``CAMPOS_VIVOS`` cambian entre
+    publicaciones y se leen en cada petición con ``valores_vivos``.
+    """
+
+    CAMPOS_VIVOS: tuple[str, ...] = ()
+    # Relaciones que recorre la serialización campo a campo (snapshots sin ``payload``)
+    CARGA_SIN_PAYLOAD = CargaCampo()
+
+    @classmethod
+    def cargar_sin_payload(cls, modelo, ids: list[int]) -> dict:
+        """Snapshots ``ids`` con todas sus columnas y ``CARGA_SIN_PAYLOAD``, por id."""
+        snapshots = modelo.objects.filter(pk__in=ids).select_related(*cls.CARGA_SIN_PAYLOAD.select_related)
+        if cls.CARGA_SIN_PAYLOAD.prefetch_related:
+            snapshots = snapshots.prefetch_related(*cls.CARGA_SIN_PAYLOAD.prefetch_related)
+        return {snapshot.pk: snapshot for snapshot in snapshots}
+
+    @classmethod
+    def campos_payload(cls) -> list[str]:
+        """Campos de salida que se guardan en ``payload``."""
+        return [campo for campo in cls.campos_disponibles() if campo not in cls.CAMPOS_VIVOS]
+
+    @classmethod
+    def renderizar_payload(cls, snapshot) -> dict:
+        """``payload`` de un snapshot: sus campos congelados ya convertidos a JSON."""
+        return json.loads(JSONRenderer().render(cls(snapshot, fields=cls.campos_payload()).data))
+
+    def _get_request_context(self):
+        return self.context.get('request') if isinstance(self.context, dict) else None
+
+    def campos_salida(self) -> list[str]:
+        """Campos de cada fila, en orden."""
+        return self.campos_disponibles() if self.campos_solicitados is None else self.campos_solicitados
+
+    def valores_vivos(self, snapshots: list) -> dict[int, dict]:
+        """
+        Valores de ``CAMPOS_VIVOS`` por id de snapshot.
+
+        Esta versión serializa cada snapshot completo y se queda con sus
+        campos vivos; los serializadores la sobrescriben para cargarlos para
+        toda la página de una vez.
+        """
+        campos = [campo for campo in self.campos_salida() if campo in self.CAMPOS_VIVOS]
+        if not campos:
+            return {snapshot.pk: {} for snapshot in snapshots}
+
+        vivos = {}
+        for snapshot in snapshots:
+            fila = self.to_representation(snapshot)
+            vivos[snapshot.pk] = {campo: fila[campo] for campo in campos if campo in fila}
+        return vivos
+
+
+class ViajeSnapshotSerializer(PayloadSnapshotMixin, serializers.Serializer):
     """Serializa snapshots publicados de viajes revisados."""
 
+    CAMPOS_VIVOS = ("empleado", "empresa", "notas", "gastos")
+    CARGA_SIN_PAYLOAD = CargaCampo(
+        select_related=("viaje", "empleado__user", "empleado__empresa", "empresa__user"),
+        prefetch_related=(
+            "viaje__notas",
+            Prefetch(
+                "gastos_snapshot",
+                queryset=GastoReviewSnapshot.objects.select_related(*GASTO_SNAPSHOT_RELACIONES),
+            ),
+        ),
+    )
+    CARGA_BASE = CargaCampo(("payload",))
+    CARGA_POR_CAMPO = {
+        "id": CargaCampo(("viaje",)),
+        "empleado": CargaCampo(("empleado",)),
+        "empresa": CargaCampo(("empresa",)),
+        "fecha_solicitud": CargaCampo(("viaje",)),
+        "notas": CargaCampo(("viaje",)),
+        "gastos": CargaCampo(),
+    }
+
     id = serializers.IntegerField(source='viaje_id')
     empleado = serializers.SerializerMethodField()
     empresa = serializers.SerializerMethodField()
@@ -422,8 +653,8 @@ class ViajeSnapshotSerializer(serializers.Serializer):
     notas = serializers.SerializerMethodField()
     gastos = serializers.SerializerMethodField()
 
-    def _get_request_context(self):
-        return self.context.get('request') if isinstance(self.context, dict) else None
+    class Meta:
+        list_serializer_class = PayloadSnapshotListSerializer
 
     def get_empleado(self, obj):
         if not obj.empleado_id:
@@ -464,17 +695,96 @@ class ViajeSnapshotSerializer(serializers.Serializer):
             data.pop('gastos', None)
         return data
 
-
-class GastoSnapshotSerializer(serializers.Serializer):
+    def campos_salida(self) -> list[str]:
+        campos = super().campos_salida()
+        if not self.context.get('include_gastos'):
+            campos = [campo for campo in campos if campo != 'gastos']
+        return campos
+
+    def valores_vivos(self, snapshots: list) -> dict[int, dict]:
+        campos = self.campos_salida()
+        vivos = _perfiles_por_snapshot(snapshots, campos, self.context)
+
+        if 'notas' in campos:
+            notas = list(Notas.objects.filter(viaje_id__in={s.viaje_id for s in snapshots}).order_by('id'))
+            datos = NotaViajeSerializer(notas, many=True, context=self.context).data
+            notas_por_viaje = defaultdict(list)
+            for nota, dato in zip(notas, datos, strict=True):
+                notas_por_viaje[nota.viaje_id].append(dato)
+            for snapshot in snapshots:
+                vivos[snapshot.pk]['notas'] = notas_por_viaje[snapshot.viaje_id]
+
+        if 'gastos' in campos:
+            gastos = list(GastoSnapshotSerializer.preparar_queryset(
+                GastoReviewSnapshot.objects.filter(viaje_snapshot__in=snapshots).order_by('id'),
+                GastoSnapshotSerializer.campos_disponibles(),
+            ))
+            datos = GastoSnapshotSerializer(
+                gastos, many=True, context={'request': self._get_request_context()}
+            ).data
+            gastos_por_snapshot = defaultdict(list)
+            for gasto, dato in zip(gastos, datos, strict=True):
+                gastos_por_snapshot[gasto.viaje_snapshot_id].append(dato)
+            for snapshot in snapshots:
+                vivos[snapshot.pk]['gastos'] = gastos_por_snapshot[snapshot.pk]
+
+        return vivos
+
+
+class GastoSnapshotSerializer(PayloadSnapshotMixin, serializers.Serializer):
     """Serializa snapshot de gasto usando valores congelados."""
 
+    CAMPOS_VIVOS = ("comprobante", "empleado", "empresa")
+    CARGA_SIN_PAYLOAD = CargaCampo(select_related=GASTO_SNAPSHOT_RELACIONES)
+    CARGA_BASE = CargaCampo(("payload", "gasto", "viaje_snapshot"))
+    CARGA_POR_CAMPO = {
+        "id": CargaCampo(),
+        "empleado": CargaCampo(("empleado",)),
+        "empresa": CargaCampo(("empresa",)),
+        "viaje": CargaCampo(),
+    }
+
+    class Meta:
+        list_serializer_class = PayloadSnapshotListSerializer
+
+    @classmethod
+    def campos_disponibles(cls) -> list[str]:
+        return GastoSerializer.campos_disponibles()
+
+    @classmethod
+    def renderizar_payload(cls, snapshot) -> dict:
+        payload = super().renderizar_payload(snapshot)
+        payload['viaje_id'] = snapshot.viaje_snapshot.viaje_id if snapshot.viaje_snapshot else None
+        return payload
+
+    def campos_salida(self) -> list[str]:
+        if self.campos_solicitados is None:
+            return [*self.campos_disponibles(), 'viaje_id']
+        return self.campos_solicitados
+
+    def valores_vivos(self, snapshots: list) -> dict[int, dict]:
+        campos = self.campos_salida()
+        vivos = _perfiles_por_snapshot(snapshots, campos, self.context)
+
+        if 'comprobante' in campos:
+            gastos = Gasto.objects.filter(pk__in=[s.gasto_id for s in snapshots]).only('id', 'comprobante')
+            datos = GastoSerializer(
+                gastos, many=True, context={'request': self._get_request_context()}, fields=['id', 'comprobante']
+            ).data
+            comprobantes = {dato['id']: dato['comprobante'] for dato in datos}
+            for snapshot in snapshots:
+                vivos[snapshot.pk]['comprobante'] = comprobantes.get(snapshot.gasto_id)
+
+        return vivos
+
     def to_representation(self, snapshot: GastoReviewSnapshot):
         gasto = getattr(snapshot, 'gasto', None)
         request = self.context.get('request') if isinstance(self.context, dict) else None
+        campos = self.campos_solicitados
 
         data: dict[str, Any]
         if gasto:
-            data = GastoSerializer(gasto, context={'request': request}).data
+            data = GastoSerializer(gasto, context={'request': request}, fields=campos).data
         else:
             # construir estructura básica si el gasto fue borrado
             data = {
@@ -485,8 +795,14 @@ class GastoSnapshotSerializer(serializers.Serializer):
                 'estado': snapshot.estado,
                 'fecha_solicitud': None,
                 'comprobante': None,
-                'empleado': EmpleadoProfileSerializer(snapshot.empleado).data if snapshot.empleado_id else None,
-                'empresa': EmpresaProfileSerializer(snapshot.empresa).data if snapshot.empresa_id else None,
+                'empleado': (
+                    EmpleadoProfileSerializer(snapshot.empleado).data
+                    if snapshot.empleado_id and (campos is None or 'empleado' in campos) else None
+                ),
+                'empresa': (
+                    EmpresaProfileSerializer(snapshot.empresa).data
+                    if snapshot.empresa_id and (campos is None or 'empresa' in campos) else None
+                ),
                 'empleado_id': snapshot.empleado_id,
                 'empresa_id': snapshot.empresa_id,
                 'viaje': None,
@@ -511,6 +827,8 @@ class GastoSnapshotSerializer(serializers.Serializer):
                 'estado': viaje.estado,
             }
 
+        if campos is not None:
+            data = {nombre: valor for nombre, valor in data.items() if nombre in campos}
         return data
 
 
@@ -5,6 +5,22 @@ from datetime import date, datetime, timedelta
 from typing import TypedDict
 
 from django.db import transaction
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    F,
+    IntegerField,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Left, StrIndex, Trim
+from django.utils import timezone
 
 from users.common.services import mark_company_review_pending
 from users.models import DiaViaje, EmpleadoProfile, Gasto, Viaje
@@ -116,23 +132,25 @@ def crear_dias_viaje(viaje: Viaje) -> list[DiaViaje]:
     """
     Crea objetos DiaViaje para cada día del viaje.
 
+    Los días se insertan con un único ``bulk_create``; los que ya existen se
+    ignoran gracias a la restricción única (viaje, fecha).
+
     Args:
         viaje: Viaje para el que crear los días
 
     Returns:
-        Lista de DiaViaje creados
+        Lista de DiaViaje del viaje entre fecha_inicio y fecha_fin, por fecha
     """
-    dias = []
     start = viaje.fecha_inicio
     end = viaje.fecha_fin
     delta = (end - start).days
 
-    for i in range(delta + 1):
-        fecha = start + timedelta(days=i)
-        dia, created = DiaViaje.objects.get_or_create(viaje=viaje, fecha=fecha)
-        dias.append(dia)
-
-    return dias
+    DiaViaje.objects.bulk_create(
+        [DiaViaje(viaje=viaje, fecha=start + timedelta(days=i)) for i in range(delta + 1)],
+        ignore_conflicts=True,
+    )
+    # ignore_conflicts no devuelve las claves primarias: se releen los días
+    return list(viaje.dias.filter(fecha__range=(start, end)).order_by("fecha"))
 
 
 @transaction.atomic
@@ -163,10 +181,12 @@ def inicializar_dias_viaje_finalizado(viaje: Viaje, exentos: bool = True) -> lis
     dias = crear_dias_viaje(viaje)
 
     # Inicializar todos como revisados y con el estado de exento especificado
+    DiaViaje.objects.filter(pk__in=[dia.pk for dia in dias]).update(
+        exento=exentos, revisado=True, updated_at=timezone.now()
+    )
     for dia in dias:
         dia.exento = exentos
         dia.revisado = True
-        dia.save()
 
     return dias
 
@@ -195,40 +215,47 @@ def procesar_revision_viaje(
     if not isinstance(dias_data, list) or not all('id' in d and 'exento' in d for d in dias_data):
         raise ValueError("Formato de días inválido")
 
-    # Obtener días del viaje
-    dias_viaje = viaje.dias.all()
+    # Obtener días del viaje (id y valor actual de exento)
+    exento_actual = dict(viaje.dias.values_list("id", "exento"))
 
     # Validar que existen todos los DiaViaje esperados
     dias_esperados = (viaje.fecha_fin - viaje.fecha_inicio).days + 1
-    if dias_viaje.count() != dias_esperados:
+    if len(exento_actual) != dias_esperados:
         raise ValueError(
             f"Faltan días por crear. Esperados: {dias_esperados}, "
-            f"Encontrados: {dias_viaje.count()}. "
+            f"Encontrados: {len(exento_actual)}. "
             f"Ejecuta crear_dias_viaje(viaje) primero."
         )
 
     # Mapear días enviados
     id_a_exento = {d['id']: d['exento'] for d in dias_data}
-    ids_validos = set(d.id for d in dias_viaje)
 
     # Validar que todos los días pertenezcan al viaje
-    if not set(id_a_exento.keys()).issubset(ids_validos):
+    if not set(id_a_exento.keys()).issubset(exento_actual.keys()):
         raise ValueError("Uno o más días no pertenecen al viaje")
 
-    # Procesar cada día
+    # Los días no enviados conservan su valor de exento
+    dias_exentos = []
     dias_no_exentos = []
-    for dia in dias_viaje:
-        exento = id_a_exento.get(dia.id, dia.exento)
-        dia.exento = exento
-        dia.revisado = True
-        dia.save()
-
-        # Actualizar estado de gastos
-        estado_gasto = "RECHAZADO" if not exento else "APROBADO"
-        dia.gastos.update(estado=estado_gasto)
-
-        if not exento:
-            dias_no_exentos.append(dia)
+    for dia_id, exento in exento_actual.items():
+        if id_a_exento.get(dia_id, exento):
+            dias_exentos.append(dia_id)
+        else:
+            dias_no_exentos.append(dia_id)
+
+    # Un UPDATE por grupo de días y otro para sus gastos
+    ahora = timezone.now()
+    if dias_exentos:
+        DiaViaje.objects.filter(pk__in=dias_exentos).update(exento=True, revisado=True, updated_at=ahora)
+    if dias_no_exentos:
+        DiaViaje.objects.filter(pk__in=dias_no_exentos).update(exento=False, revisado=True, updated_at=ahora)
+    Gasto.objects.filter(dia_id__in=exento_actual.keys()).update(
+        estado=Case(
+            When(dia_id__in=dias_no_exentos, then=Value("RECHAZADO")),
+            default=Value("APROBADO"),
+        ),
+        updated_at=ahora,
+    )
 
     # Marcar viaje como revisado
     viaje.estado = "REVISADO"
@@ -238,7 +265,7 @@ def procesar_revision_viaje(
 
     return {
         "viaje_id": viaje.id,
-        "dias_procesados": len(dias_viaje),
+        "dias_procesados": len(exento_actual),
         "dias_no_exentos": len(dias_no_exentos)
     }
 
@@ -307,8 +334,9 @@ def cambiar_estado_viaje(
     viaje.estado = "REABIERTO"
     viaje.save(update_fields=["estado"])
 
-    viaje.dias.update(revisado=False)
-    Gasto.objects.filter(viaje=viaje).exclude(estado='PENDIENTE').update(estado='PENDIENTE')
+    ahora = timezone.now()
+    viaje.dias.update(revisado=False, updated_at=ahora)
+    Gasto.objects.filter(viaje=viaje).exclude(estado='PENDIENTE').update(estado='PENDIENTE', updated_at=ahora)
 
     mark_company_review_pending(viaje.empresa)
 
@@ -319,46 +347,83 @@ def cambiar_estado_viaje(
 # QUERIES Y ESTADÍSTICAS
 # ============================================================================
 
+def ciudad_normalizada() -> Case:
+    """
+    Expresión SQL con la ciudad de un viaje.
+
+    Usa ``ciudad`` si está informada y, si no, la parte de ``destino`` anterior
+    a la primera coma (``"Madrid, España"`` -> ``"Madrid"``).
+    """
+    posicion_coma = StrIndex("destino", Value(","))
+    return Case(
+        When(~Q(ciudad=None) & ~Q(ciudad=""), then=F("ciudad")),
+        When(Q(destino__contains=","), then=Trim(Left("destino", posicion_coma - 1))),
+        default=Trim("destino"),
+        output_field=CharField(),
+    )
+
+
 def obtener_estadisticas_ciudades(empleado: EmpleadoProfile) -> list[CityStat]:
     """
     Obtiene estadísticas de ciudades visitadas por un empleado.
 
+    Una sola consulta agrupada por ``ciudad_normalizada()``. Los días exentos
+    y no exentos se cuentan con subconsultas por viaje dentro de la misma
+    consulta: un join con ``DiaViaje`` repetiría ``dias_viajados`` una vez
+    por cada día del viaje.
+
     Args:
         empleado: Empleado a analizar
 
     Returns:
-        Lista de diccionarios con estadísticas por ciudad
+        Lista de diccionarios con estadísticas por ciudad, en el orden del
+        primer viaje a cada ciudad
     """
-    viajes = Viaje.objects.filter(
-        empleado=empleado,
-        estado='REVISADO'
+    def contar_dias(exento: bool) -> Coalesce:
+        dias = (
+            DiaViaje.objects
+            .filter(viaje=OuterRef("pk"), exento=exento)
+            .order_by()
+            .values("viaje")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(dias, output_field=IntegerField()), Value(0))
+
+    estadisticas = (
+        Viaje.objects
+        .filter(empleado=empleado, estado='REVISADO')
+        .annotate(
+            ciudad_stats=ciudad_normalizada(),
+            # dias_viajados = 0 cuenta como un día
+            dias_stats=Case(
+                When(dias_viajados=0, then=Value(1)),
+                default=F("dias_viajados"),
+                output_field=IntegerField(),
+            ),
+            exentos_stats=contar_dias(True),
+            no_exentos_stats=contar_dias(False),
+        )
+        .values("ciudad_stats")
+        .annotate(
+            trips=Count("id"),
+            days=Sum("dias_stats"),
+            exemptDays=Sum("exentos_stats"),
+            nonExemptDays=Sum("no_exentos_stats"),
+            primer_viaje=Min("id"),
+        )
+        .order_by("primer_viaje")
     )
 
-    city_stats: dict[str, CityStat] = {}
-
-    for viaje in viajes:
-        ciudad = viaje.ciudad or viaje.destino.split(',')[0].strip()
-        dias = viaje.dias_viajados or 1
-
-        # Calcular días exentos y no exentos
-        dias_relacionados = DiaViaje.objects.filter(viaje=viaje)
-        exentos = dias_relacionados.filter(exento=True).count()
-        no_exentos = dias_relacionados.filter(exento=False).count()
-
-        if ciudad not in city_stats:
-            city_stats[ciudad] = {
-                'city': ciudad,
-                'trips': 1,
-                'days': dias,
-                'nonExemptDays': no_exentos,
-                'exemptDays': exentos,
-            }
-        else:
-            city_stats[ciudad]['trips'] += 1
-            city_stats[ciudad]['days'] += dias
-            city_stats[ciudad]['nonExemptDays'] += no_exentos
-            city_stats[ciudad]['exemptDays'] += exentos
-
-    return list(city_stats.values())
+    return [
+        {
+            'city': fila['ciudad_stats'],
+            'trips': fila['trips'],
+            'days': fila['days'],
+            'nonExemptDays': fila['nonExemptDays'],
+            'exemptDays': fila['exemptDays'],
+        }
+        for fila in estadisticas
+    ]
 
 
@@ -0,0 +1,96 @@
+"""
+Tests para ?fields= / ?omit= en los listados de viajes.
+"""
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.common.services import publish_due_releases
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Notas, Viaje
+
+
+class CamposViajesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_campos", email="empresa_campos@test.com", password="pass", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user, nombre_empresa="Empresa Campos", nif="B77300001",
+            correo_contacto="campos@test.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_campos", email="empleado_campos@test.com", password="pass", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Rosa", apellido="Campos", dni="77300001C",
+        )
+        for dia in (2, 4):
+            self._viaje(date(2024, 9, dia), "REVISADO")
+        publish_due_releases()
+        for dia in (3, 5):
+            self._viaje(date(2024, 9, dia), "EN_REVISION")
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.empresa_user.pk))
+
+    def _viaje(self, inicio, estado):
+        viaje = Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Toledo", fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=1), estado=estado, dias_viajados=2,
+        )
+        Notas.objects.create(viaje=viaje, empleado=self.empleado, contenido="Nota")
+        return viaje
+
+    def _get(self, params):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('viajes_todos'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [consulta['sql'] for consulta in contexto.captured_queries]
+
+    def test_fields_limita_la_salida_y_las_consultas(self):
+        self._get({})
+
+        data, consultas = self._get({'fields': 'id,fecha_inicio,destino,estado'})
+
+        self.assertEqual(len(data), 4)
+        for viaje in data:
+            self.assertEqual(set(viaje), {'id', 'fecha_inicio', 'destino', 'estado'})
+        self.assertEqual([viaje['fecha_inicio'] for viaje in data], [
+            '2024-09-05', '2024-09-04', '2024-09-03', '2024-09-02',
+        ])
+        # Unión y una carga por fuente, sin perfiles ni notas
+        self.assertEqual(len(consultas), 3)
+        for sql in consultas:
+            self.assertNotIn('"users_empleadoprofile"."nombre"', sql)
+            self.assertNotIn('users_notas', sql)
+        self.assertNotIn('"users_viaje"."motivo"', consultas[-1])
+
+    def test_consultas_no_dependen_del_numero_de_viajes(self):
+        self._get({})
+        _, pocos = self._get({'fields': 'id,empleado,notas'})
+
+        for dia in range(10, 20):
+            self._viaje(date(2024, 10, dia), "EN_REVISION")
+        data, muchos = self._get({'fields': 'id,empleado,notas'})
+
+        self.assertEqual(len(data), 14)
+        self.assertEqual(len(muchos), len(pocos))
+        self.assertEqual(data[0]['empleado']['nombre'], "Rosa")
+        self.assertEqual(len(data[0]['notas']), 1)
+
+    def test_omit_quita_campos(self):
+        data, _ = self._get({'omit': 'empleado,empresa,notas'})
+
+        self.assertNotIn('empleado', data[0])
+        self.assertNotIn('notas', data[-1])
+        self.assertIn('motivo', data[0])
+
+    def test_campo_desconocido(self):
+        response = self.client.get(reverse('viajes-revisados'), {'fields': 'id,salario'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('salario', response.data['fields'])
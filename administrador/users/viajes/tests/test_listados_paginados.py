@@ -0,0 +1,108 @@
+"""
+Tests para la paginación por cursor de los listados de viajes.
+"""
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.common.services import publish_due_releases
+from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Viaje
+
+
+class ListadosViajesPaginadosTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_paginada", email="empresa_paginada@test.com", password="pass", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user, nombre_empresa="Empresa Paginada", nif="B77000001",
+            correo_contacto="paginada@test.com",
+        )
+        self.empleado_user = CustomUser.objects.create_user(
+            username="empleado_paginado", email="empleado_paginado@test.com", password="pass", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=self.empleado_user, empresa=self.empresa, nombre="Ana", apellido="Paginada", dni="77000001P",
+        )
+
+        # Revisados (snapshots) y en vivo comparten fechas para forzar empates
+        for dia in (1, 1, 3, 5, 5):
+            self._viaje(date(2024, 3, dia), "REVISADO")
+        publish_due_releases()
+        for dia in (1, 3, 3, 7):
+            self._viaje(date(2024, 3, dia), "EN_REVISION")
+
+    def _viaje(self, inicio, estado):
+        return Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Vigo", fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=1), estado=estado, dias_viajados=2,
+        )
+
+    def _recorrer(self, url, clave_lista, params=None):
+        vistos = []
+        params = {'page_size': 2, **(params or {})}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            vistos.extend(response.data[clave_lista])
+            if response.data['next_cursor'] is None:
+                return vistos
+            params = {**params, 'cursor': response.data['next_cursor']}
+
+    def test_recorre_snapshots_y_viajes_en_vivo_sin_huecos(self):
+        self.client.force_authenticate(user=self.empresa_user)
+
+        sin_paginar = self.client.get(reverse('viajes_todos')).data
+        vistos = self._recorrer(reverse('viajes_todos'), 'results')
+
+        self.assertEqual(len(vistos), 9)
+        self.assertCountEqual([v['id'] for v in vistos], [v['id'] for v in sin_paginar])
+        self.assertEqual(
+            [(v['fecha_inicio'], v['id']) for v in vistos],
+            sorted(((v['fecha_inicio'], v['id']) for v in vistos), reverse=True),
+        )
+
+    def test_respuesta_de_empleado_conserva_su_forma(self):
+        self.client.force_authenticate(user=self.empleado_user)
+
+        response = self.client.get(reverse('viajes-revisados'), {'page_size': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'employee', 'company', 'trips', 'next', 'next_cursor'})
+        self.assertEqual(len(response.data['trips']), 3)
+        self.assertNotIn('empleado', response.data['trips'][0])
+
+        vistos = self._recorrer(reverse('viajes-revisados'), 'trips')
+        self.assertEqual([v['fecha_inicio'] for v in vistos], ['2024-03-05'] * 2 + ['2024-03-03'] + ['2024-03-01'] * 2)
+
+    def test_primera_pagina_no_depende_del_historial(self):
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.empresa_user.pk))
+        # La primera petición carga el perfil de la empresa
+        self.client.get(reverse('viajes_todos'), {'page_size': 2})
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(reverse('viajes_todos'), {'page_size': 2})
+
+        for dia in range(1, 29):
+            self._viaje(date(2023, 2, dia), "EN_REVISION")
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get(reverse('viajes_todos'), {'page_size': 2})
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(muchos.captured_queries), len(pocos.captured_queries))
+
+    def test_pendientes_mantienen_el_total(self):
+        self.client.force_authenticate(user=self.empresa_user)
+
+        response = self.client.get(reverse('pending-trips-count'), {'page_size': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['trips']), 3)
+        vistos = self._recorrer(reverse('pending-trips-count'), 'trips')
+        self.assertEqual(len({v['id'] for v in vistos}), 4)
@@ -0,0 +1,162 @@
+"""
+Tests para los listados servidos desde el ``payload`` de los snapshots.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from users.common.services import publish_due_releases, sync_company_review_snapshots
+from users.models import (
+    CustomUser,
+    EmpleadoProfile,
+    EmpresaProfile,
+    Gasto,
+    GastoReviewSnapshot,
+    Notas,
+    Viaje,
+    ViajeReviewSnapshot,
+)
+from users.serializers import GastoSnapshotSerializer, PayloadSnapshotMixin, ViajeSnapshotSerializer
+
+
+class PayloadSnapshotsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa_user = CustomUser.objects.create_user(
+            username="empresa_payload", email="empresa_payload@test.com", password="pass", role="EMPRESA",
+        )
+        self.empresa = EmpresaProfile.objects.create(
+            user=self.empresa_user, nombre_empresa="Empresa Payload", nif="B77500001",
+            correo_contacto="payload@test.com",
+        )
+        empleado_user = CustomUser.objects.create_user(
+            username="empleado_payload", email="empleado_payload@test.com", password="pass", role="EMPLEADO",
+        )
+        self.empleado = EmpleadoProfile.objects.create(
+            user=empleado_user, empresa=self.empresa, nombre="Lucía", apellido="Payload", dni="77500001P",
+        )
+        for dia in (2, 4):
+            self._viaje(date(2024, 5, dia), "REVISADO")
+        publish_due_releases()
+        self._viaje(date(2024, 5, 6), "EN_REVISION")
+
+    def _viaje(self, inicio, estado):
+        viaje = Viaje.objects.create(
+            empleado=self.empleado, empresa=self.empresa, destino="Cádiz, España", fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=1), estado=estado, dias_viajados=2,
+        )
+        Notas.objects.create(viaje=viaje, empleado=self.empleado, contenido="Nota")
+        for concepto, estado_gasto in (("Hotel", "APROBADO"), ("Taxi", "RECHAZADO")):
+            gasto = Gasto.objects.create(
+                empleado=self.empleado, empresa=self.empresa, viaje=viaje, concepto=concepto,
+                monto=Decimal("42.50"), estado=estado_gasto, fecha_gasto=inicio,
+            )
+        Gasto.objects.filter(pk=gasto.pk).update(comprobante="comprobantes/ticket.pdf")
+        return viaje
+
+    def _get(self, user, url, params=None):
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=user.pk))
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content), len(contexto.captured_queries)
+
+    def _sin_payload(self):
+        ViajeReviewSnapshot.objects.update(payload=None)
+        GastoReviewSnapshot.objects.update(payload=None)
+
+    def test_el_publicador_guarda_los_campos_congelados(self):
+        snapshot = ViajeReviewSnapshot.objects.order_by('fecha_inicio').first()
+        gasto = GastoReviewSnapshot.objects.filter(viaje_snapshot=snapshot).order_by('id').first()
+
+        self.assertEqual(snapshot.payload['fecha_inicio'], '2024-05-02')
+        self.assertNotIn('empleado', snapshot.payload)
+        self.assertNotIn('notas', snapshot.payload)
+        self.assertEqual(gasto.payload['monto'], '42.50')
+        self.assertEqual(gasto.payload['viaje']['id'], snapshot.viaje_id)
+        self.assertEqual(gasto.payload['viaje_id'], snapshot.viaje_id)
+        self.assertNotIn('comprobante', gasto.payload)
+
+    def test_respuestas_iguales_con_y_sin_payload(self):
+        consultas = [
+            (self.empresa_user, reverse('viajes_todos'), {}),
+            (self.empresa_user, reverse('viajes_todos'), {'include': 'gastos'}),
+            (self.empresa_user, reverse('viajes_todos'), {'fields': 'id,empleado,notas,gastos', 'include': 'gastos'}),
+            (self.empleado.user, reverse('viajes_todos'), {'include': 'gastos', 'page_size': 2}),
+            (self.empresa_user, reverse('lista_gastos'), {}),
+            (self.empresa_user, reverse('lista_gastos'), {'omit': 'empresa'}),
+        ]
+        con_payload = [self._get(user, url, params)[0] for user, url, params in consultas]
+
+        self._sin_payload()
+
+        for (user, url, params), esperado in zip(consultas, con_payload, strict=True):
+            self.assertEqual(self._get(user, url, params)[0], esperado, (url, params))
+
+    def test_comprobante_y_notas_se_leen_en_vivo(self):
+        Notas.objects.create(viaje=Viaje.objects.get(fecha_inicio=date(2024, 5, 2)), empleado=self.empleado,
+                             contenido="Nota posterior")
+        Gasto.objects.filter(concepto="Taxi").update(comprobante="comprobantes/nuevo.pdf")
+
+        data, _ = self._get(self.empresa_user, reverse('viajes_todos'), {'include': 'gastos'})
+
+        revisado = next(viaje for viaje in data if viaje['fecha_inicio'] == '2024-05-02')
+        self.assertEqual([nota['contenido'] for nota in revisado['notas']], ["Nota", "Nota posterior"])
+        self.assertEqual(
+            [gasto['comprobante'] for gasto in revisado['gastos']],
+            [None, 'http://testserver/media/comprobantes/nuevo.pdf'],
+        )
+
+    def test_consultas_no_dependen_del_numero_de_snapshots(self):
+        params = {'include': 'gastos'}
+        self._get(self.empresa_user, reverse('viajes_todos'), params)
+        _, pocos = self._get(self.empresa_user, reverse('viajes_todos'), params)
+
+        for dia in range(10, 20):
+            self._viaje(date(2024, 6, dia), "REVISADO")
+        sync_company_review_snapshots(self.empresa, incremental=False)
+        data, muchos = self._get(self.empresa_user, reverse('viajes_todos'), params)
+
+        self.assertEqual(len(data), 13)
+        self.assertEqual(muchos, pocos)
+
+    def test_snapshots_sin_payload_no_consultan_por_fila(self):
+        consultas = [
+            (reverse('viajes_todos'), {'include': 'gastos'}),
+            (reverse('lista_gastos'), {}),
+        ]
+        self._sin_payload()
+        pocos = [self._get(self.empresa_user, url, params)[1] for url, params in consultas]
+
+        for dia in range(10, 20):
+            self._viaje(date(2024, 6, dia), "REVISADO")
+        sync_company_review_snapshots(self.empresa, incremental=False)
+        self._sin_payload()
+        muchos = [self._get(self.empresa_user, url, params)[1] for url, params in consultas]
+
+        self.assertEqual(muchos, pocos)
+
+    def test_valores_vivos_por_lotes_coinciden_con_la_version_base(self):
+        request = Request(APIRequestFactory().get('/'))
+        contexto = {'request': request, 'include_gastos': True}
+        casos = (
+            (ViajeSnapshotSerializer, ViajeReviewSnapshot.objects.select_related('viaje', 'empleado', 'empresa')),
+            (GastoSnapshotSerializer, GastoReviewSnapshot.objects.select_related('gasto', 'empleado', 'empresa')),
+        )
+        for serializer_class, snapshots in casos:
+            snapshots = list(snapshots.order_by('pk'))
+            serializer = serializer_class(context=contexto)
+
+            self.assertEqual(
+                serializer.valores_vivos(snapshots),
+                PayloadSnapshotMixin.valores_vivos(serializer, snapshots),
+                serializer_class.__name__,
+            )
@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from users.common.services import publish_due_releases
 from users.models import CustomUser, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
 
 
@@ -73,6 +74,8 @@ class ViajesHistoryIncludeGastosTests(TestCase):
             estado='RECHAZADO',
             fecha_gasto=date(2024, 1, 2)
         )
+        # Los endpoints solo leen snapshots: se publica como lo haría el scheduler
+        publish_due_releases()
 
     def authenticate(self, token=None):
         if token:
@@ -9,12 +9,15 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from users.models import (
+    DiaViaje,
     EmpleadoProfile,
     EmpresaProfile,
     Gasto,
@@ -24,6 +27,7 @@ from users.viajes.services import (
     crear_dias_viaje,
     crear_viaje,
     inicializar_dias_viaje_finalizado,
+    obtener_estadisticas_ciudades,
     procesar_revision_viaje,
 )
 
@@ -114,6 +118,28 @@ class CrearDiasViajeServiceTest(ViajesServicesBase):
         )
         self.assertTrue(all(dia.revisado is False for dia in dias))
 
+    def test_crear_dias_viaje_inserta_en_bloque_y_es_idempotente(self):
+        viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Bilbao, España",
+            fecha_inicio=date(2025, 3, 1),
+            fecha_fin=date(2025, 3, 30),
+            dias_viajados=30,
+            estado="EN_REVISION",
+        )
+
+        # Un INSERT para todos los días y una lectura
+        with self.assertNumQueries(2):
+            dias = crear_dias_viaje(viaje)
+        self.assertEqual(len(dias), 30)
+
+        dias[0].exento = False
+        dias[0].save()
+        self.assertEqual([dia.id for dia in crear_dias_viaje(viaje)], [dia.id for dia in dias])
+        self.assertEqual(viaje.dias.count(), 30)
+        self.assertFalse(viaje.dias.get(fecha=date(2025, 3, 1)).exento)
+
 
 class InicializarDiasRevisadosTest(ViajesServicesBase):
     """Valida la inicialización masiva para viajes históricos"""
@@ -135,6 +161,56 @@ class InicializarDiasRevisadosTest(ViajesServicesBase):
         self.assertTrue(all(dia.revisado for dia in dias))
         self.assertTrue(all(dia.exento for dia in dias))
 
+    def test_inicializar_dias_con_consultas_constantes(self):
+        viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Cádiz, España",
+            fecha_inicio=date(2024, 7, 1),
+            fecha_fin=date(2024, 7, 31),
+            dias_viajados=31,
+            estado="REVISADO",
+        )
+
+        # Savepoint, INSERT, lectura, UPDATE y liberación del savepoint
+        with self.assertNumQueries(5):
+            inicializar_dias_viaje_finalizado(viaje, exentos=False)
+
+        self.assertEqual(viaje.dias.filter(exento=False, revisado=True).count(), 31)
+
+
+class EstadisticasCiudadesServiceTest(ViajesServicesBase):
+    """Agrupa los viajes revisados por ciudad en una consulta"""
+
+    def _viaje(self, destino, inicio, dias, exentos, ciudad=None, estado="REVISADO", dias_viajados=None):
+        viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino=destino,
+            ciudad=ciudad,
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=max(dias - 1, 0)),
+            dias_viajados=dias if dias_viajados is None else dias_viajados,
+            estado=estado,
+        )
+        for offset in range(dias):
+            DiaViaje.objects.create(viaje=viaje, fecha=inicio + timedelta(days=offset), exento=offset < exentos)
+        return viaje
+
+    def test_estadisticas_por_ciudad_normalizada(self):
+        self._viaje("Madrid, España", date(2024, 1, 8), 2, exentos=1, ciudad="Madrid")
+        self._viaje("Sevilla", date(2024, 2, 5), 1, exentos=1, ciudad="", dias_viajados=0)
+        self._viaje("Madrid ,  España", date(2024, 3, 4), 3, exentos=0)
+        self._viaje("Madrid", date(2024, 4, 1), 2, exentos=2, estado="EN_REVISION")
+
+        with self.assertNumQueries(1):
+            estadisticas = obtener_estadisticas_ciudades(self.empleado)
+
+        self.assertEqual(estadisticas, [
+            {"city": "Madrid", "trips": 2, "days": 5, "nonExemptDays": 4, "exemptDays": 1},
+            {"city": "Sevilla", "trips": 1, "days": 1, "nonExemptDays": 0, "exemptDays": 1},
+        ])
+
 
 class ProcesarRevisionServiceTest(ViajesServicesBase):
     """Cubre la finalización de la revisión de un viaje"""
@@ -181,6 +257,42 @@ class ProcesarRevisionServiceTest(ViajesServicesBase):
         self.assertEqual(resultado["dias_procesados"], 3)
         self.assertTrue(self.empresa.has_pending_review_changes)
 
+    def _consultas_revision(self, dias_viaje: int) -> int:
+        inicio = date(2024, 9, 1)
+        viaje = Viaje.objects.create(
+            empleado=self.empleado,
+            empresa=self.empresa,
+            destino="Málaga, España",
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=dias_viaje - 1),
+            dias_viajados=dias_viaje,
+            estado="EN_REVISION",
+        )
+        dias = crear_dias_viaje(viaje)
+        for dia in dias[:2]:
+            Gasto.objects.create(
+                empleado=self.empleado, empresa=self.empresa, viaje=viaje, dia=dia,
+                concepto="Comida", monto=20, estado="PENDIENTE",
+            )
+        dias_data = [{"id": dia.id, "exento": indice % 2 == 0} for indice, dia in enumerate(dias)]
+
+        with CaptureQueriesContext(connection) as contexto:
+            procesar_revision_viaje(viaje, dias_data=dias_data, usuario=self.empresa.user)
+
+        self.assertEqual(viaje.dias.filter(revisado=True, exento=False).count(), dias_viaje // 2)
+        self.assertEqual(
+            sorted(Gasto.objects.filter(viaje=viaje).values_list("estado", flat=True)),
+            ["APROBADO", "RECHAZADO"],
+        )
+        viaje.delete()
+        return len(contexto.captured_queries)
+
+    def test_procesar_revision_con_consultas_constantes(self):
+        # La primera revisión marca además la empresa como pendiente de publicar
+        self._consultas_revision(2)
+        # Dos UPDATE de días (exentos y no exentos) y uno de gastos, sea cual sea la duración
+        self.assertEqual(self._consultas_revision(4), self._consultas_revision(30))
+
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class CambiarEstadoViajeViewTest(TestCase):
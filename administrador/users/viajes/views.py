@@ -4,6 +4,7 @@ Vistas para gestión de viajes
 from django.db import transaction
 from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -15,10 +16,17 @@ from users.common.exceptions import (
     EmpresaProfileNotFoundError,
     UnauthorizedAccessError,
 )
+from users.common.fieldsets import campos_solicitados
+from users.common.pagination import KeysetPagination, serializar_por_fuente
 from users.common.services import (
+    FuenteVisible,
+    cargar_filas_visibles,
     get_user_empleado,
     get_user_empresa,
     get_visible_viajes_queryset,
+    mark_company_review_pending,
+    proyectar_fuentes,
+    unir_fuentes_visibles,
 )
 from users.models import DiaViaje, EmpleadoProfile, EmpresaProfile, Gasto, Viaje
 from users.serializers import (
@@ -52,6 +60,112 @@ def _ensure_can_review_viaje(user, viaje, empresa_cache=None):
     return None
 
 
+# ============================================================================
+# LISTADOS DE VIAJES
+# ============================================================================
+
+# Orden de los listados: la unión proyecta la fecha de inicio como
+# ``orden_fecha`` y el id del viaje (también en los snapshots) como ``orden_id``
+VIAJES_ORDERING = ("-orden_fecha", "-orden_id")
+
+
+def _incluye_gastos(request) -> bool:
+    include = {
+        part.strip().lower()
+        for part in request.query_params.get('include', '').split(',')
+        if part.strip()
+    }
+    return 'gastos' in include
+
+
+def _campos_viaje(request) -> list[str] | None:
+    return campos_solicitados(request, ViajeSnapshotSerializer.campos_disponibles())
+
+
+def _fuente_snapshots(snapshots, request, include_gastos: bool, campos: list[str] | None) -> tuple:
+    """Fuente de snapshots de viaje para la unión y su serializador."""
+    campos_cargados = [
+        campo for campo in (ViajeSnapshotSerializer.campos_disponibles() if campos is None else campos)
+        if campo != 'gastos' or include_gastos
+    ]
+    snapshots = ViajeSnapshotSerializer.preparar_queryset(snapshots, campos_cargados)
+
+    def serializar(filas):
+        return ViajeSnapshotSerializer(
+            filas,
+            many=True,
+            context={'request': request, 'include_gastos': include_gastos},
+            fields=campos,
+        ).data
+
+    return FuenteVisible(snapshots, 'fecha_inicio', 'viaje_id'), serializar
+
+
+def _fuente_viajes_en_vivo(viajes, request, include_gastos: bool, campos: list[str] | None) -> tuple:
+    """Fuente de viajes en vivo para la unión y su serializador."""
+    serializer_class = ViajeWithGastosSerializer if include_gastos else ViajeSerializer
+    if campos is not None:
+        viajes = serializer_class.preparar_queryset(viajes, campos)
+    elif include_gastos:
+        viajes = viajes.prefetch_related(
+            Prefetch(
+                'gasto_set',
+                queryset=Gasto.objects.select_related('empleado', 'empresa').order_by('fecha_gasto', 'id')
+            )
+        )
+
+    def serializar(filas):
+        return serializer_class(filas, many=True, context={'request': request}, fields=campos).data
+
+    return FuenteVisible(viajes, 'fecha_inicio', 'id'), serializar
+
+
+def _listar_viajes(request, user, fuentes: list[tuple]) -> Response:
+    """
+    Lista los viajes de varias fuentes ordenados por ``(fecha_inicio, id)``
+    descendente con una ``UNION ALL`` en la base de datos.
+
+    Con paginación, los listados planos usan ``{"next", "next_cursor",
+    "results"}`` y la respuesta de EMPLEADO añade ``next`` y ``next_cursor``
+    a su objeto. ``?fields=`` / ``?omit=`` limitan los campos de cada viaje.
+    """
+    visibles = [fuente for fuente, _ in fuentes]
+    paginador = KeysetPagination(VIAJES_ORDERING)
+    paginado = paginador.is_requested(request)
+
+    if paginado:
+        filas = paginador.paginate_union(proyectar_fuentes(visibles), request)
+    else:
+        filas = unir_fuentes_visibles(visibles).order_by(*VIAJES_ORDERING, 'fuente')
+    data = serializar_por_fuente(
+        cargar_filas_visibles(filas, visibles),
+        [serializar for _, serializar in fuentes],
+    )
+
+    if user.role == "EMPLEADO":
+        empleado = get_user_empleado(user)
+        empresa = empleado.empresa if empleado else None
+        employee_data = EmpleadoProfileSerializer(empleado, context={'request': request}).data if empleado else None
+        company_data = EmpresaProfileSerializer(empresa, context={'request': request}).data if empresa else None
+
+        for trip in data:
+            trip.pop('empleado', None)
+            trip.pop('empresa', None)
+
+        respuesta = {
+            "employee": employee_data,
+            "company": company_data,
+            "trips": data
+        }
+        if paginado:
+            respuesta.update(paginador.get_links())
+        return Response(respuesta, status=status.HTTP_200_OK)
+
+    if paginado:
+        return paginador.get_paginated_response(data)
+    return Response(data, status=status.HTTP_200_OK)
+
+
 class CrearViajeView(APIView):
     """Permite a los empleados crear un nuevo viaje"""
     authentication_classes = [JWTAuthentication]
@@ -106,68 +220,34 @@ class CrearViajeView(APIView):
 
 
 class ListarViajesRevisadosView(APIView):
-    """Lista los viajes revisados según el rol del usuario"""
+    """
+    Lista los viajes revisados según el rol del usuario.
+
+    Con ``?page_size=`` o ``?cursor=`` la lista se pagina por
+    ``(fecha_inicio, id)`` descendente; ``?fields=`` / ``?omit=`` limitan
+    los campos de cada viaje.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        include = {
-            part.strip().lower()
-            for part in request.query_params.get('include', '').split(',')
-            if part.strip()
-        }
-        include_gastos = 'gastos' in include
+        include_gastos = _incluye_gastos(request)
+        campos = _campos_viaje(request)
 
         visible_viajes = get_visible_viajes_queryset(user)
 
         if visible_viajes.uses_snapshot:
-            snapshots = visible_viajes.queryset
-            if include_gastos:
-                snapshots = snapshots.prefetch_related('gastos_snapshot', 'gastos_snapshot__gasto')
-
-            serializer = ViajeSnapshotSerializer(
-                snapshots,
-                many=True,
-                context={'request': request, 'include_gastos': include_gastos}
-            )
-            data = serializer.data
+            fuente = _fuente_snapshots(visible_viajes.queryset, request, include_gastos, campos)
 
         else:
             if user.role != "MASTER":
                 raise UnauthorizedAccessError("Rol de usuario no reconocido")
 
             viajes = visible_viajes.queryset.filter(estado="REVISADO")
+            fuente = _fuente_viajes_en_vivo(viajes, request, include_gastos, campos)
 
-            serializer_class = ViajeWithGastosSerializer if include_gastos else ViajeSerializer
-            if include_gastos:
-                viajes = viajes.prefetch_related(
-                    Prefetch(
-                        'gasto_set',
-                        queryset=Gasto.objects.select_related('empleado', 'empresa').order_by('fecha_gasto', 'id')
-                    )
-                )
-
-            serializer = serializer_class(viajes, many=True, context={'request': request})
-            data = serializer.data
-
-        if user.role == "EMPLEADO":
-            empleado = get_user_empleado(user)
-            empresa = empleado.empresa if empleado else None
-            employee_data = EmpleadoProfileSerializer(empleado, context={'request': request}).data if empleado else None
-            company_data = EmpresaProfileSerializer(empresa, context={'request': request}).data if empresa else None
-
-            for trip in data:
-                trip.pop('empleado', None)
-                trip.pop('empresa', None)
-
-            return Response({
-                "employee": employee_data,
-                "company": company_data,
-                "trips": data
-            }, status=status.HTTP_200_OK)
-
-        return Response(data, status=status.HTTP_200_OK)
+        return _listar_viajes(request, user, [fuente])
 
 
 class PendingTripsByEmployeeView(APIView):
@@ -206,33 +286,24 @@ class PendingTripsByEmployeeView(APIView):
 
 
 class ListarTodosLosViajesView(APIView):
-    """Lista todos los viajes según el rol del usuario"""
+    """
+    Lista todos los viajes según el rol del usuario.
+
+    Con ``?page_size=`` o ``?cursor=`` la lista se pagina por
+    ``(fecha_inicio, id)`` descendente. Snapshots y viajes en vivo se unen
+    con ``UNION ALL`` en la base de datos. ``?fields=`` / ``?omit=`` limitan
+    los campos de cada viaje.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        include = {
-            part.strip().lower()
-            for part in request.query_params.get('include', '').split(',')
-            if part.strip()
-        }
-        include_gastos = 'gastos' in include
+        include_gastos = _incluye_gastos(request)
+        campos = _campos_viaje(request)
         visible_viajes = get_visible_viajes_queryset(user)
-        data = []
 
         if visible_viajes.uses_snapshot:
-            snapshots = visible_viajes.queryset
-            if include_gastos:
-                snapshots = snapshots.prefetch_related('gastos_snapshot', 'gastos_snapshot__gasto')
-
-            snapshot_serializer = ViajeSnapshotSerializer(
-                snapshots,
-                many=True,
-                context={'request': request, 'include_gastos': include_gastos}
-            )
-            data.extend(snapshot_serializer.data)
-
             if user.role == "EMPRESA":
                 empresa = get_user_empresa(user)
                 if not empresa:
@@ -246,58 +317,27 @@ class ListarTodosLosViajesView(APIView):
             else:
                 live_qs = Viaje.objects.none()
 
-            serializer_class = ViajeWithGastosSerializer if include_gastos else ViajeSerializer
-            if include_gastos:
-                live_qs = live_qs.prefetch_related(
-                    Prefetch(
-                        'gasto_set',
-                        queryset=Gasto.objects.select_related('empleado', 'empresa').order_by('fecha_gasto', 'id')
-                    )
-                )
-
-            live_serializer = serializer_class(live_qs, many=True, context={'request': request})
-            data.extend(live_serializer.data)
+            fuentes = [
+                _fuente_snapshots(visible_viajes.queryset, request, include_gastos, campos),
+                _fuente_viajes_en_vivo(live_qs, request, include_gastos, campos),
+            ]
 
         else:
             if user.role != "MASTER":
                 raise UnauthorizedAccessError("No autorizado")
 
-            viajes_qs = visible_viajes.queryset
-            serializer_class = ViajeWithGastosSerializer if include_gastos else ViajeSerializer
-            if include_gastos:
-                viajes_qs = viajes_qs.prefetch_related(
-                    Prefetch(
-                        'gasto_set',
-                        queryset=Gasto.objects.select_related('empleado', 'empresa').order_by('fecha_gasto', 'id')
-                    )
-                )
+            fuentes = [_fuente_viajes_en_vivo(visible_viajes.queryset, request, include_gastos, campos)]
 
-            serializer = serializer_class(viajes_qs, many=True, context={'request': request})
-            data = serializer.data
-
-        data.sort(key=lambda trip: trip.get('fecha_inicio') or '', reverse=True)
-
-        if user.role == "EMPLEADO":
-            empleado = get_user_empleado(user)
-            empresa = empleado.empresa if empleado else None
-            employee_data = EmpleadoProfileSerializer(empleado, context={'request': request}).data if empleado else None
-            company_data = EmpresaProfileSerializer(empresa, context={'request': request}).data if empresa else None
-
-            for trip in data:
-                trip.pop('empleado', None)
-                trip.pop('empresa', None)
-
-            return Response({
-                "employee": employee_data,
-                "company": company_data,
-                "trips": data
-            }, status=status.HTTP_200_OK)
-
-        return Response(data, status=status.HTTP_200_OK)
+        return _listar_viajes(request, user, fuentes)
 
 
 class PendingTripsDetailView(APIView):
-    """Devuelve count + lista de viajes 'EN_REVISION' o 'REABIERTO', opcionalmente filtrado por empleado"""
+    """
+    Devuelve count + lista de viajes 'EN_REVISION' o 'REABIERTO', opcionalmente filtrado por empleado.
+
+    Con ``?page_size=`` o ``?cursor=`` ``trips`` se pagina por
+    ``(fecha_inicio, id)`` descendente y se añaden ``next`` y ``next_cursor``.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -343,6 +383,15 @@ class PendingTripsDetailView(APIView):
             else:
                 raise UnauthorizedAccessError("Rol de usuario no reconocido")
 
+        paginador = KeysetPagination(("-fecha_inicio", "-id"))
+        if paginador.is_requested(request):
+            serializer = PendingTripSerializer(paginador.paginate_queryset(viajes_qs, request), many=True)
+            return Response({
+                "count": viajes_qs.count(),
+                "trips": serializer.data,
+                **paginador.get_links(),
+            }, status=status.HTTP_200_OK)
+
         serializer = PendingTripSerializer(viajes_qs, many=True)
         return Response({
             "count": viajes_qs.count(),
@@ -382,7 +431,10 @@ class ViajeDetailView(APIView):
         else:
             raise UnauthorizedAccessError("No autorizado para eliminar este viaje")
 
+        publicado = viaje.estado == "REVISADO" and viaje.empresa_id
         viaje.delete()
+        if publicado:
+            mark_company_review_pending(viaje.empresa)
         return Response(
             {"message": "Viaje eliminado correctamente"},
             status=status.HTTP_204_NO_CONTENT
@@ -501,7 +553,7 @@ class DiaViajeReviewView(APIView):
         dia.revisado = True
         dia.save()
         nuevo_estado = 'APROBADO' if exento else 'RECHAZADO'
-        dia.gastos.update(estado=nuevo_estado)
+        dia.gastos.update(estado=nuevo_estado, updated_at=timezone.now())
 
         return Response({'message': 'Día validado correctamente.'}, status=status.HTTP_200_OK)
 
@@ -550,8 +602,9 @@ class DiaViajeBatchReviewView(APIView):
         estado_gasto = 'APROBADO' if exento else 'RECHAZADO'
 
         with transaction.atomic():
-            DiaViaje.objects.filter(id__in=dia_ids).update(exento=exento, revisado=True)
-            Gasto.objects.filter(dia_id__in=dia_ids).update(estado=estado_gasto)
+            ahora = timezone.now()
+            DiaViaje.objects.filter(id__in=dia_ids).update(exento=exento, revisado=True, updated_at=ahora)
+            Gasto.objects.filter(dia_id__in=dia_ids).update(estado=estado_gasto, updated_at=ahora)
 
         return Response(
             {